@@ -4,6 +4,8 @@ import logging
 
 from app.config import cors_config, logqing_config, imprimir_mensaje_inicio
 from app.service.jobs.scraping_job import iniciar_scheduler_en_segundo_plano
+from app.service.jobs.enriquecimiento_job import iniciar_workers_enriquecimiento, num_workers_enriquecimiento
+from app.service.jobs.informe_job import reanudar_informes_pendientes
 from app.mongo.mongo_utils import init_mongo
 from app.routes.routes_fuentes import api_fuentes
 from app.routes.routes_scraping import api_scraping
@@ -12,6 +14,8 @@ from app.routes.routes_publicaciones import api_publicaciones
 from app.routes.routes_conceptos import api_conceptos
 from app.routes.routes_keywords import api_keywords
 from app.routes.routes_area_impacto import api_areas_impacto
+from app.routes.routes_indices import api_indices
+from app.routes.routes_llm import api_llm
 from app.config import load_config_from_args
 
 def create_app(env_arg=None):
@@ -45,6 +49,13 @@ def create_app(env_arg=None):
             iniciar_scheduler_en_segundo_plano()
         else:
             logging.info("⚙️ Scheduler para el scraping 🕷️ DESACTIVADO ❌. Para activarlo, establece la variable de entorno SCHEDULER_ENABLED en True.")
+        # Workers de enriquecimiento de publicaciones (cola "jobs")
+        if num_workers_enriquecimiento() > 0:
+            logging.info(f"👷 Iniciando {num_workers_enriquecimiento()} workers de enriquecimiento en segundo plano...")
+            iniciar_workers_enriquecimiento()
+        # Informes de impacto que quedaron en cola antes de un reinicio
+        reanudar_informes_pendientes()
+
         # Crear la aplicación Flask
         app = Flask(__name__)
 
@@ -59,6 +70,8 @@ def create_app(env_arg=None):
         app.register_blueprint(api_conceptos, url_prefix='/api')
         app.register_blueprint(api_keywords, url_prefix='/api')
         app.register_blueprint(api_areas_impacto, url_prefix='/api')
+        app.register_blueprint(api_indices, url_prefix='/api')
+        app.register_blueprint(api_llm, url_prefix='/api')
 
         # Puedes guardar config si la necesitas luego
         app.config.update(configuracion)
@@ -2,6 +2,14 @@ import logging
 from datetime import time, datetime
 from typing import Optional
 
+# Política de cortesía por defecto al descargar de una fuente
+POLITICA_DESCARGA_DEFECTO = {
+    "retardo": 1.25,               # segundos entre peticiones al mismo dominio
+    "aleatorio": True,             # retardo aleatorio entre 0.5x y 1.5x del valor configurado
+    "concurrencia": 2,             # peticiones simultáneas como máximo al dominio
+    "autothrottle": True,          # ajustar el retardo según la latencia del servidor
+    "concurrencia_objetivo": 1.0,  # concurrencia media que AutoThrottle intenta mantener
+}
 
 class Fuente:
     _id = None
@@ -13,6 +21,7 @@ class Fuente:
     etiqueta_titulo = None
     etiqueta_contenido = None
     url_imagen = None  # Nuevo campo
+    politica_descarga = None
 
     def __init__(self,
                  nombre: str,
@@ -23,7 +32,8 @@ class Fuente:
                  _id: Optional[str] = None,
                  etiqueta_titulo: str = "",
                  etiqueta_contenido: str = "",
-                 url_imagen: Optional[str] = None  
+                 url_imagen: Optional[str] = None,
+                 politica_descarga: Optional[dict] = None
                  ):
         self._id = _id
         self.nombre = nombre
@@ -34,6 +44,7 @@ class Fuente:
         self.etiqueta_titulo = etiqueta_titulo
         self.etiqueta_contenido = etiqueta_contenido
         self.url_imagen = url_imagen
+        self.politica_descarga = politica_descarga
 
     def to_dict(self):
         data = {
@@ -44,7 +55,8 @@ class Fuente:
             "fecha_alta": self.fecha_alta,
             "etiqueta_titulo": self.etiqueta_titulo,
             "etiqueta_contenido": self.etiqueta_contenido,
-            "url_imagen": self.url_imagen  
+            "url_imagen": self.url_imagen,
+            "politica_descarga": self.politica_descarga
         }
         if self._id:
             data["_id"] = str(self._id)
@@ -62,11 +74,24 @@ class Fuente:
                 etiqueta_titulo=data.get("etiqueta_titulo", ""),
                 etiqueta_contenido=data.get("etiqueta_contenido", ""),
                 url_imagen=data.get("url_imagen"),  # Nuevo campo
+                politica_descarga=data.get("politica_descarga"),
                 _id=str(data.get("_id")) if data.get("_id") else None
             )
         except Exception as e:
             logging.error("❌ Error al crear la fuente desde el diccionario", e)
             raise e
 
+    def get_politica_descarga(self) -> dict:
+        """
+        Política de descarga de la fuente, completada con los valores por defecto.
+        """
+        return {**POLITICA_DESCARGA_DEFECTO, **(self.politica_descarga or {})}
+
+    def es_telegram(self):
+        """
+        Indica si la fuente es un canal de Telegram (se rastrea con TelegramSpider).
+        """
+        return bool(self.url) and self.url.startswith(("https://tlgrm", "http://tlgrm", "https://t.me", "http://t.me"))
+
     def __repr__(self):
         return f"Fuente(nombre='{self.nombre}', url='{self.url}', tipo={self.tipo}, activa={self.activa}, fecha_alta={self.fecha_alta}, etiqueta_titulo={self.etiqueta_titulo}, url_imagen={self.url_imagen})"
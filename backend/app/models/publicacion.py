@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Union
 from bson import ObjectId
 
 class Publicacion:
@@ -15,6 +15,7 @@ class Publicacion:
         conceptos_relacionados_ids: Optional[List[ObjectId]] = None,
         ciudad_region: Optional[str] = None,
         pais: Optional[str] = None,
+        embedding: Optional[Union[List[float], bytes]] = None,
         _id: Optional[str] = None
     ):
         self._id = _id
@@ -28,6 +29,9 @@ class Publicacion:
         self.conceptos_relacionados_ids = conceptos_relacionados_ids or []
         self.ciudad_region = ciudad_region
         self.pais = pais
+        # Vector semántico de titulo + contenido, calculado una vez en la ingesta.
+        # Leído de Mongo llega empaquetado en float16 (bytes)
+        self.embedding = embedding
 
     def to_dict(self):
         data = {
@@ -42,6 +46,8 @@ class Publicacion:
             "ciudad_region": self.ciudad_region,
             "pais": self.pais
         }
+        if self.embedding is not None and not isinstance(self.embedding, bytes):
+            data["embedding"] = [float(x) for x in self.embedding]
         if self._id:
             data["_id"] = str(self._id)
         return data
@@ -76,5 +82,6 @@ class Publicacion:
             conceptos_relacionados_ids=conceptos_ids,
             ciudad_region=data.get("ciudad_region"),
             pais=data.get("pais"),
+            embedding=data.get("embedding"),
             _id=str(data.get("_id")) if data.get("_id") else None
         )
@@ -13,6 +13,10 @@ from pymongo.errors import AutoReconnect, NetworkTimeout, ConnectionFailure
 from .mongo_utils import get_collection
 from ..models.concepto_interes import ConceptoInteres
 from ..service.llm.llm_utils import generar_descripcion_concepto, generar_keywords_descriptivos
+from ..service.similarity_search.indice_vectorial import notificar_actualizacion, notificar_eliminacion
+
+# Nombre del índice vectorial de conceptos (ver similarity_search.get_indice_conceptos)
+INDICE_CONCEPTOS = "conceptos_interes"
 
 # --------------------------------------------------------------------
 # Recupera todos los conceptos desde la colección "conceptos_interes"
@@ -73,6 +77,7 @@ def create_concepto(concepto):
             del data["_id"]
         insert_result = get_collection("conceptos_interes").insert_one(data)
         logging.info(f"✅ Concepto creado: {concepto.nombre}")
+        notificar_actualizacion(INDICE_CONCEPTOS, {**data, "_id": insert_result.inserted_id})
         return insert_result
     except Exception as e:
         logging.error(f"❌ Error creando concepto: {e}")
@@ -85,6 +90,8 @@ def delete_concepto(concepto_id):
         raise ValueError("ID no válido")
     try:
         result = get_collection("conceptos_interes").delete_one({"_id": ObjectId(concepto_id)})
+        if result.deleted_count:
+            notificar_eliminacion(INDICE_CONCEPTOS, concepto_id)
         return result.deleted_count
     except Exception as e:
         logging.error(f"Error al eliminar concepto: {e}")
@@ -113,6 +120,11 @@ def update_concepto(concepto: ConceptoInteres):
             logging.warning(f"⚠️ No se encontró el concepto con _id: {concepto_id}")
         else:
             logging.info(f"✅ Concepto actualizado correctamente: {concepto.nombre}")
+            # El índice guarda el documento completo: se relee en lugar de pasar solo los campos actualizados
+            notificar_actualizacion(
+                INDICE_CONCEPTOS,
+                get_collection("conceptos_interes").find_one({"_id": ObjectId(concepto_id)})
+            )
     except Exception as e:
         logging.error(f"❌ Error actualizando el concepto: {e}")
         raise
@@ -138,6 +150,10 @@ def update_concepto_dict(concepto_dict: dict, max_retries=3, backoff_base=2):
                 logging.warning(f"⚠️ No se encontró el concepto con _id: {concepto_id}")
             else:
                 logging.info(f"✅ Concepto actualizado desde dict: {concepto_dict.get('nombre')}")
+                notificar_actualizacion(
+                    INDICE_CONCEPTOS,
+                    get_collection("conceptos_interes").find_one({"_id": ObjectId(concepto_id)})
+                )
             return result
         except (AutoReconnect, NetworkTimeout, ConnectionFailure) as conn_err:
             wait = backoff_base ** attempt
@@ -67,7 +67,7 @@ def update_fuente(fuente_id, data):
     # Solo incluimos campos válidos para evitar errores
     campos_validos = [
         "nombre", "url", "tipo", "activa", "fecha_alta",
-        "etiqueta_titulo", "etiqueta_contenido", "url_imagen"  
+        "etiqueta_titulo", "etiqueta_contenido", "url_imagen", "politica_descarga"
     ]
     update_data = {key: data[key] for key in data if key in campos_validos}
 
@@ -0,0 +1,175 @@
+# mongo_indices.py
+# Registro declarativo de los índices de todas las colecciones.
+# init_mongo los crea al arrancar; create_index es idempotente, así que volver a
+# declararlos no tiene coste si ya existen con la misma definición.
+#
+# También permite comprobar qué índice usa cada forma de consulta habitual (explain).
+# Ejecución manual (desde la carpeta backend):
+#   python -m app.mongo.mongo_indices            -> crea y lista los índices e imprime el informe
+#   python -m app.mongo.mongo_indices --explain  -> imprime solo el informe de explain
+
+import json
+import logging
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+from .mongo_utils import get_db, get_collection
+
+# --------------------------------------------------
+# Índices por colección. En los compuestos va primero la clave de igualdad y después
+# la fecha (orden y rango), de forma que un mismo índice sirve al filtro y a la ordenación.
+# Mongo solo admite un campo array por índice compuesto: cada lista de ids tiene el suyo.
+INDICES = {
+    "publicaciones": [
+        # Evita duplicados en BBDD
+        IndexModel([("titulo", ASCENDING), ("url", ASCENDING)], unique=True, name="titulo_url_unique"),
+        # Comprobaciones de existencia y filtro de URLs del spider
+        IndexModel([("url", ASCENDING)], name="url_idx"),
+        # Listados por rango de fechas y paginación por cursor (fecha, _id)
+        IndexModel([("fecha", DESCENDING), ("_id", DESCENDING)], name="fecha_id_idx"),
+        IndexModel([("fuente_id", ASCENDING), ("fecha", DESCENDING)], name="fuente_fecha_idx"),
+        IndexModel([("conceptos_relacionados_ids", ASCENDING), ("fecha", DESCENDING)], name="conceptos_fecha_idx"),
+        IndexModel([("keywords_relacionadas_ids", ASCENDING), ("fecha", DESCENDING)], name="keywords_fecha_idx"),
+        IndexModel([("pais", ASCENDING), ("fecha", DESCENDING)], name="pais_fecha_idx"),
+        IndexModel([("tono", ASCENDING), ("fecha", DESCENDING)], name="tono_fecha_idx"),
+        # Actualización incremental del índice de búsqueda semántica
+        IndexModel([("embedding_actualizado", ASCENDING)], name="embedding_actualizado_idx", sparse=True),
+        # Búsqueda de palabras ($text) en español, con más peso para el título
+        IndexModel([("titulo", TEXT), ("contenido", TEXT)], name="texto_idx",
+                   default_language="spanish", weights={"titulo": 3, "contenido": 1}),
+    ],
+    "keywords": [
+        IndexModel([("nombre", ASCENDING)], unique=True, name="nombre_keyword_unique"),
+    ],
+    "jobs": [
+        # Los workers reclaman trabajos pendientes por tipo y fecha
+        IndexModel([("tipo", ASCENDING), ("estado", ASCENDING), ("disponible_en", ASCENDING)],
+                   name="tipo_estado_disponible"),
+        # Reutilización de informes con los mismos filtros
+        IndexModel([("tipo", ASCENDING), ("payload.hash", ASCENDING), ("creado", DESCENDING)],
+                   name="tipo_hash_creado"),
+        # Un solo trabajo activo por clave (p. ej. dos peticiones simultáneas del mismo informe)
+        IndexModel([("clave_unica", ASCENDING)], name="clave_unica_activa", unique=True,
+                   partialFilterExpression={"clave_unica": {"$exists": True}}),
+    ],
+    "llm_cache": [
+        # Caducidad de las respuestas guardadas (TTL) y poda por acceso más antiguo
+        IndexModel([("expira", ASCENDING)], name="expira_ttl", expireAfterSeconds=0),
+        IndexModel([("ultimo_acceso", ASCENDING)], name="ultimo_acceso_idx"),
+    ],
+}
+
+
+def crear_indices(db=None):
+    """
+    Crea todos los índices declarados. Un índice que no se pueda crear (por ejemplo,
+    uno existente con el mismo nombre y otra definición) se avisa y no impide el resto.
+    """
+    db = db if db is not None else get_db()
+    for nombre_coleccion, indices in INDICES.items():
+        for indice in indices:
+            try:
+                db[nombre_coleccion].create_indexes([indice])
+            except Exception as e:
+                logging.warning(f"❌ Error al crear índice {indice.document['name']} de: {nombre_coleccion}\n {e}")
+
+
+# --------------------------------------------------
+# Formas de consulta habituales, con valores de ejemplo, para revisar su plan con explain
+def consultas_tipo():
+    hasta = datetime.now()
+    rango_fechas = {"fecha": {"$gte": hasta - timedelta(days=30), "$lte": hasta}}
+    id_ejemplo = ObjectId()
+    orden_fecha = [("fecha", DESCENDING), ("_id", DESCENDING)]
+
+    return {
+        "publicaciones_por_fecha": ("publicaciones", rango_fechas, orden_fecha),
+        "publicaciones_por_fuente": ("publicaciones", {**rango_fechas, "fuente_id": id_ejemplo}, orden_fecha),
+        "publicaciones_por_concepto": ("publicaciones", {**rango_fechas, "conceptos_relacionados_ids": id_ejemplo}, orden_fecha),
+        "publicaciones_por_area": ("publicaciones", {**rango_fechas, "conceptos_relacionados_ids": {"$in": [id_ejemplo, ObjectId()]}}, orden_fecha),
+        "publicaciones_por_keywords": ("publicaciones", {**rango_fechas, "keywords_relacionadas_ids": {"$all": [id_ejemplo]}}, orden_fecha),
+        "publicaciones_por_tono": ("publicaciones", {**rango_fechas, "tono": {"$in": [6, 7]}}, orden_fecha),
+        "publicaciones_por_pais": ("publicaciones", {**rango_fechas, "pais": "España"}, orden_fecha),
+        "publicaciones_por_texto": ("publicaciones", {**rango_fechas, "$text": {"$search": "incendio"}}, orden_fecha),
+        "spider_url_existente": ("publicaciones", {"url": {"$in": ["https://ejemplo.com/noticia"]}}, None),
+        "spider_filtro_urls": ("publicaciones", {"url": {"$regex": "^https://ejemplo\\.com/"}}, None),
+        "jobs_reclamar": ("jobs", {"tipo": "enriquecimiento", "estado": "pendiente", "disponible_en": {"$lte": hasta}}, [("disponible_en", ASCENDING)]),
+        "jobs_informe_reutilizable": ("jobs", {"tipo": "informe", "payload.hash": "0" * 64}, [("creado", DESCENDING)]),
+    }
+
+
+def _indices_del_plan(plan, indices=None, etapas=None):
+    """
+    Recorre el árbol del plan (clásico o SBE) recogiendo índices y etapas usados.
+    """
+    indices = indices if indices is not None else []
+    etapas = etapas if etapas is not None else []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            etapas.append(plan["stage"])
+        if plan.get("indexName") and plan["indexName"] not in indices:
+            indices.append(plan["indexName"])
+        for valor in plan.values():
+            _indices_del_plan(valor, indices, etapas)
+    elif isinstance(plan, list):
+        for valor in plan:
+            _indices_del_plan(valor, indices, etapas)
+    return indices, etapas
+
+
+def explicar_consulta(coleccion, filtro, orden=None):
+    cursor = get_collection(coleccion).find(filtro)
+    if orden:
+        cursor = cursor.sort(orden)
+    explicacion = cursor.explain()
+
+    indices, etapas = _indices_del_plan(explicacion.get("queryPlanner", {}).get("winningPlan", {}))
+    estadisticas = explicacion.get("executionStats", {})
+    return {
+        "coleccion": coleccion,
+        "indices": indices,
+        "escaneo_completo": "COLLSCAN" in etapas,
+        "ordenacion_en_memoria": "SORT" in etapas,
+        "documentos_examinados": estadisticas.get("totalDocsExamined"),
+        "claves_examinadas": estadisticas.get("totalKeysExamined"),
+        "documentos_devueltos": estadisticas.get("nReturned"),
+        "tiempo_ms": estadisticas.get("executionTimeMillis"),
+    }
+
+
+def informe_indices():
+    """
+    Plan de cada consulta tipo: qué índice usa y si recorre la colección entera.
+    """
+    informe = {}
+    for nombre, (coleccion, filtro, orden) in consultas_tipo().items():
+        try:
+            informe[nombre] = explicar_consulta(coleccion, filtro, orden)
+        except Exception as e:
+            informe[nombre] = {"coleccion": coleccion, "error": str(e)}
+    return informe
+
+
+def indices_existentes():
+    db = get_db()
+    return {
+        nombre: sorted(db[nombre].index_information().keys())
+        for nombre in INDICES
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    from app.config import logqing_config, load_config_from_args
+    from app.mongo.mongo_utils import init_mongo
+
+    logqing_config()
+    configuracion = load_config_from_args()
+    # init_mongo ya crea los índices declarados
+    init_mongo(configuracion["MONGO_URI"])
+
+    if "--explain" not in sys.argv:
+        print(json.dumps(indices_existentes(), indent=2, ensure_ascii=False))
+    print(json.dumps(informe_indices(), indent=2, ensure_ascii=False, default=str))
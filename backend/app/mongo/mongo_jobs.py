@@ -0,0 +1,168 @@
+# mongo_jobs.py
+# Cola de trabajos persistente en la colección "jobs".
+# Los workers reclaman trabajos de forma atómica con find_one_and_update, de modo que
+# varios procesos pueden consumir la misma cola sin procesar dos veces un trabajo.
+# Los trabajos fallidos se reintentan con espera exponencial y los que se quedan
+# "en_curso" más allá de su bloqueo (worker caído) vuelven a estar disponibles
+# mientras no hayan agotado sus intentos; si los agotaron, se dan por fallidos.
+# Un trabajo puede llevar una "clave_unica" (índice único parcial): mientras está pendiente
+# o en curso no se puede encolar otro con la misma clave. Al terminar se libera.
+
+import logging
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ReturnDocument, ASCENDING
+
+from .mongo_utils import get_collection
+
+PENDIENTE = "pendiente"
+EN_CURSO = "en_curso"
+COMPLETADO = "completado"
+FALLIDO = "fallido"
+
+# --------------------------------------------------
+# Añade un trabajo a la cola.
+# Con clave_unica, lanza DuplicateKeyError si ya hay un trabajo activo con esa clave
+def encolar_job(tipo, payload, max_intentos=3, clave_unica=None):
+    ahora = datetime.now()
+    data = {
+        "tipo": tipo,
+        "estado": PENDIENTE,
+        "payload": payload,
+        "intentos": 0,
+        "max_intentos": max_intentos,
+        "disponible_en": ahora,
+        "bloqueado_hasta": None,
+        "worker": None,
+        "error": None,
+        "resultado": None,
+        "contadores": {},
+        "iniciado": None,
+        "finalizado": None,
+        "creado": ahora,
+        "actualizado": ahora,
+    }
+    if clave_unica:
+        data["clave_unica"] = clave_unica
+    insert_result = get_collection("jobs").insert_one(data)
+    return str(insert_result.inserted_id)
+
+# --------------------------------------------------
+# Reclama atómicamente el siguiente trabajo disponible de un tipo
+def reclamar_job(tipo, worker, segundos_bloqueo=600):
+    ahora = datetime.now()
+    fallar_jobs_abandonados(tipo, ahora)
+    return get_collection("jobs").find_one_and_update(
+        {
+            "tipo": tipo,
+            "$or": [
+                {"estado": PENDIENTE, "disponible_en": {"$lte": ahora}},
+                # Bloqueo caducado (worker caído): solo si le quedan intentos
+                {
+                    "estado": EN_CURSO,
+                    "bloqueado_hasta": {"$lt": ahora},
+                    "$expr": {"$lt": ["$intentos", "$max_intentos"]},
+                },
+            ],
+        },
+        {
+            "$set": {
+                "estado": EN_CURSO,
+                "worker": worker,
+                "bloqueado_hasta": ahora + timedelta(seconds=segundos_bloqueo),
+                "iniciado": ahora,
+                "actualizado": ahora,
+            },
+            "$inc": {"intentos": 1},
+        },
+        sort=[("disponible_en", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+# --------------------------------------------------
+# Da por fallidos los trabajos cuyo bloqueo caducó sin intentos restantes
+# (el worker murió en cada intento: OOM, fallo nativo, proceso terminado...)
+def fallar_jobs_abandonados(tipo, ahora=None):
+    ahora = ahora or datetime.now()
+    resultado = get_collection("jobs").update_many(
+        {
+            "tipo": tipo,
+            "estado": EN_CURSO,
+            "bloqueado_hasta": {"$lt": ahora},
+            "$expr": {"$gte": ["$intentos", "$max_intentos"]},
+        },
+        {"$set": {
+            "estado": FALLIDO,
+            "error": "El bloqueo del trabajo caducó sin que el worker lo terminara y no quedan intentos",
+            "bloqueado_hasta": None,
+            "finalizado": ahora,
+            "actualizado": ahora,
+        }, "$unset": {"clave_unica": ""}}
+    )
+    if resultado.modified_count:
+        logging.error(f"❌ {resultado.modified_count} jobs de tipo {tipo} fallidos por bloqueo caducado sin intentos restantes")
+    return resultado.modified_count
+
+# --------------------------------------------------
+# Prolonga el bloqueo de un trabajo en curso. Devuelve False si el worker ya no lo tiene
+# (su bloqueo caducó y otro worker lo reclamó, o ya se terminó)
+def renovar_bloqueo_job(job, segundos_bloqueo=600):
+    ahora = datetime.now()
+    resultado = get_collection("jobs").update_one(
+        {"_id": job["_id"], "estado": EN_CURSO, "worker": job.get("worker"), "intentos": job.get("intentos")},
+        {"$set": {"bloqueado_hasta": ahora + timedelta(seconds=segundos_bloqueo), "actualizado": ahora}}
+    )
+    return resultado.matched_count == 1
+
+# --------------------------------------------------
+# Marca un trabajo como completado
+def completar_job(job_id, resultado=None):
+    get_collection("jobs").update_one(
+        {"_id": ObjectId(job_id)},
+        {"$set": {
+            "estado": COMPLETADO,
+            "resultado": resultado,
+            "bloqueado_hasta": None,
+            "error": None,
+            "finalizado": datetime.now(),
+            "actualizado": datetime.now(),
+        }, "$unset": {"clave_unica": ""}}
+    )
+
+# --------------------------------------------------
+# Actualiza los contadores de progreso de un trabajo en curso
+def actualizar_contadores_job(job_id, contadores):
+    get_collection("jobs").update_one(
+        {"_id": ObjectId(job_id)},
+        {"$set": {"contadores": contadores, "actualizado": datetime.now()}}
+    )
+
+# --------------------------------------------------
+# Registra un fallo: reprograma el trabajo con espera exponencial o lo da por fallido
+def fallar_job(job, error, backoff_base=30):
+    intentos = job.get("intentos", 1)
+    ahora = datetime.now()
+    if intentos >= job.get("max_intentos", 3):
+        cambios = {"estado": FALLIDO, "finalizado": ahora}
+        logging.error(f"❌ Job {job['_id']} ({job['tipo']}) fallido tras {intentos} intentos: {error}")
+    else:
+        espera = backoff_base * 2 ** (intentos - 1)
+        cambios = {"estado": PENDIENTE, "disponible_en": ahora + timedelta(seconds=espera)}
+        logging.warning(f"🔄 Job {job['_id']} ({job['tipo']}) reintentará en {espera}s: {error}")
+
+    cambios.update({"error": str(error), "bloqueado_hasta": None, "actualizado": ahora})
+    actualizacion = {"$set": cambios}
+    if cambios["estado"] == FALLIDO:
+        actualizacion["$unset"] = {"clave_unica": ""}
+    get_collection("jobs").update_one({"_id": job["_id"]}, actualizacion)
+
+# --------------------------------------------------
+# Recupera un trabajo por su ID
+def get_job_by_id(job_id):
+    if not ObjectId.is_valid(job_id):
+        raise ValueError("ID no válido")
+    job = get_collection("jobs").find_one({"_id": ObjectId(job_id)})
+    if job:
+        job["_id"] = str(job["_id"])
+    return job
@@ -8,6 +8,10 @@ from flask import jsonify
 from bson import ObjectId
 from .mongo_utils import get_collection
 from ..models.keyword import Keyword
+from ..service.similarity_search.indice_vectorial import notificar_actualizacion, notificar_eliminacion
+
+# Nombre del índice vectorial de keywords (ver similarity_search.get_indice_keywords)
+INDICE_KEYWORDS = "keywords"
 
 # --------------------------------------------------
 # Recupera todas las keywords almacenadas
@@ -52,6 +56,7 @@ def create_keyword(keyword):
         insert_id = get_collection("keywords").insert_one(data).inserted_id
         logging.info(f"Keyword creada: {data['nombre']}")
         data["_id"] = str(insert_id)
+        notificar_actualizacion(INDICE_KEYWORDS, data)
         return data, 201            # ← Dict + status
 
 
@@ -63,6 +68,8 @@ def delete_keyword(keyword_id):
         raise ValueError("ID no válido")
 
     result = get_collection("keywords").delete_one({"_id": ObjectId(keyword_id)})
+    if result.deleted_count:
+        notificar_eliminacion(INDICE_KEYWORDS, keyword_id)
     return result.deleted_count
 
 # --------------------------------------------------
@@ -84,6 +91,8 @@ def update_keyword(keyword_id, data):
 
     updated_keyword = get_collection("keywords").find_one({"_id": ObjectId(keyword_id)})
     updated_keyword["_id"] = str(updated_keyword["_id"])
+    if updated_keyword.get("nombre"):
+        notificar_actualizacion(INDICE_KEYWORDS, updated_keyword)
     return updated_keyword
 
 # --------------------------------------------------
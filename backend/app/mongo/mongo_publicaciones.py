@@ -5,6 +5,11 @@ import logging
 # Incluye operaciones CRUD y además estima automáticamente el tono emocional de
 # la publicación utilizando un modelo LLM antes de guardarla.
 
+import base64
+import json
+import os
+from datetime import datetime
+
 from bson import ObjectId
 
 from .mongo_conceptos import get_conceptos
@@ -15,10 +20,40 @@ from app.service.llm.llm_utils import estimar_tono_publicacion
 from pymongo import DESCENDING  # Importa la constante para ordenar de forma descendente (más reciente primero)
 import re
 
+# Campos que no necesitan los listados ni la API (el embedding es binario y solo lo usa
+# el índice de búsqueda semántica)
+PROYECCION_LISTADO = {"embedding": 0}
+
+# Caracteres del contenido que devuelven los listados paginados
+CARACTERES_EXTRACTO_LISTADO = 1500
+# Campos que muestran los listados paginados. El contenido se recorta en Mongo a un extracto:
+# las publicaciones enriquecidas guardan un resumen corto, pero las demás el artículo completo
+PROYECCION_PAGINA = {
+    "titulo": 1,
+    "url": 1,
+    "fecha": 1,
+    "tono": 1,
+    "pais": 1,
+    "ciudad_region": 1,
+    "fuente_id": 1,
+    "conceptos_relacionados_ids": 1,
+    "keywords_relacionadas_ids": 1,
+    "contenido": {"$substrCP": [{"$ifNull": ["$contenido", ""]}, 0, CARACTERES_EXTRACTO_LISTADO]},
+}
+
+# Valores de tono (1-9) de cada etiqueta del filtro "tono"
+TONO_MAP = {
+    "muy negativo": [1, 2],
+    "negativo": [3, 4],
+    "normal": [5],
+    "positivo": [6, 7],
+    "muy positivo": [8, 9]
+}
+
 # --------------------------------------------------
 # Devuelve el objeto de colección Mongo para acceso directo (útil para spiders, por ejemplo)
 def get_publicaciones():
-    publicaciones = list(get_collection("publicaciones").find())
+    publicaciones = list(get_collection("publicaciones").find({}, PROYECCION_LISTADO))
     for p in publicaciones:
         p["_id"] = str(p["_id"])  # Convierte ObjectId a string para serializar
     return publicaciones
@@ -28,17 +63,34 @@ def get_publicaciones():
 def get_publicacion_by_id(pub_id):
     if not ObjectId.is_valid(pub_id):
         raise ValueError("ID no válido")
-    pub = get_collection("publicaciones").find_one({"_id": ObjectId(pub_id)})
+    pub = get_collection("publicaciones").find_one({"_id": ObjectId(pub_id)}, PROYECCION_LISTADO)
     if pub:
         pub["_id"] = str(pub["_id"])
     return pub
 
+# --------------------------------------------------
+# Normaliza una URL tal y como se guarda en la colección
+def normalizar_url(url):
+    return url.strip().lower()
+
+# --------------------------------------------------
+# Devuelve el subconjunto de URLs que ya existen en la colección (una sola consulta)
+def get_urls_existentes(urls):
+    if not urls:
+        return set()
+    urls_normalizadas = list({normalizar_url(u) for u in urls})
+    cursor = get_collection("publicaciones").find(
+        {"url": {"$in": urls_normalizadas}},
+        {"url": 1, "_id": 0}
+    )
+    return {doc["url"] for doc in cursor}
+
 # --------------------------------------------------
 # Crea una nueva publicación en la base de datos
 # También estima automáticamente el tono del contenido
 def create_publicacion(publicacion):
     # Normalizar campos clave
-    url = publicacion.url.strip().lower()
+    url = normalizar_url(publicacion.url)
     titulo = publicacion.titulo.strip()
 
     # Comprobar si ya existe la publicación con mismo título y url
@@ -65,6 +117,9 @@ def create_publicacion(publicacion):
         "titulo": publicacion.titulo,
         "url": publicacion.url,
         "fecha": publicacion.fecha,
+        # El enriquecimiento encolado lee el artículo de Mongo; al terminar lo sustituye por
+        # el resumen (o lo vacía si la publicación no está relacionada con ningún concepto)
+        "contenido": publicacion.contenido,
         "fuente_id": ObjectId(publicacion.fuente_id),
     }
     data["url"] = url  # Asegura consistencia de formato de URL
@@ -110,7 +165,7 @@ def update_publicacion(pub_id, data):
         return None
 
     # Devuelve la publicación actualizada
-    updated = get_collection("publicaciones").find_one({"_id": ObjectId(pub_id)})
+    updated = get_collection("publicaciones").find_one({"_id": ObjectId(pub_id)}, PROYECCION_LISTADO)
     updated["_id"] = str(updated["_id"])
     return updated
 
@@ -177,21 +232,56 @@ def get_publicaciones_con_conceptos():
     return publicaciones_resultado
 
 
-def filtrar_publicaciones(
+# --------------------------------------------------
+# Modos de busqueda_palabras:
+#   "regex" → subcadena literal en título o contenido (recorre todos los documentos del rango)
+#   "texto" → índice de texto en español ($text): palabras con stemming, sin tildes ni mayúsculas
+# Por defecto se mantiene "regex" para no cambiar los resultados de los clientes existentes;
+# "texto" se pide expresamente con modo_busqueda=texto
+MODOS_BUSQUEDA = ("regex", "texto")
+MODO_BUSQUEDA_DEFECTO = "regex"
+
+
+def condicion_busqueda_palabras(busqueda_palabras, modo=MODO_BUSQUEDA_DEFECTO, frase=False):
+    if modo not in MODOS_BUSQUEDA:
+        raise ValueError(f"modo de búsqueda '{modo}' no válido, usa uno de {MODOS_BUSQUEDA}")
+
+    if modo == "regex":
+        # Se busca el texto tal cual: los metacaracteres del usuario no se interpretan
+        regex = re.compile(re.escape(busqueda_palabras), re.IGNORECASE)
+        return {"$or": [{"titulo": {"$regex": regex}}, {"contenido": {"$regex": regex}}]}
+
+    busqueda = busqueda_palabras
+    if frase:
+        busqueda = '"' + busqueda_palabras.replace('"', " ").strip() + '"'
+    return {"$text": {"$search": busqueda, "$language": "spanish"}}
+
+
+# --------------------------------------------------
+# Construye el filtro de Mongo común a los listados y series de publicaciones
+def construir_query_publicaciones(
     fecha_inicio,
     fecha_fin,
     fuente_id=None,
-    concepto_interes=None,
+    concepto_id=None,
     tono=None,
     keywords_relacionadas=None,
     busqueda_palabras=None,
     area_id=None,
-    pais=None
+    pais=None,
+    modo_busqueda=MODO_BUSQUEDA_DEFECTO,
+    frase=False
 ):
-    condiciones = [
-        {"fecha": {"$gte": fecha_inicio, "$lte": fecha_fin}}
-    ]
+    condiciones = []
 
+    # Las fechas son opcionales (por ejemplo, en la búsqueda semántica)
+    rango_fechas = {}
+    if fecha_inicio:
+        rango_fechas["$gte"] = fecha_inicio
+    if fecha_fin:
+        rango_fechas["$lte"] = fecha_fin
+    if rango_fechas:
+        condiciones.append({"fecha": rango_fechas})
 
     if tono is not None:
         if isinstance(tono, list):
@@ -202,43 +292,79 @@ def filtrar_publicaciones(
     if fuente_id:
         condiciones.append({"fuente_id": fuente_id})
 
+    if concepto_id:
+        condiciones.append({"conceptos_relacionados_ids": concepto_id})
+
     if keywords_relacionadas:
         condiciones.append({"keywords_relacionadas_ids": {"$all": keywords_relacionadas}})
 
     if busqueda_palabras:
-        regex = re.compile(busqueda_palabras, re.IGNORECASE)
-        condiciones.append({"$or": [{"titulo": {"$regex": regex}}, {"contenido": {"$regex": regex}}]})
+        condiciones.append(condicion_busqueda_palabras(busqueda_palabras, modo_busqueda, frase))
 
     if pais:
         condiciones.append({"pais": pais})
 
-    query = {"$and": condiciones} if len(condiciones) > 1 else condiciones[0]
-    publicaciones = list(get_collection("publicaciones").find(query).sort("fecha", DESCENDING))
-
-    # Cruce adicional con publicaciones relacionadas por área o concepto
-    publicaciones_rel_ids = set()
-
-    if concepto_interes:
-        concepto = get_collection("conceptos_interes").find_one({"_id": ObjectId(concepto_interes)})
-        if concepto:
-            publicaciones_rel_ids.update(
-                str(pid) for pid in concepto.get("publicaciones_relacionadas_ids", [])
-            )
-
+    # Publicaciones relacionadas con alguno de los conceptos del área de trabajo
     if area_id:
         try:
             area_doc = get_collection("areas_de_trabajo").find_one({"_id": area_id})
             if not area_doc:
                 logging.warning(f"⚠️ No se encontró el área de trabajo con ID: {area_id}")
             else:
-                conceptos_ids = set(area_doc.get("conceptos_interes_ids", [])) 
-                publicaciones = [
-                    pub for pub in publicaciones
-                    if any(cid in conceptos_ids for cid in pub.get("conceptos_relacionados_ids", []))
-                ]
+                conceptos_ids = list(area_doc.get("conceptos_interes_ids", []))
+                condiciones.append({"conceptos_relacionados_ids": {"$in": conceptos_ids}})
         except Exception as e:
             logging.warning(f"⚠️ Error al procesar area_id '{area_id}': {e}")
 
+    if not condiciones:
+        return {}
+    return {"$and": condiciones} if len(condiciones) > 1 else condiciones[0]
+
+
+def combinar_condiciones(query, condicion):
+    """
+    Añade una condición al $and de primer nivel de la query ($text no admite quedar anidado).
+    """
+    condiciones = list(query["$and"]) if "$and" in query else ([query] if query else [])
+    return {"$and": condiciones + [condicion]}
+
+
+def filtrar_publicaciones(
+    fecha_inicio,
+    fecha_fin,
+    fuente_id=None,
+    concepto_interes=None,
+    tono=None,
+    keywords_relacionadas=None,
+    busqueda_palabras=None,
+    area_id=None,
+    pais=None,
+    modo_busqueda=MODO_BUSQUEDA_DEFECTO,
+    frase=False
+):
+    query = construir_query_publicaciones(
+        fecha_inicio,
+        fecha_fin,
+        fuente_id=fuente_id,
+        tono=tono,
+        keywords_relacionadas=keywords_relacionadas,
+        busqueda_palabras=busqueda_palabras,
+        area_id=area_id,
+        pais=pais,
+        modo_busqueda=modo_busqueda,
+        frase=frase
+    )
+    publicaciones = list(get_collection("publicaciones").find(query, PROYECCION_LISTADO).sort("fecha", DESCENDING))
+
+    # Cruce adicional con publicaciones relacionadas por concepto
+    publicaciones_rel_ids = set()
+
+    if concepto_interes:
+        concepto = get_collection("conceptos_interes").find_one({"_id": ObjectId(concepto_interes)})
+        if concepto:
+            publicaciones_rel_ids.update(
+                str(pid) for pid in concepto.get("publicaciones_relacionadas_ids", [])
+            )
 
     # Si hay filtros por IDs relacionadas, aplicarlos
     if publicaciones_rel_ids:
@@ -255,6 +381,168 @@ def filtrar_publicaciones(
     return publicaciones
 
 
+# --------------------------------------------------
+# Series agregadas en Mongo para las gráficas: solo viajan los valores agrupados
+
+# La configuración se lee al usarla: este módulo se importa antes de cargar el .env
+def zona_horaria_series():
+    """
+    Zona horaria con la que se agrupan las series por día. Las fechas se guardan sin zona y
+    Mongo las trata como UTC, así que "UTC" agrupa por el día guardado (como el antiguo
+    .date() en Python); otra zona (p. ej. "Europe/Madrid") desplaza los cambios de día.
+    """
+    return os.getenv("SERIES_ZONA_HORARIA", "UTC")
+
+
+def dia_publicacion():
+    """
+    Día de la publicación en formato YYYY-MM-DD en la zona horaria de las series
+    """
+    return {"$dateToString": {"format": "%Y-%m-%d", "date": "$fecha", "timezone": zona_horaria_series()}}
+
+# País de la publicación, "Desconocido" si no tiene
+PAIS_PUBLICACION = {
+    "$cond": [{"$eq": [{"$ifNull": ["$pais", ""]}, ""]}, "Desconocido", "$pais"]
+}
+
+# Solo las publicaciones con tono numérico entero (las no analizadas no tienen tono)
+CON_TONO = {"tono": {"$type": ["int", "long"]}}
+
+
+# Etapas de agrupación de cada serie: (clave o función que la construye, acumulador, filtro previo)
+SERIES_PUBLICACIONES = {
+    "publicaciones_dia": (dia_publicacion, {"$sum": 1}, None),
+    "publicaciones_pais": (PAIS_PUBLICACION, {"$sum": 1}, None),
+    "tono_medio_dia": (dia_publicacion, {"$avg": "$tono"}, CON_TONO),
+    "tono_medio_pais": (PAIS_PUBLICACION, {"$avg": "$tono"}, CON_TONO),
+}
+
+
+def _etapas_serie(nombre):
+    clave, valor, match_extra = SERIES_PUBLICACIONES[nombre]
+    if callable(clave):
+        clave = clave()
+    etapas = [{"$match": match_extra}] if match_extra else []
+    return etapas + [
+        {"$group": {"_id": clave, "valor": valor}},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+def _valores_serie(docs):
+    return {doc["_id"]: doc["valor"] for doc in docs}
+
+
+def _agregar_publicaciones(query, nombre):
+    pipeline = [{"$match": query}] + _etapas_serie(nombre)
+    return _valores_serie(get_collection("publicaciones").aggregate(pipeline))
+
+
+def contar_publicaciones_por_dia(query):
+    return _agregar_publicaciones(query, "publicaciones_dia")
+
+
+def contar_publicaciones_por_pais(query):
+    return _agregar_publicaciones(query, "publicaciones_pais")
+
+
+def tono_medio_por_dia(query):
+    return _agregar_publicaciones(query, "tono_medio_dia")
+
+
+def tono_medio_por_pais(query):
+    return _agregar_publicaciones(query, "tono_medio_pais")
+
+
+# --------------------------------------------------
+# Página de un listado filtrado: total con countDocuments y solo los documentos de la página
+# Con por_relevancia (solo si la query usa $text) se ordena por puntuación y se devuelve en "score"
+def get_pagina_publicaciones(query, skip=0, limit=25, por_relevancia=False):
+    coleccion = get_collection("publicaciones")
+    total = coleccion.count_documents(query)
+
+    proyeccion = dict(PROYECCION_PAGINA)
+    orden = [("fecha", DESCENDING), ("_id", DESCENDING)]
+    if por_relevancia:
+        proyeccion["score"] = {"$meta": "textScore"}
+        orden = [("score", {"$meta": "textScore"})] + orden
+
+    publicaciones = list(
+        coleccion.find(query, proyeccion)
+        .sort(orden)
+        .skip(skip)
+        .limit(limit)
+    )
+    return total, publicaciones
+
+
+# --------------------------------------------------
+# Paginación por cursor (keyset) sobre (fecha, _id), en orden descendente.
+# El cursor es opaco para el cliente: base64 de la fecha y el _id del último elemento.
+def codificar_cursor(publicacion):
+    datos = {"f": publicacion["fecha"].isoformat(), "i": str(publicacion["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(datos).encode("utf-8")).decode("ascii")
+
+
+def decodificar_cursor(cursor):
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(datos["f"]), ObjectId(datos["i"])
+    except Exception:
+        raise ValueError("cursor no válido")
+
+
+def get_publicaciones_cursor(query=None, cursor=None, limit=25):
+    """
+    Devuelve (publicaciones, next_cursor). next_cursor es None en la última página.
+    """
+    query = query or {}
+    if cursor:
+        fecha, _id = decodificar_cursor(cursor)
+        despues_del_cursor = {"$or": [
+            {"fecha": {"$lt": fecha}},
+            {"fecha": fecha, "_id": {"$lt": _id}},
+        ]}
+        query = combinar_condiciones(query, despues_del_cursor)
+
+    # Se pide un elemento de más para saber si hay página siguiente
+    publicaciones = list(
+        get_collection("publicaciones").find(query, PROYECCION_PAGINA)
+        .sort([("fecha", DESCENDING), ("_id", DESCENDING)])
+        .limit(limit + 1)
+    )
+    hay_mas = len(publicaciones) > limit
+    publicaciones = publicaciones[:limit]
+    next_cursor = codificar_cursor(publicaciones[-1]) if hay_mas else None
+    return publicaciones, next_cursor
+
+
+# --------------------------------------------------
+# Todo el cuadro de mando en una sola consulta: total, página y series con $facet
+def get_dashboard_publicaciones(query, skip=0, limit=25):
+    facetas = {
+        "total": [{"$count": "n"}],
+        "publicaciones": [
+            {"$sort": {"fecha": DESCENDING, "_id": DESCENDING}},
+            {"$skip": skip},
+            {"$limit": limit},
+            {"$project": PROYECCION_PAGINA},
+        ],
+    }
+    for nombre in SERIES_PUBLICACIONES:
+        facetas[nombre] = _etapas_serie(nombre)
+
+    pipeline = [{"$match": query}, {"$facet": facetas}]
+    resultado = next(get_collection("publicaciones").aggregate(pipeline, allowDiskUse=True), {})
+
+    total = resultado.get("total") or [{"n": 0}]
+    dashboard = {
+        "total": total[0]["n"],
+        "publicaciones": resultado.get("publicaciones", []),
+    }
+    for nombre in SERIES_PUBLICACIONES:
+        dashboard[nombre] = _valores_serie(resultado.get(nombre, []))
+    return dashboard
 
 
 def eliminar_concepto_de_publicacion(pub_id, concepto_id):
@@ -37,9 +37,9 @@ def init_mongo(uri=None):
 
     db = client["baseDatosScrauron"]
 
-    # Crear índices u otras configuraciones
-    config_mongo_index_publicaciones(db["publicaciones"])
-    config_mongo_index_keywords(db["keywords"])
+    # Crear índices u otras configuraciones (registro declarativo en mongo_indices.py)
+    from .mongo_indices import crear_indices
+    crear_indices(db)
 
 def test_mongo_connection():
     logging.info("Test conexion a MongoDB...")
@@ -49,28 +49,3 @@ def test_mongo_connection():
     except Exception as e:
         logging.error(f"❌ Error de conexión a MongoDB:\n{e}")
         raise e
-
-
-def config_mongo_index_publicaciones(coleccion):
-    try:
-        # Indice único combinación de título u url. Evita duplicados en BBDD.
-        coleccion.create_index(
-            [("titulo", 1), ("url", 1)],
-            unique=True,
-            name="titulo_url_unique"
-        )
-
-    except Exception as e:
-        logging.warning(f"❌ Error al crear índice de: {coleccion}\n {e}")
-
-def config_mongo_index_keywords(coleccion):
-    try:
-        # Indice único combinación de título u url. Evita duplicados en BBDD.
-        coleccion.create_index(
-            "nombre",
-            unique=True,
-            name="nombre_keyword_unique"
-        )
-
-    except Exception as e:
-        logging.warning(f"❌ Error al crear índice de: {coleccion}\n {e}")
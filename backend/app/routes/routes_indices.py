@@ -0,0 +1,26 @@
+from flask import Blueprint
+
+from ..models.modelUtils.SerializeJson import SerializeJson
+from ..mongo.mongo_indices import indices_existentes, informe_indices
+
+api_indices = Blueprint('api_indices', __name__)
+
+# -----------------------------------------------
+# GET índices existentes por colección
+@api_indices.route('/indices', methods=['GET'])
+@SerializeJson
+def get_indices_endpoint():
+    try:
+        return indices_existentes(), 200
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+# -----------------------------------------------
+# GET plan (explain) de cada consulta tipo: índice usado y documentos examinados
+@api_indices.route('/indices/explain', methods=['GET'])
+@SerializeJson
+def explain_indices_endpoint():
+    try:
+        return informe_indices(), 200
+    except Exception as e:
+        return {"error": str(e)}, 500
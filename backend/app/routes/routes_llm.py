@@ -0,0 +1,27 @@
+from flask import Blueprint
+
+from ..models.modelUtils.SerializeJson import SerializeJson
+from ..service.llm.cache_llm import estadisticas_cache_llm
+from ..service.llm.tokens_llm import estadisticas_uso_llm
+
+api_llm = Blueprint('api_llm', __name__)
+
+# -----------------------------------------------
+# GET aciertos y fallos de la caché del LLM en este proceso y número de entradas guardadas
+@api_llm.route('/llm/cache', methods=['GET'])
+@SerializeJson
+def get_estadisticas_cache_endpoint():
+    try:
+        return estadisticas_cache_llm(), 200
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+# -----------------------------------------------
+# GET llamadas al LLM y tokens de entrada y salida consumidos en este proceso
+@api_llm.route('/llm/uso', methods=['GET'])
+@SerializeJson
+def get_uso_llm_endpoint():
+    try:
+        return estadisticas_uso_llm(), 200
+    except Exception as e:
+        return {"error": str(e)}, 500
@@ -2,7 +2,6 @@ from flask import Blueprint, request, jsonify, send_file
 from datetime import datetime, timedelta
 from bson import ObjectId
 import logging
-from collections import defaultdict
 from ..models.modelUtils.SerializeJson import SerializeJson
 from ..models.publicacion import Publicacion
 from ..mongo.mongo_publicaciones import (
@@ -13,33 +12,57 @@ from ..mongo.mongo_publicaciones import (
     delete_publicacion,
     delete_all_publicaciones,
     get_publicaciones_con_conceptos,
-    filtrar_publicaciones,
-    eliminar_concepto_de_publicacion
+    eliminar_concepto_de_publicacion,
+    construir_query_publicaciones,
+    contar_publicaciones_por_dia,
+    contar_publicaciones_por_pais,
+    tono_medio_por_dia,
+    tono_medio_por_pais,
+    get_dashboard_publicaciones,
+    get_pagina_publicaciones,
+    get_publicaciones_cursor,
+    codificar_cursor,
+    MODO_BUSQUEDA_DEFECTO,
+    TONO_MAP
 )
 from ..mongo.mongo_fuentes import  get_fuentes_dict
 from ..mongo.mongo_conceptos import get_collection as get_conceptos_collection
-from ..mongo.mongo_areas import get_collection as get_areas_coll
+from ..mongo.mongo_jobs import get_job_by_id
 from ..service.llm.llm_utils import generar_informe_impacto_temporal
+from ..service.jobs.informe_job import (
+    solicitar_informe,
+    resumen_job_informe,
+    abrir_informe,
+    publicaciones_para_informe,
+    filtros_para_documento,
+    CAMPOS_FILTROS,
+    MIME_DOCX,
+    TIPO_INFORME
+)
+from ..service.similarity_search.indice_publicaciones import buscar_publicaciones_similares
 
 
 api_publicaciones = Blueprint('api_publicaciones', __name__)
 
-TONO_MAP = {
-    "muy negativo": [1, 2],
-    "negativo": [3, 4],
-    "normal": [5],
-    "positivo": [6, 7],
-    "muy positivo": [8, 9]
-}
-
-
-# GET todas las publicaciones
+# GET publicaciones. Con ?limit o ?cursor se pagina por cursor (más recientes primero);
+# sin parámetros devuelve la colección completa como hasta ahora
 @api_publicaciones.route('/publicaciones', methods=['GET'])
 @SerializeJson
 def get_publicaciones_endpoint():
     try:
-        publicaciones = get_publicaciones()
-        return publicaciones, 200
+        cursor = request.args.get("cursor")
+        limit = request.args.get("limit")
+        if cursor is None and limit is None:
+            publicaciones = get_publicaciones()
+            return publicaciones, 200
+
+        limit = int(limit or 25)
+        if limit < 1:
+            raise ValueError("limit debe ser mayor que 0")
+        publicaciones, next_cursor = get_publicaciones_cursor(cursor=cursor, limit=limit)
+        return {"publicaciones": publicaciones, "next_cursor": next_cursor}, 200
+    except ValueError as ve:
+        return {"error": f"Parámetro inválido: {ve}"}, 400
     except Exception as e:
         return {"error": f"Error al obtener publicaciones: {str(e)}"}, 500
 
@@ -130,87 +153,72 @@ def publicaciones_con_conceptos():
         return {"error": f"Error al obtener publicaciones: {str(e)}"}, 500
 
 
+def enriquecer_listado_publicaciones(publicaciones):
+    """
+    Sustituye en cada publicación la fuente y los conceptos relacionados por los documentos completos.
+    """
+    # Obtener fuentes y conceptos completos
+    fuentes_map = {str(f["_id"]): f for f in get_fuentes_dict()}
+    all_concepts = set()
+    for pub in publicaciones:
+        all_concepts.update(pub.get("conceptos_relacionados_ids", []))
+    conceptos_map = {
+        str(c["_id"]): c
+        for c in get_conceptos_collection("conceptos_interes").find(
+            {"_id": {"$in": list(all_concepts)}}
+        )
+    }
+
+    # Enriquecer publicaciones
+    for pub in publicaciones:
+        f_id = str(pub.get("fuente_id"))
+        pub["fuente"] = fuentes_map.get(f_id)
+        cr_ids = [str(cid) for cid in pub.get("conceptos_relacionados_ids", [])]
+        pub["conceptos_relacionados"] = [conceptos_map[cid] for cid in cr_ids if cid in conceptos_map]
+        pub.pop("conceptos_relacionados_ids", None)
+    return publicaciones
+
+
 @api_publicaciones.route('/publicaciones_filtradas', methods=['GET'])
 @SerializeJson
 def publicaciones_filtradas_endpoint():
     try:
-        fi = request.args.get("fechaInicio")
-        ff = request.args.get("fechaFin")
-        ci = request.args.get("concepto_interes")
-        ai = request.args.get("area_id")
-        fiu = request.args.get("fuente_id")
-        tone_str = request.args.get("tono")
-        kws = request.args.getlist("keywordsRelacionadas")
-        busq = request.args.get("busqueda_palabras")
-        pais = request.args.get("pais")
-        page = int(request.args.get("page", 1))
-        page_size = int(request.args.get("pageSize", 25))
-
-        if not fi or not ff:
+        filtros = leer_filtros_publicaciones()
+        if filtros is None:
             return {"error": "Los parámetros fechaInicio y fechaFin son obligatorios"}, 400
+        _, _, query = filtros
 
-        fecha_inicio = datetime.fromisoformat(fi)
-        fecha_fin = datetime.fromisoformat(ff)
-
-        concepto_oid = ObjectId(ci) if ci else None
-        area_id = ObjectId(ai) if ai else None
-        fuente_id = ObjectId(fiu) if fiu else None
-        tonos = TONO_MAP.get(tone_str.lower()) if tone_str else None
-        keywords = [ObjectId(k) for k in kws] if kws else None
-
-        publicaciones = filtrar_publicaciones(
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
-            tono=tonos,
-            keywords_relacionadas=keywords,
-            busqueda_palabras=busq,
-            fuente_id=fuente_id,
-            area_id=area_id,
-            pais=pais
+        page = int(request.args.get("page", 1))
+        page_size = int(request.args.get("pageSize", 25))
+        cursor = request.args.get("cursor")
+        if page < 1 or page_size < 1:
+            raise ValueError("page y pageSize deben ser mayores que 0")
+
+        # orden=relevancia: con búsqueda de texto, primero las que mejor coinciden
+        por_relevancia = (
+            request.args.get("orden") == "relevancia"
+            and bool(request.args.get("busqueda_palabras"))
+            and request.args.get("modo_busqueda", MODO_BUSQUEDA_DEFECTO).lower() == "texto"
         )
-
-        # Si hay concepto_id, filtrar solo por ese
-        if concepto_oid:
-            publicaciones = [
-                pub for pub in publicaciones
-                if concepto_oid in pub.get("conceptos_relacionados_ids", [])
-            ]
-        # Si no hay concepto_id pero sí área_id, obtener conceptos de esa área y filtrar por ellos
-        elif area_id:
-            area_doc = get_areas_coll("areas_trabajo").find_one({"_id": area_id})
-            if area_doc:
-                conceptos_ids = area_doc.get("conceptos_interes_ids", [])
-                publicaciones = [
-                    pub for pub in publicaciones
-                    if any(cid in conceptos_ids for cid in pub.get("conceptos_relacionados_ids", []))
-                ]
-
-        total = len(publicaciones)
-        inicio = (page - 1) * page_size
-        fin = inicio + page_size
-        publicaciones = publicaciones[inicio:fin]
-
-        # Obtener fuentes y conceptos completos
-        fuentes_map = {str(f["_id"]): f for f in get_fuentes_dict()}
-        all_concepts = set()
-        for pub in publicaciones:
-            all_concepts.update(pub.get("conceptos_relacionados_ids", []))
-        conceptos_map = {
-            str(c["_id"]): c
-            for c in get_conceptos_collection("conceptos_interes").find(
-                {"_id": {"$in": list(all_concepts)}}
+        if por_relevancia and cursor:
+            raise ValueError("la paginación por cursor no admite orden=relevancia")
+
+        # Concepto y área van en la query: Mongo cuenta y devuelve solo la página pedida
+        if cursor:
+            # Con cursor se ignora page: la página empieza justo después del cursor
+            publicaciones, next_cursor = get_publicaciones_cursor(query, cursor=cursor, limit=page_size)
+            total = None
+        else:
+            total, publicaciones = get_pagina_publicaciones(
+                query, skip=(page - 1) * page_size, limit=page_size, por_relevancia=por_relevancia
             )
-        }
+            hay_mas = (page - 1) * page_size + len(publicaciones) < total
+            # El cursor sigue el orden por fecha, así que no tiene sentido ordenando por relevancia
+            next_cursor = codificar_cursor(publicaciones[-1]) if hay_mas and publicaciones and not por_relevancia else None
 
-        # Enriquecer publicaciones
-        for pub in publicaciones:
-            f_id = str(pub.get("fuente_id"))
-            pub["fuente"] = fuentes_map.get(f_id)
-            cr_ids = [str(cid) for cid in pub.get("conceptos_relacionados_ids", [])]
-            pub["conceptos_relacionados"] = [conceptos_map[cid] for cid in cr_ids if cid in conceptos_map]
-            pub.pop("conceptos_relacionados_ids", None)
+        enriquecer_listado_publicaciones(publicaciones)
 
-        return {"total": total, "publicaciones": publicaciones}, 200
+        return {"total": total, "publicaciones": publicaciones, "next_cursor": next_cursor}, 200
 
     except ValueError as ve:
         return {"error": f"Parámetro inválido: {ve}"}, 400
@@ -234,59 +242,17 @@ def eliminar_concepto_relacionado_endpoint(pub_id, concepto_id):
 
 @api_publicaciones.route('/generar_informe_impacto_temporal', methods=['GET'])
 def informe_impacto_temporal_endpoint():
+    # Generación síncrona, dentro de la petición. Para informes grandes usar POST /informes_impacto_temporal
     try:
-        fi = request.args.get("fechaInicio")
-        ff = request.args.get("fechaFin")
-        ci = request.args.get("concepto_interes")
-        ai = request.args.get("area_id")
-        fiu = request.args.get("fuente_id")
-        tone = request.args.get("tono")
-        kws = request.args.getlist("keywordsRelacionadas")
-        busq = request.args.get("busqueda_palabras")
-        pais = request.args.get("pais")
-
-        if not fi or not ff:
+        filtros = leer_filtros_informe()
+        if not filtros.get("fechaInicio") or not filtros.get("fechaFin"):
             return {"error": "Los parámetros fechaInicio y fechaFin son obligatorios"}, 400
 
-        fecha_inicio = datetime.fromisoformat(fi)
-        fecha_fin = datetime.fromisoformat(ff)
-
-        concepto_oid = ObjectId(ci) if ci else None
-        area_oid = ObjectId(ai) if ai else None
-        fuente_oid = ObjectId(fiu) if fiu else None
-        tono = TONO_MAP.get(tone.lower()) if tone else None
-        keywords = [ObjectId(k) for k in kws] if kws else None
-
-        publicaciones_dicts = filtrar_publicaciones(
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
-            tono=tono,
-            keywords_relacionadas=keywords,
-            busqueda_palabras=busq,
-            area_id=area_oid,
-            fuente_id=fuente_oid,
-            pais=pais
-        )
+        publicaciones_dicts = publicaciones_para_informe(filtros)
 
-        if concepto_oid:
-            publicaciones_dicts = [
-                pub for pub in publicaciones_dicts
-                if concepto_oid in pub.get("conceptos_relacionados_ids", [])
-            ]
-
-        filtros = {
-            "concepto_interes": ci,
-            "area_id": ai,
-            "fuente_id": fiu,
-            "tono": tone,
-            "busqueda_palabras": busq,
-            "pais": pais,
-            "keywordsRelacionadas": kws
-        }
-
-        word_file = generar_informe_impacto_temporal(publicaciones_dicts, ai, filtros)
+        word_file = generar_informe_impacto_temporal(publicaciones_dicts, filtros.get("area_id"), filtros_para_documento(filtros))
         filename = f"informe_impacto_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"
-        return send_file(word_file, as_attachment=True, download_name=filename, mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+        return send_file(word_file, as_attachment=True, download_name=filename, mimetype=MIME_DOCX)
 
     except ValueError as ve:
         return {"error": f"Parámetro inválido: {ve}"}, 400
@@ -295,72 +261,151 @@ def informe_impacto_temporal_endpoint():
         return {"error": f"Error inesperado: {e}"}, 500
 
 
-
-@api_publicaciones.route('/publicaciones_dia', methods=['GET'])
+# POST informe de impacto en segundo plano. Acepta los mismos filtros que
+# /generar_informe_impacto_temporal (cuerpo JSON o query string) y devuelve el id del trabajo
+@api_publicaciones.route('/informes_impacto_temporal', methods=['POST'])
 @SerializeJson
-def publicaciones_por_dia_endpoint():
+def solicitar_informe_endpoint():
     try:
-        fi = request.args.get("fechaInicio")
-        ff = request.args.get("fechaFin")
-        ci = request.args.get("concepto_interes")
-        ai = request.args.get("area_id")
-        fiu = request.args.get("fuente_id")
-        tone = request.args.get("tono")
-        kws = request.args.getlist("keywordsRelacionadas")
-        busq = request.args.get("busqueda_palabras")
-        pais = request.args.get("pais")
-
-        if not fi or not ff:
-            return {"error": "Los parámetros fechaInicio y fechaFin son obligatorios"}, 400
+        job_id, reutilizado = solicitar_informe(leer_filtros_informe())
+        return {
+            "success": True,
+            "job_id": job_id,
+            "reutilizado": reutilizado,
+            "estado_url": f"/api/informes_impacto_temporal/{job_id}"
+        }, 200 if reutilizado else 202
+    except ValueError as ve:
+        return {"error": f"Parámetro inválido: {ve}"}, 400
+    except Exception as e:
+        return {"error": f"Error al solicitar el informe: {str(e)}"}, 500
 
-        fecha_inicio = datetime.fromisoformat(fi)
-        fecha_fin = datetime.fromisoformat(ff)
-
-        concepto_oid = ObjectId(ci) if ci else None
-        area_id = ObjectId(ai) if ai else None
-        fuente_id = ObjectId(fiu) if fiu else None
-        tono = TONO_MAP.get(tone.lower()) if tone else None
-        keywords = [ObjectId(k) for k in kws] if kws else None
-
-        publicaciones = filtrar_publicaciones(
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
-            tono=tono,
-            keywords_relacionadas=keywords,
-            busqueda_palabras=busq,
-            area_id=area_id,
-            fuente_id=fuente_id,
-            pais=pais  
-        )
 
-        if concepto_oid:
-            publicaciones = [
-                pub for pub in publicaciones
-                if concepto_oid in pub.get("conceptos_relacionados_ids", [])
-            ]
+# GET estado y progreso (lotes analizados del total) de un informe
+@api_publicaciones.route('/informes_impacto_temporal/<job_id>', methods=['GET'])
+@SerializeJson
+def estado_informe_endpoint(job_id):
+    try:
+        job = get_job_by_id(job_id)
+        if not job or job.get("tipo") != TIPO_INFORME:
+            return {"error": f"No se encontró ningún informe con ID {job_id}"}, 404
+        return resumen_job_informe(job), 200
+    except ValueError as ve:
+        return {"error": str(ve)}, 400
+    except Exception as e:
+        return {"error": f"Error al consultar el informe: {str(e)}"}, 500
 
-        conteo_por_dia = defaultdict(int)
-        for pub in publicaciones:
-            fecha_pub = pub.get("fecha")
-            if fecha_pub:
-                fecha_str = fecha_pub.date().isoformat()
-                conteo_por_dia[fecha_str] += 1
 
+# GET descarga del DOCX de un informe terminado
+@api_publicaciones.route('/informes_impacto_temporal/<job_id>/descarga', methods=['GET'])
+def descargar_informe_endpoint(job_id):
+    try:
+        job = get_job_by_id(job_id)
+        if not job or job.get("tipo") != TIPO_INFORME:
+            return {"error": f"No se encontró ningún informe con ID {job_id}"}, 404
+        if job["estado"] != "completado":
+            return {"error": f"El informe no está terminado (estado: {job['estado']})"}, 409
+
+        fichero, nombre = abrir_informe(job)
+        if fichero is None:
+            return {"error": "El fichero del informe ya no está disponible"}, 410
+        return send_file(fichero, as_attachment=True, download_name=nombre, mimetype=MIME_DOCX)
+    except ValueError as ve:
+        return {"error": str(ve)}, 400
+    except Exception as e:
+        return {"error": f"Error al descargar el informe: {str(e)}"}, 500
+
+
+def leer_filtros_informe():
+    """
+    Filtros del informe de impacto desde el cuerpo JSON o, si no hay, desde la query string.
+    """
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        return data
+    filtros = {campo: request.args.get(campo) for campo in CAMPOS_FILTROS}
+    filtros["keywordsRelacionadas"] = request.args.getlist("keywordsRelacionadas")
+    return filtros
+
+
+def leer_filtros_publicaciones(fechas_obligatorias=True):
+    """
+    Lee de la query string los filtros comunes de listados y series de publicaciones y
+    construye la query de Mongo. Devuelve (fecha_inicio, fecha_fin, query) o None
+    si faltan las fechas y son obligatorias.
+    """
+    fi = request.args.get("fechaInicio")
+    ff = request.args.get("fechaFin")
+    ci = request.args.get("concepto_interes")
+    ai = request.args.get("area_id")
+    fiu = request.args.get("fuente_id")
+    tone = request.args.get("tono")
+    kws = request.args.getlist("keywordsRelacionadas")
+    busq = request.args.get("busqueda_palabras")
+    pais = request.args.get("pais")
+    modo_busqueda = request.args.get("modo_busqueda", MODO_BUSQUEDA_DEFECTO).lower()
+    frase = request.args.get("frase", "false").lower() == "true"
+
+    if fechas_obligatorias and (not fi or not ff):
+        return None
+
+    fecha_inicio = datetime.fromisoformat(fi) if fi else None
+    fecha_fin = datetime.fromisoformat(ff) if ff else None
+
+    query = construir_query_publicaciones(
+        fecha_inicio=fecha_inicio,
+        fecha_fin=fecha_fin,
+        concepto_id=ObjectId(ci) if ci else None,
+        tono=TONO_MAP.get(tone.lower()) if tone else None,
+        keywords_relacionadas=[ObjectId(k) for k in kws] if kws else None,
+        busqueda_palabras=busq,
+        area_id=ObjectId(ai) if ai else None,
+        fuente_id=ObjectId(fiu) if fiu else None,
+        pais=pais,
+        modo_busqueda=modo_busqueda,
+        frase=frase
+    )
+    return fecha_inicio, fecha_fin, query
+
+
+def rango_dias(fecha_inicio, fecha_fin):
+    return [
+        (fecha_inicio + timedelta(days=i)).date().isoformat()
+        for i in range((fecha_fin - fecha_inicio).days + 1)
+    ]
+
+
+def serie_por_dia(valores, fecha_inicio, fecha_fin, decimales=None):
+    """
+    Serie {datoX, datoY} con todos los días del rango, con 0 en los días sin datos.
+    """
+    return [
+        {
+            "datoX": fecha,
+            "datoY": (round(valores[fecha], decimales) if decimales is not None else valores[fecha])
+            if fecha in valores else 0
+        }
+        for fecha in rango_dias(fecha_inicio, fecha_fin)
+    ]
 
-        # Crear el rango completo de fechas
-        rango_fechas = [
-            (fecha_inicio + timedelta(days=i)).date().isoformat()
-            for i in range((fecha_fin - fecha_inicio).days + 1)
-        ]
 
-        # Construir la lista con conteos, asegurando días sin publicaciones
-        datos_publicaciones_dia = [
-            {"datoX": fecha, "datoY": conteo_por_dia.get(fecha, 0)}
-            for fecha in rango_fechas
-]
+def serie_por_pais(valores):
+    return [
+        {"datoX": str(pais), "datoY": valor}
+        for pais, valor in sorted(valores.items())
+    ]
 
 
-        return datos_publicaciones_dia, 200
+@api_publicaciones.route('/publicaciones_dia', methods=['GET'])
+@SerializeJson
+def publicaciones_por_dia_endpoint():
+    try:
+        filtros = leer_filtros_publicaciones()
+        if filtros is None:
+            return {"error": "Los parámetros fechaInicio y fechaFin son obligatorios"}, 400
+        fecha_inicio, fecha_fin, query = filtros
+
+        # Construir la lista con conteos, asegurando días sin publicaciones
+        return serie_por_dia(contar_publicaciones_por_dia(query), fecha_inicio, fecha_fin), 200
 
     except ValueError as ve:
         return {"error": f"Parámetro inválido: {ve}"}, 400
@@ -373,57 +418,12 @@ def publicaciones_por_dia_endpoint():
 @SerializeJson
 def publicaciones_por_pais_endpoint():
     try:
-        fi = request.args.get("fechaInicio")
-        ff = request.args.get("fechaFin")
-        ci = request.args.get("concepto_interes")
-        ai = request.args.get("area_id")
-        fiu = request.args.get("fuente_id")
-        tone = request.args.get("tono")
-        kws = request.args.getlist("keywordsRelacionadas")
-        busq = request.args.get("busqueda_palabras")
-        pais = request.args.get("pais")
-
-        if not fi or not ff:
+        filtros = leer_filtros_publicaciones()
+        if filtros is None:
             return {"error": "Los parámetros fechaInicio y fechaFin son obligatorios"}, 400
+        _, _, query = filtros
 
-        fecha_inicio = datetime.fromisoformat(fi)
-        fecha_fin = datetime.fromisoformat(ff)
-
-        concepto_oid = ObjectId(ci) if ci else None
-        area_id = ObjectId(ai) if ai else None
-        fuente_id = ObjectId(fiu) if fiu else None
-        tono = TONO_MAP.get(tone.lower()) if tone else None
-        keywords = [ObjectId(k) for k in kws] if kws else None
-
-        publicaciones = filtrar_publicaciones(
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
-            tono=tono,
-            keywords_relacionadas=keywords,
-            busqueda_palabras=busq,
-            area_id=area_id,
-            fuente_id=fuente_id,
-            pais=pais
-        )
-
-        if concepto_oid:
-            publicaciones = [
-                pub for pub in publicaciones
-                if concepto_oid in pub.get("conceptos_relacionados_ids", [])
-            ]
-
-        conteo_por_pais = defaultdict(int)
-        for pub in publicaciones:
-            pais_pub = pub.get("pais") or "Desconocido"
-            conteo_por_pais[pais_pub] += 1
-
-        datos_publicaciones_pais = [
-            {"datoX": str(pais), "datoY": count}
-            for pais, count in conteo_por_pais.items()
-        ]
-        datos_publicaciones_pais.sort(key=lambda x: x["datoX"])
-
-        return datos_publicaciones_pais, 200
+        return serie_por_pais(contar_publicaciones_por_pais(query)), 200
 
     except ValueError as ve:
         return {"error": f"Parámetro inválido: {ve}"}, 400
@@ -436,69 +436,13 @@ def publicaciones_por_pais_endpoint():
 @SerializeJson
 def tono_medio_por_dia_endpoint():
     try:
-        fi = request.args.get("fechaInicio")
-        ff = request.args.get("fechaFin")
-        ci = request.args.get("concepto_interes")
-        ai = request.args.get("area_id")
-        fiu = request.args.get("fuente_id")
-        tone = request.args.get("tono")
-        kws = request.args.getlist("keywordsRelacionadas")
-        busq = request.args.get("busqueda_palabras")
-        pais = request.args.get("pais")
-
-        if not fi or not ff:
+        filtros = leer_filtros_publicaciones()
+        if filtros is None:
             return {"error": "Los parámetros fechaInicio y fechaFin son obligatorios"}, 400
-
-        fecha_inicio = datetime.fromisoformat(fi)
-        fecha_fin = datetime.fromisoformat(ff)
-
-        concepto_oid = ObjectId(ci) if ci else None
-        area_id = ObjectId(ai) if ai else None
-        fuente_id = ObjectId(fiu) if fiu else None
-        tono = TONO_MAP.get(tone.lower()) if tone else None
-        keywords = [ObjectId(k) for k in kws] if kws else None
-
-        publicaciones = filtrar_publicaciones(
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
-            tono=tono,
-            keywords_relacionadas=keywords,
-            busqueda_palabras=busq,
-            area_id=area_id,
-            fuente_id=fuente_id,
-            pais=pais
-        )
-
-        if concepto_oid:
-            publicaciones = [
-                pub for pub in publicaciones
-                if concepto_oid in pub.get("conceptos_relacionados_ids", [])
-            ]
-
-        tonos_por_dia = defaultdict(list)
-        for pub in publicaciones:
-            fecha_pub = pub.get("fecha")
-            tono_val = pub.get("tono")
-            if fecha_pub is not None and isinstance(tono_val, int):
-                fecha_str = fecha_pub.date().isoformat()
-                tonos_por_dia[fecha_str].append(tono_val)
-
-        rango_fechas = [
-            (fecha_inicio + timedelta(days=i)).date().isoformat()
-            for i in range((fecha_fin - fecha_inicio).days + 1)
-        ]
+        fecha_inicio, fecha_fin, query = filtros
 
         # Asegurar que todos los días estén representados, con promedio o 0
-        datos_tono_medio_dia = [
-            {
-                "datoX": fecha,
-                "datoY": round(sum(tonos_por_dia[fecha]) / len(tonos_por_dia[fecha]), 2)
-                if fecha in tonos_por_dia else 0
-            }
-            for fecha in rango_fechas
-]
-
-        return datos_tono_medio_dia, 200
+        return serie_por_dia(tono_medio_por_dia(query), fecha_inicio, fecha_fin, decimales=2), 200
 
     except ValueError as ve:
         return {"error": f"Parámetro inválido: {ve}"}, 400
@@ -512,58 +456,70 @@ def tono_medio_por_dia_endpoint():
 @SerializeJson
 def tono_medio_por_pais_endpoint():
     try:
-        fi = request.args.get("fechaInicio")
-        ff = request.args.get("fechaFin")
-        ci = request.args.get("concepto_interes")
-        ai = request.args.get("area_id")
-        fiu = request.args.get("fuente_id")
-        tone = request.args.get("tono")
-        kws = request.args.getlist("keywordsRelacionadas")
-        busq = request.args.get("busqueda_palabras")
-        pais = request.args.get("pais")
-
-        if not fi or not ff:
+        filtros = leer_filtros_publicaciones()
+        if filtros is None:
             return {"error": "Los parámetros fechaInicio y fechaFin son obligatorios"}, 400
+        _, _, query = filtros
 
-        fecha_inicio = datetime.fromisoformat(fi)
-        fecha_fin = datetime.fromisoformat(ff)
-
-        concepto_oid = ObjectId(ci) if ci else None
-        area_id = ObjectId(ai) if ai else None
-        fuente_id = ObjectId(fiu) if fiu else None
-        tono = TONO_MAP.get(tone.lower()) if tone else None
-        keywords = [ObjectId(k) for k in kws] if kws else None
-
-        publicaciones = filtrar_publicaciones(
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
-            tono=tono,
-            keywords_relacionadas=keywords,
-            busqueda_palabras=busq,
-            area_id=area_id,
-            fuente_id=fuente_id,
-            pais=pais
-        )
+        return serie_por_pais(tono_medio_por_pais(query)), 200
+
+    except ValueError as ve:
+        return {"error": f"Parámetro inválido: {ve}"}, 400
+    except Exception as e:
+        return {"error": f"Error inesperado: {e}"}, 500
+
+
+
+# Cuadro de mando completo (total, página y las cuatro series) en una sola consulta
+@api_publicaciones.route('/publicaciones_dashboard', methods=['GET'])
+@SerializeJson
+def publicaciones_dashboard_endpoint():
+    try:
+        filtros = leer_filtros_publicaciones()
+        if filtros is None:
+            return {"error": "Los parámetros fechaInicio y fechaFin son obligatorios"}, 400
+        fecha_inicio, fecha_fin, query = filtros
+
+        page = int(request.args.get("page", 1))
+        page_size = int(request.args.get("pageSize", 25))
+        if page < 1 or page_size < 1:
+            raise ValueError("page y pageSize deben ser mayores que 0")
+
+        dashboard = get_dashboard_publicaciones(query, skip=(page - 1) * page_size, limit=page_size)
+
+        return {
+            "total": dashboard["total"],
+            "publicaciones": enriquecer_listado_publicaciones(dashboard["publicaciones"]),
+            "publicaciones_dia": serie_por_dia(dashboard["publicaciones_dia"], fecha_inicio, fecha_fin),
+            "publicaciones_pais": serie_por_pais(dashboard["publicaciones_pais"]),
+            "tono_medio_dia": serie_por_dia(dashboard["tono_medio_dia"], fecha_inicio, fecha_fin, decimales=2),
+            "tono_medio_pais": serie_por_pais(dashboard["tono_medio_pais"]),
+        }, 200
+
+    except ValueError as ve:
+        return {"error": f"Parámetro inválido: {ve}"}, 400
+    except Exception as e:
+        return {"error": f"Error inesperado: {e}"}, 500
+
+
+# Búsqueda semántica sobre los embeddings guardados; admite los mismos filtros (fechas opcionales)
+@api_publicaciones.route('/publicaciones/semantic_search', methods=['GET'])
+@SerializeJson
+def semantic_search_endpoint():
+    try:
+        q = request.args.get("q", "").strip()
+        if not q:
+            return {"error": "Falta el parámetro 'q' con el texto a buscar."}, 400
+
+        top_k = int(request.args.get("top_k", 20))
+        if not 1 <= top_k <= 200:
+            raise ValueError("top_k debe estar entre 1 y 200")
+
+        _, _, query = leer_filtros_publicaciones(fechas_obligatorias=False)
+        publicaciones = buscar_publicaciones_similares(q, top_k=top_k, query=query)
+        enriquecer_listado_publicaciones(publicaciones)
 
-        if concepto_oid:
-            publicaciones = [
-                pub for pub in publicaciones
-                if concepto_oid in pub.get("conceptos_relacionados_ids", [])
-            ]
-
-        tonos_por_pais = defaultdict(list)
-        for pub in publicaciones:
-            pais_pub = pub.get("pais", "Desconocido")
-            tono_val = pub.get("tono")
-            if isinstance(tono_val, int):
-                tonos_por_pais[pais_pub].append(tono_val)
-
-        datos_tono_medio_pais = [
-            {"datoX": pais, "datoY": sum(tonos) / len(tonos)}
-            for pais, tonos in sorted(tonos_por_pais.items())
-        ]
-
-        return datos_tono_medio_pais, 200
+        return {"total": len(publicaciones), "publicaciones": publicaciones}, 200
 
     except ValueError as ve:
         return {"error": f"Parámetro inválido: {ve}"}, 400
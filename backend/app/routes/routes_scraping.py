@@ -1,37 +1,60 @@
+import logging
+
 from flask import Blueprint, request, jsonify
 
 from app.models.modelUtils.SerializeJson import SerializeJson
-from app.service.jobs.scraping_job import ejecutar_scraping, iniciar_scheduler_en_segundo_plano, detener_scheduler
+from app.service.jobs.scraping_job import encolar_scraping, resumen_job_scraping, TIPO_SCRAPING, iniciar_scheduler_en_segundo_plano, detener_scheduler
 from app.models.fuente import Fuente
 from app.mongo.mongo_fuentes import get_fuente_by_id  
+from app.mongo.mongo_jobs import get_job_by_id
 
 api_scraping = Blueprint('api_scraping', __name__)
 
 #Endpoints Scraping
 
-@api_scraping.route('/scraping', methods=['GET'])
+# POST encola un scraping de la fuente. GET se mantiene como alias obsoleto para los
+# clientes y crons existentes: encola el mismo trabajo y lo avisa en el log
+@api_scraping.route('/scraping', methods=['GET', 'POST'])
 @SerializeJson
 def scraping():
     try:
-        fuente_id = request.args.get("fuente_id")
+        if request.method == "GET":
+            logging.warning("⚠️ GET /api/scraping está obsoleto: usa POST para encolar el scraping.")
+        fuente_id = request.args.get("fuente_id") or (request.get_json(silent=True) or {}).get("fuente_id")
         if not fuente_id:
-            return {"error": "Falta el parámetro 'fuente_id' en la URL."}, 400
+            return {"error": "Falta el parámetro 'fuente_id' en la URL o en el cuerpo."}, 400
 
         fuente = get_fuente_by_id(fuente_id)
         if not fuente:
             return {"error": f"No se encontró ninguna fuente con ID {fuente_id}"}, 404
 
-        resultados = ejecutar_scraping(fuente)
+        # El scraping se ejecuta en segundo plano; el estado se consulta en /scraping/<job_id>
+        job_id = encolar_scraping(fuente)
 
         return {
             "success": True,
-            "mensaje": f"Scraping ejecutado para la fuente: {fuente.nombre}",
-            "resultados": resultados
-        }, 200
+            "mensaje": f"Scraping encolado para la fuente: {fuente.nombre}",
+            "job_id": job_id,
+            "estado_url": f"/api/scraping/{job_id}"
+        }, 202
     except Exception as e:
         return {"error": f"Error al ejecutar scraping: {str(e)}"}, 500
 
 
+@api_scraping.route('/scraping/<job_id>', methods=['GET'])
+@SerializeJson
+def estado_scraping(job_id):
+    try:
+        job = get_job_by_id(job_id)
+        if not job or job.get("tipo") != TIPO_SCRAPING:
+            return {"error": f"No se encontró ningún scraping con ID {job_id}"}, 404
+        return resumen_job_scraping(job), 200
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except Exception as e:
+        return {"error": f"Error al consultar el scraping: {str(e)}"}, 500
+
+
 @api_scraping.route("/scheduler/iniciar", methods=["POST"])
 def iniciar_scheduler():
     try:
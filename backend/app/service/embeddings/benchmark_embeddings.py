@@ -0,0 +1,138 @@
+# benchmark_embeddings.py
+# Paridad y rendimiento de los runtimes del modelo de embeddings (torch, onnx, onnx-int8).
+# Codifica los mismos textos con cada runtime y compara sus vectores con los de torch
+# (similitud coseno por texto) y su velocidad en textos por segundo.
+# Los umbrales de enlazado (0.83 - 0.85) son estrechos: antes de cambiar EMBEDDINGS_RUNTIME
+# en producción el coseno mínimo frente a torch debe superar --min-coseno.
+#
+# Ejecución manual (desde la carpeta backend):
+#   python -m app.service.embeddings.benchmark_embeddings [--textos 256] [--lote 32] [--min-coseno 0.99]
+#   python -m app.service.embeddings.benchmark_embeddings --sin-mongo   -> textos de ejemplo, sin BBDD
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from app.service.embeddings.embeddings import RUNTIMES, cargar_modelo
+
+TEXTOS_EJEMPLO = [
+    "El Gobierno aprueba un nuevo paquete de medidas contra los incendios forestales en Galicia.",
+    "La OTAN refuerza su presencia en el flanco oriental tras las maniobras rusas.",
+    "Ciberataque contra los sistemas informáticos de varios hospitales de Cataluña.",
+    "El Banco Central Europeo mantiene los tipos de interés sin cambios.",
+    "Detenidos cinco miembros de una red de narcotráfico en el puerto de Algeciras.",
+    "Nueva ola de calor con temperaturas superiores a 44 grados en el sur peninsular.",
+    "La ministra de Defensa visita a las tropas desplegadas en Líbano.",
+    "Inundaciones en Valencia obligan a evacuar a cientos de vecinos.",
+]
+
+
+def cargar_textos(num_textos, sin_mongo=False):
+    """
+    Textos como los que se codifican al enriquecer: "query: " + título y contenido de publicaciones.
+    """
+    if sin_mongo:
+        textos = [TEXTOS_EJEMPLO[i % len(TEXTOS_EJEMPLO)] for i in range(num_textos)]
+    else:
+        from app.mongo.mongo_utils import get_collection
+        from app.service.similarity_search.similarity_search import normalizar_texto
+        publicaciones = get_collection("publicaciones").aggregate([
+            {"$match": {"contenido": {"$nin": [None, ""]}}},
+            {"$sample": {"size": num_textos}},
+            {"$project": {"titulo": 1, "contenido": 1}},
+        ])
+        textos = [normalizar_texto(f"{p.get('titulo', '')}. {p['contenido']}") for p in publicaciones]
+    return ["query: " + t for t in textos]
+
+
+def tamano_modelo_mb(runtime, modelo):
+    if runtime == "torch":
+        return round(sum(p.numel() * p.element_size() for p in modelo.parameters()) / 2 ** 20, 1)
+    from app.service.embeddings.modelo_onnx import tamano_fichero_mb
+    return tamano_fichero_mb(cuantizado=runtime == "onnx-int8")
+
+
+def medir_runtime(runtime, textos, tamano_lote):
+    inicio = time.perf_counter()
+    modelo = cargar_modelo(runtime, respaldo=False)
+    carga = time.perf_counter() - inicio
+
+    # Calentamiento: la primera llamada incluye inicializaciones del runtime
+    modelo.encode(textos[:tamano_lote], batch_size=tamano_lote, normalize_embeddings=True)
+
+    inicio = time.perf_counter()
+    vectores = modelo.encode(textos, batch_size=tamano_lote, normalize_embeddings=True)
+    duracion = time.perf_counter() - inicio
+
+    # Latencia de una publicación sola (como en el modo inline del spider)
+    inicio = time.perf_counter()
+    for texto in textos[:16]:
+        modelo.encode([texto], normalize_embeddings=True)
+    latencia_individual = (time.perf_counter() - inicio) / min(len(textos), 16)
+
+    return np.asarray(vectores, dtype="float32"), {
+        "runtime": runtime,
+        "carga_seg": round(carga, 2),
+        "textos_por_seg": round(len(textos) / duracion, 1),
+        "latencia_individual_ms": round(1000 * latencia_individual, 1),
+        "tamano_modelo_mb": tamano_modelo_mb(runtime, modelo),
+    }
+
+
+def paridad(vectores, referencia):
+    # Vectores normalizados: el producto fila a fila es la similitud coseno
+    cosenos = np.sum(vectores * referencia, axis=1)
+    return {
+        "coseno_medio": round(float(np.mean(cosenos)), 5),
+        "coseno_minimo": round(float(np.min(cosenos)), 5),
+    }
+
+
+def benchmark(textos, runtimes=RUNTIMES, tamano_lote=32):
+    """
+    Mide cada runtime. El primero de la lista (torch por defecto) es la referencia de paridad.
+    """
+    medidas = []
+    referencia = None
+    for runtime in runtimes:
+        vectores, medida = medir_runtime(runtime, textos, tamano_lote)
+        if referencia is None:
+            referencia = vectores
+        medida.update(paridad(vectores, referencia))
+        medidas.append(medida)
+    return medidas
+
+
+if __name__ == "__main__":
+    from app.config import logqing_config, load_config_from_args
+
+    parser = argparse.ArgumentParser(description="Paridad y rendimiento de los runtimes de embeddings")
+    parser.add_argument("--textos", type=int, default=256)
+    parser.add_argument("--lote", type=int, default=32)
+    parser.add_argument("--min-coseno", type=float, default=0.99)
+    parser.add_argument("--runtimes", nargs="+", default=list(RUNTIMES), choices=RUNTIMES)
+    parser.add_argument("--sin-mongo", action="store_true")
+    args, _ = parser.parse_known_args()
+
+    logqing_config()
+    configuracion = load_config_from_args()
+    if not args.sin_mongo:
+        from app.mongo.mongo_utils import init_mongo
+        init_mongo(configuracion["MONGO_URI"])
+
+    textos = cargar_textos(args.textos, args.sin_mongo)
+    if not textos:
+        print("No hay publicaciones con contenido. Usa --sin-mongo para textos de ejemplo")
+        sys.exit(1)
+
+    medidas = benchmark(textos, args.runtimes, args.lote)
+    print(json.dumps(medidas, indent=2, ensure_ascii=False))
+
+    fuera_de_paridad = [m["runtime"] for m in medidas if m["coseno_minimo"] < args.min_coseno]
+    if fuera_de_paridad:
+        print(f"❌ Coseno mínimo por debajo de {args.min_coseno}: {', '.join(fuera_de_paridad)}")
+        sys.exit(1)
+    print(f"✅ Todos los runtimes superan un coseno mínimo de {args.min_coseno} frente a {medidas[0]['runtime']}")
@@ -0,0 +1,44 @@
+# cliente_embeddings.py
+# Cliente HTTP del servicio residente de embeddings (servidor_embeddings.py).
+# Mantiene una sesión con keep-alive para no abrir una conexión por petición.
+
+import base64
+import os
+
+import numpy as np
+import requests
+
+_sesion = requests.Session()
+
+
+# La configuración se lee al usarla: este módulo se importa antes de cargar el .env
+def host_servicio():
+    return os.getenv("EMBEDDINGS_HOST", "127.0.0.1")
+
+def puerto_servicio():
+    return int(os.getenv("EMBEDDINGS_PORT", 5055))
+
+
+def url_servicio(ruta=""):
+    return f"http://{host_servicio()}:{puerto_servicio()}{ruta}"
+
+
+def servicio_disponible(timeout=2):
+    """
+    Comprueba si el servicio de embeddings está levantado.
+    """
+    try:
+        return _sesion.get(url_servicio("/salud"), timeout=timeout).status_code == 200
+    except requests.RequestException:
+        return False
+
+
+def codificar_remoto(textos):
+    """
+    Envía los textos al servicio y devuelve una matriz float32 (n, dim) normalizada.
+    """
+    respuesta = _sesion.post(url_servicio("/codificar"), json={"textos": list(textos)}, timeout=float(os.getenv("EMBEDDINGS_TIMEOUT", 120)))
+    respuesta.raise_for_status()
+    data = respuesta.json()
+    vectores = np.frombuffer(base64.b64decode(data["vectores"]), dtype="float32")
+    return vectores.reshape(data["n"], data["dim"]).copy()
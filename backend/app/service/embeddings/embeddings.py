@@ -0,0 +1,132 @@
+# embeddings.py
+# Punto único para obtener embeddings semánticos de textos.
+# Según EMBEDDINGS_BACKEND se usa el servicio residente de embeddings (servidor_embeddings.py)
+# o se carga el modelo SentenceTransformer dentro del propio proceso.
+# Según EMBEDDINGS_RUNTIME el modelo se ejecuta con torch o con ONNX Runtime (modelo_onnx.py).
+
+import logging
+import os
+import threading
+
+import numpy as np
+from bson import Binary
+
+# Modelo de embeddings semánticos
+MODELO_EMBEDDINGS = "intfloat/multilingual-e5-base"
+
+RUNTIMES = ("torch", "onnx", "onnx-int8")
+
+_modelo = None
+# Runtime con el que se cargó realmente el modelo del proceso (torch si falló el ONNX)
+_runtime_modelo = None
+_lock_modelo = threading.Lock()
+
+
+def embeddings_backend():
+    """
+    "servicio" → usa el proceso residente por HTTP en localhost | "local" → carga el modelo en este proceso.
+    Se lee al usarlo: este módulo se importa antes de cargar el .env.
+    """
+    return os.getenv("EMBEDDINGS_BACKEND", "local").lower()
+
+
+def embeddings_runtime():
+    """
+    "torch" → SentenceTransformer con PyTorch | "onnx" → ONNX Runtime | "onnx-int8" → ONNX Runtime cuantizado
+    """
+    runtime = os.getenv("EMBEDDINGS_RUNTIME", "torch").lower()
+    if runtime not in RUNTIMES:
+        logging.warning(f"⚠️ EMBEDDINGS_RUNTIME '{runtime}' no válido. Se usa 'torch'.")
+        return "torch"
+    return runtime
+
+
+def cargar_modelo(runtime=None, respaldo=True):
+    """
+    Crea un modelo SentenceTransformer con el runtime indicado (por defecto, el configurado).
+    Si el modelo ONNX no se puede exportar o cargar, se recurre a torch (salvo respaldo=False).
+    """
+    return _cargar_modelo(runtime, respaldo)[0]
+
+
+def _cargar_modelo(runtime=None, respaldo=True):
+    """
+    Devuelve (modelo, runtime con el que se cargó).
+    """
+    # Importación diferida: torch y onnxruntime solo se cargan si realmente se usa el modelo local
+    from sentence_transformers import SentenceTransformer
+
+    runtime = runtime or embeddings_runtime()
+    if runtime != "torch":
+        from app.service.embeddings.modelo_onnx import cargar_modelo_onnx
+        try:
+            return cargar_modelo_onnx(cuantizado=runtime == "onnx-int8"), runtime
+        except Exception as e:
+            if not respaldo:
+                raise
+            logging.warning(f"⚠️ No se pudo cargar el modelo ONNX ({e}). Usando torch.")
+
+    logging.info(f"🧠 Cargando modelo de embeddings '{MODELO_EMBEDDINGS}' en el proceso...")
+    return SentenceTransformer(MODELO_EMBEDDINGS), "torch"
+
+
+def get_modelo():
+    """
+    Carga el modelo SentenceTransformer una sola vez por proceso.
+    """
+    global _modelo, _runtime_modelo
+    if _modelo is None:
+        with _lock_modelo:
+            if _modelo is None:
+                _modelo, _runtime_modelo = _cargar_modelo()
+    return _modelo
+
+
+def runtime_modelo():
+    """
+    Runtime del modelo cargado en este proceso (None si aún no se ha cargado).
+    """
+    return _runtime_modelo
+
+
+def codificar_local(textos):
+    embeddings = get_modelo().encode(list(textos), normalize_embeddings=True)
+    return np.asarray(embeddings, dtype="float32")
+
+
+def codificar_textos(textos):
+    """
+    Devuelve una matriz float32 (n, dim) con los embeddings normalizados de los textos.
+    Si el servicio de embeddings no responde, se recurre al modelo local.
+    """
+    textos = list(textos)
+    if not textos:
+        return np.zeros((0, 0), dtype="float32")
+
+    if embeddings_backend() == "servicio":
+        from app.service.embeddings.cliente_embeddings import codificar_remoto
+        try:
+            return codificar_remoto(textos)
+        except Exception as e:
+            logging.warning(f"⚠️ Servicio de embeddings no disponible ({e}). Usando modelo local.")
+
+    return codificar_local(textos)
+
+
+def empaquetar_embedding(vector):
+    """
+    Empaqueta un embedding para guardarlo en Mongo: float16 en binario BSON
+    (2 bytes por dimensión frente a los ~9 de un array de doubles).
+    """
+    return Binary(np.asarray(vector, dtype="float16").tobytes())
+
+
+def desempaquetar_embedding(valor):
+    """
+    Devuelve el embedding como vector float32. Admite el formato empaquetado y listas de floats.
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, bytes):
+        return np.frombuffer(valor, dtype="float16").astype("float32")
+    return np.asarray(valor, dtype="float32")
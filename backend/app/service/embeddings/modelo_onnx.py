@@ -0,0 +1,103 @@
+# modelo_onnx.py
+# Modelo de embeddings exportado a ONNX (opcionalmente cuantizado a int8) para ejecutarlo
+# con ONNX Runtime en CPU: menos latencia por lote y menos memoria que con torch.
+# Usa el backend ONNX de sentence-transformers (pip install "sentence-transformers[onnx]"),
+# así que la API (encode, normalización, pooling) es la misma que con el modelo torch.
+# El modelo se exporta una vez a disco y se reutiliza en los siguientes arranques.
+#
+# Exportación manual (desde la carpeta backend):
+#   python -m app.service.embeddings.modelo_onnx            -> exporta el modelo ONNX
+#   python -m app.service.embeddings.modelo_onnx --int8     -> exporta además la versión cuantizada
+
+import logging
+import os
+from pathlib import Path
+
+from app.service.embeddings.embeddings import MODELO_EMBEDDINGS
+
+# Directorio por defecto de los modelos exportados
+DIRECTORIO_MODELOS_DEFECTO = Path(__file__).resolve().parents[3] / "data" / "modelos"
+
+
+# La configuración se lee al usarla: este módulo se importa antes de cargar el .env
+def directorio_modelos() -> Path:
+    return Path(os.getenv("EMBEDDINGS_ONNX_DIR", DIRECTORIO_MODELOS_DEFECTO))
+
+def cuantizacion_onnx():
+    """
+    Conjunto de instrucciones para la cuantización int8: "arm64", "avx2", "avx512" o "avx512_vnni"
+    """
+    return os.getenv("EMBEDDINGS_ONNX_CUANTIZACION", "avx2").lower()
+
+
+def ruta_modelo_onnx(modelo=MODELO_EMBEDDINGS) -> Path:
+    return directorio_modelos() / modelo.replace("/", "__")
+
+
+def _buscar_fichero(ruta: Path, nombre):
+    """
+    Ruta relativa (como la espera model_kwargs["file_name"]) del fichero ONNX exportado, o None.
+    """
+    encontrado = next(ruta.rglob(nombre), None) if ruta.exists() else None
+    return encontrado.relative_to(ruta).as_posix() if encontrado else None
+
+
+def _nombre_cuantizado():
+    return f"model_qint8_{cuantizacion_onnx()}.onnx"
+
+
+def exportar_modelo_onnx(cuantizar=False, modelo=MODELO_EMBEDDINGS):
+    """
+    Exporta el modelo a ONNX (y su versión int8 si se pide) si no está ya en disco.
+    Devuelve la ruta relativa del fichero ONNX a usar.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    ruta = ruta_modelo_onnx(modelo)
+    if _buscar_fichero(ruta, "model.onnx") is None:
+        logging.info(f"📦 Exportando '{modelo}' a ONNX en {ruta}...")
+        SentenceTransformer(modelo, backend="onnx").save_pretrained(str(ruta))
+
+    if not cuantizar:
+        return _buscar_fichero(ruta, "model.onnx")
+
+    if _buscar_fichero(ruta, _nombre_cuantizado()) is None:
+        logging.info(f"📦 Cuantizando el modelo ONNX a int8 ({cuantizacion_onnx()})...")
+        exportado = SentenceTransformer(str(ruta), backend="onnx",
+                                        model_kwargs={"file_name": _buscar_fichero(ruta, "model.onnx")})
+        export_dynamic_quantized_onnx_model(exportado, cuantizacion_onnx(), str(ruta))
+    return _buscar_fichero(ruta, _nombre_cuantizado())
+
+
+def cargar_modelo_onnx(cuantizado=False, modelo=MODELO_EMBEDDINGS):
+    """
+    Carga el modelo ONNX (exportándolo la primera vez) con ONNX Runtime en CPU.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    fichero = exportar_modelo_onnx(cuantizado, modelo)
+    logging.info(f"🧠 Cargando modelo de embeddings ONNX '{fichero}'...")
+    return SentenceTransformer(str(ruta_modelo_onnx(modelo)), backend="onnx",
+                               model_kwargs={"file_name": fichero, "provider": "CPUExecutionProvider"})
+
+
+def tamano_fichero_mb(cuantizado=False, modelo=MODELO_EMBEDDINGS):
+    ruta = ruta_modelo_onnx(modelo)
+    fichero = _buscar_fichero(ruta, _nombre_cuantizado() if cuantizado else "model.onnx")
+    if fichero is None:
+        return None
+    # Los pesos de un modelo grande pueden ir en un fichero de datos externo junto al .onnx
+    principal = ruta / fichero
+    externos = principal.parent.glob(f"{principal.name}_data")
+    return round((principal.stat().st_size + sum(f.stat().st_size for f in externos)) / 2 ** 20, 1)
+
+
+if __name__ == "__main__":
+    import sys
+    from app.config import logqing_config, load_config_from_args
+
+    logqing_config()
+    load_config_from_args()
+    print(exportar_modelo_onnx(cuantizar=False))
+    if "--int8" in sys.argv:
+        print(exportar_modelo_onnx(cuantizar=True))
@@ -0,0 +1,127 @@
+# servidor_embeddings.py
+# Servicio residente de embeddings: carga el modelo una vez y atiende peticiones
+# HTTP en localhost, de forma que los procesos de scraping no tengan que cargar
+# torch ni el modelo cada vez que arrancan.
+#
+# Ejecución manual (desde la carpeta backend):
+#   python -m app.service.embeddings.servidor_embeddings
+
+import base64
+import json
+import logging
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from app.service.embeddings.cliente_embeddings import host_servicio, puerto_servicio, servicio_disponible
+from app.service.embeddings.embeddings import MODELO_EMBEDDINGS, codificar_local, get_modelo, runtime_modelo
+
+# Proceso del servicio lanzado desde esta aplicación (si lo hay)
+_proceso_servicio = None
+# El modelo se usa de forma secuencial: torch ya paraleliza cada lote internamente
+_lock_inferencia = threading.Lock()
+# Evita que varios hilos lancen el servicio a la vez
+_lock_lanzamiento = threading.Lock()
+
+
+class EmbeddingsHandler(BaseHTTPRequestHandler):
+
+    def _responder(self, status, body):
+        contenido = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(contenido)))
+        self.end_headers()
+        self.wfile.write(contenido)
+
+    def do_GET(self):
+        if self.path == "/salud":
+            self._responder(200, {"estado": "ok", "modelo": MODELO_EMBEDDINGS, "runtime": runtime_modelo()})
+        else:
+            self._responder(404, {"error": "Ruta no encontrada"})
+
+    def do_POST(self):
+        if self.path != "/codificar":
+            self._responder(404, {"error": "Ruta no encontrada"})
+            return
+        try:
+            longitud = int(self.headers.get("Content-Length", 0))
+            textos = json.loads(self.rfile.read(longitud)).get("textos", [])
+            if not isinstance(textos, list) or not all(isinstance(t, str) for t in textos):
+                self._responder(400, {"error": "'textos' debe ser una lista de strings"})
+                return
+
+            with _lock_inferencia:
+                vectores = codificar_local(textos)
+
+            self._responder(200, {
+                "n": int(vectores.shape[0]),
+                "dim": int(vectores.shape[1]) if vectores.ndim == 2 else 0,
+                "vectores": base64.b64encode(vectores.tobytes()).decode("ascii"),
+            })
+        except Exception as e:
+            logging.error(f"❌ Error codificando textos: {e}")
+            self._responder(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        # Silenciar el log por petición de http.server
+        pass
+
+
+def servir(host=None, port=None):
+    """
+    Carga el modelo y atiende peticiones hasta que se detiene el proceso.
+    """
+    host = host or host_servicio()
+    port = port or puerto_servicio()
+    get_modelo()
+    servidor = ThreadingHTTPServer((host, port), EmbeddingsHandler)
+    logging.info(f"🧠 Servicio de embeddings escuchando en http://{host}:{port}")
+    try:
+        servidor.serve_forever()
+    finally:
+        servidor.server_close()
+
+
+def lanzar_servicio_embeddings(espera_max=180):
+    """
+    Lanza el servicio de embeddings en un proceso aparte si no está ya levantado
+    y espera a que responda. Devuelve True si el servicio queda disponible.
+    """
+    with _lock_lanzamiento:
+        return _lanzar_servicio_embeddings(espera_max)
+
+
+def _lanzar_servicio_embeddings(espera_max):
+    global _proceso_servicio
+    if servicio_disponible():
+        return True
+
+    if _proceso_servicio is None or _proceso_servicio.poll() is not None:
+        logging.info("🚀 Lanzando servicio de embeddings en segundo plano...")
+        _proceso_servicio = subprocess.Popen(
+            [sys.executable, "-m", "app.service.embeddings.servidor_embeddings"],
+            cwd=Path(__file__).resolve().parents[3],
+        )
+
+    limite = time.time() + espera_max
+    while time.time() < limite:
+        if _proceso_servicio.poll() is not None:
+            logging.error(f"❌ El servicio de embeddings terminó con código {_proceso_servicio.returncode}")
+            return False
+        if servicio_disponible():
+            logging.info("✅ Servicio de embeddings disponible.")
+            return True
+        time.sleep(1)
+
+    logging.error("❌ El servicio de embeddings no respondió a tiempo.")
+    return False
+
+
+if __name__ == "__main__":
+    from app.config import logqing_config
+    logqing_config()
+    servir()
@@ -0,0 +1,269 @@
+# enriquecimiento_job.py
+# Enriquecimiento de publicaciones ya guardadas: embedding, enlace con conceptos y
+# keywords y análisis con LLM (resumen, tono y localización).
+# El spider solo inserta la publicación en bruto y encola un trabajo "enriquecimiento";
+# un conjunto de workers lo procesa aparte, de forma que la latencia del LLM no frena el rastreo.
+# Cada worker reclama los trabajos en micro-lotes (por tamaño o por tiempo de espera) para
+# codificar todas sus publicaciones en una sola llamada al modelo y buscar conceptos y
+# keywords con una búsqueda matricial.
+#
+# Los workers se lanzan con la aplicación Flask (ENRIQUECIMIENTO_WORKERS > 0) o a mano
+# desde la carpeta backend:
+#   python -m app.service.jobs.enriquecimiento_job
+
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.models.publicacion import Publicacion
+from app.mongo.mongo_jobs import encolar_job, reclamar_job, renovar_bloqueo_job, completar_job, fallar_job
+from app.mongo.mongo_publicaciones import get_publicacion_by_id, update_publicacion
+from app.service.embeddings.embeddings import empaquetar_embedding, embeddings_runtime
+from app.service.jobs.scraping_job import preparar_servicio_embeddings
+
+TIPO_ENRIQUECIMIENTO = "enriquecimiento"
+# Bloqueo de cada trabajo: se reclama con él y se renueva justo antes de enriquecer su publicación,
+# así los últimos trabajos de un lote no caducan mientras se procesan los anteriores
+SEGUNDOS_BLOQUEO_ENRIQUECIMIENTO = 600
+
+detener_workers_flag = threading.Event()
+
+# La configuración se lee al usarla: este módulo se importa antes de cargar el .env
+
+def enriquecimiento_en_cola():
+    """
+    "cola" → el spider encola el enriquecimiento | "inline" → se hace dentro del callback del spider
+    """
+    return os.getenv("ENRIQUECIMIENTO_MODO", "inline").lower() == "cola"
+
+def num_workers_enriquecimiento():
+    return int(os.getenv("ENRIQUECIMIENTO_WORKERS", 0))
+
+def guardar_embeddings():
+    return os.getenv("GUARDAR_EMBEDDINGS_PUBLICACIONES", "true").lower() == "true"
+
+def tamano_lote_enriquecimiento():
+    return max(int(os.getenv("ENRIQUECIMIENTO_LOTE", 16)), 1)
+
+def espera_lote_enriquecimiento():
+    """
+    Segundos máximos que un worker espera a completar un lote desde que reclama su primer trabajo
+    """
+    return float(os.getenv("ENRIQUECIMIENTO_LOTE_ESPERA_SEG", 2))
+
+
+# =========================
+# Enriquecimiento de publicaciones
+# =========================
+def preparar_lote(publicaciones):
+    """
+    Codifica las publicaciones en una sola llamada y busca sus candidatos en lote.
+    Devuelve, por publicación, (embedding, candidatos_conceptos, candidatos_keywords).
+    """
+    # Importación diferida: los workers solo cargan el stack de embeddings si se usan
+    from app.service.similarity_search.similarity_search import (
+        calcular_embeddings_publicaciones,
+        buscar_candidatos_lote
+    )
+
+    embeddings = calcular_embeddings_publicaciones(publicaciones)
+    candidatos_conceptos, candidatos_keywords = buscar_candidatos_lote(embeddings)
+    return list(zip(embeddings, candidatos_conceptos, candidatos_keywords))
+
+
+def enriquecer_publicacion(publicacion: Publicacion) -> bool:
+    """
+    Calcula el embedding, enlaza conceptos y keywords, analiza con LLM si está
+    relacionada y guarda el resultado. Devuelve True si la publicación quedó
+    relacionada con algún concepto.
+    """
+    embedding, candidatos_conceptos, candidatos_keywords = preparar_lote([publicacion])[0]
+    return completar_enriquecimiento(publicacion, embedding, candidatos_conceptos, candidatos_keywords)
+
+
+def completar_enriquecimiento(publicacion: Publicacion, embedding, candidatos_conceptos, candidatos_keywords) -> bool:
+    """
+    Parte por publicación del enriquecimiento, una vez calculados en lote su embedding y candidatos.
+    """
+    from app.service.similarity_search.similarity_search import (
+        buscar_y_enlazar_a_conceptos,
+        obtener_keywords_relacionadas
+    )
+    from app.service.llm.llm_utils import analizar_publicacion
+
+    conceptos_enlazados_ids = buscar_y_enlazar_a_conceptos(publicacion, candidatos=candidatos_conceptos)
+
+    keywords_relacionadas = obtener_keywords_relacionadas(publicacion, candidatos=candidatos_keywords)
+    if keywords_relacionadas:
+        logging.info(f"🔗 Keywords relacionadas encontradas ({len(keywords_relacionadas)}):")
+        for kw in keywords_relacionadas:
+            logging.info(f"🧠 {kw['nombre']} (similitud: {kw['similitud']})")
+    else:
+        logging.info("📭 No se encontraron keywords relacionadas con la publicación.")
+
+    publicacion.keywords_relacionadas_ids = [ObjectId(k["keyword_id"]) for k in keywords_relacionadas]
+
+    relacionada = bool(conceptos_enlazados_ids)
+    if relacionada:
+        publicacion.conceptos_relacionados_ids = conceptos_enlazados_ids
+        publicacion = analizar_publicacion(publicacion)
+    else:
+        publicacion.contenido = ""
+
+    datos_actualizados = {
+        "contenido": publicacion.contenido,
+        "tono": publicacion.tono,
+        "ciudad_region": str(publicacion.ciudad_region) if publicacion.ciudad_region else None,
+        "pais": str(publicacion.pais) if publicacion.pais else None,
+        "keywords_relacionadas_ids": publicacion.keywords_relacionadas_ids,
+        "conceptos_relacionados_ids": publicacion.conceptos_relacionados_ids
+    }
+    if guardar_embeddings():
+        # Para la búsqueda semántica (indice_publicaciones.py)
+        datos_actualizados["embedding"] = empaquetar_embedding(embedding)
+        datos_actualizados["embedding_runtime"] = embeddings_runtime()
+        datos_actualizados["embedding_actualizado"] = datetime.now()
+
+    update_publicacion(pub_id=publicacion._id, data=datos_actualizados)
+    return relacionada
+
+
+def encolar_enriquecimiento(pub_id):
+    max_intentos = int(os.getenv("ENRIQUECIMIENTO_MAX_INTENTOS", 3))
+    return encolar_job(TIPO_ENRIQUECIMIENTO, {"publicacion_id": str(pub_id)}, max_intentos=max_intentos)
+
+
+# =========================
+# Workers
+# =========================
+def publicacion_del_job(job):
+    """
+    Devuelve la publicación a enriquecer o None si ya no existe o no tiene contenido.
+    """
+    pub_id = job["payload"]["publicacion_id"]
+    pub_dict = get_publicacion_by_id(pub_id)
+    if not pub_dict:
+        logging.warning(f"⚠️ La publicación {pub_id} ya no existe. Se descarta el enriquecimiento.")
+        return None
+
+    publicacion = Publicacion.from_dict(pub_dict)
+    if not (publicacion.contenido or "").strip():
+        return None
+    return publicacion
+
+
+def reclamar_lote(nombre_worker):
+    """
+    Reclama hasta ENRIQUECIMIENTO_LOTE trabajos. Tras el primero espera como mucho
+    ENRIQUECIMIENTO_LOTE_ESPERA_SEG a que lleguen más, para no retrasar un lote incompleto.
+    """
+    tamano = tamano_lote_enriquecimiento()
+    lote = []
+    limite = None
+    while len(lote) < tamano and not detener_workers_flag.is_set():
+        job = reclamar_job(TIPO_ENRIQUECIMIENTO, nombre_worker, segundos_bloqueo=SEGUNDOS_BLOQUEO_ENRIQUECIMIENTO)
+        if job is not None:
+            lote.append(job)
+            limite = limite or time.time() + espera_lote_enriquecimiento()
+            continue
+        if not lote or time.time() >= limite:
+            break
+        detener_workers_flag.wait(timeout=min(0.2, max(limite - time.time(), 0)))
+    return lote
+
+
+def procesar_lote_enriquecimiento(jobs):
+    """
+    Enriquece las publicaciones de un lote de trabajos. La codificación y la búsqueda de
+    candidatos se hacen una vez para todo el lote; cada trabajo se completa o falla por separado.
+    """
+    pendientes = []
+    for job in jobs:
+        try:
+            publicacion = publicacion_del_job(job)
+        except Exception as e:
+            fallar_job(job, e)
+            continue
+        if publicacion is None:
+            completar_job(job["_id"], {"relacionada": False, "descartada": True})
+        else:
+            pendientes.append((job, publicacion))
+
+    if not pendientes:
+        return
+
+    try:
+        preparados = preparar_lote([publicacion for _, publicacion in pendientes])
+    except Exception as e:
+        for job, _ in pendientes:
+            fallar_job(job, e)
+        return
+
+    logging.info(f"📦 Lote de enriquecimiento codificado: {len(pendientes)} publicaciones")
+    for (job, publicacion), (embedding, candidatos_conceptos, candidatos_keywords) in zip(pendientes, preparados):
+        try:
+            if not renovar_bloqueo_job(job, SEGUNDOS_BLOQUEO_ENRIQUECIMIENTO):
+                logging.warning(f"⚠️ El job {job['_id']} ya no pertenece a este worker. Se omite.")
+                continue
+            logging.info(f"📰 Enriqueciendo: {publicacion.titulo[:60]}...")
+            relacionada = completar_enriquecimiento(publicacion, embedding, candidatos_conceptos, candidatos_keywords)
+            completar_job(job["_id"], {"relacionada": relacionada})
+        except Exception as e:
+            fallar_job(job, e)
+
+
+def worker_enriquecimiento(nombre_worker):
+    logging.info(f"👷 Worker de enriquecimiento '{nombre_worker}' iniciado.")
+    # Segundos de espera cuando la cola está vacía
+    espera = float(os.getenv("ENRIQUECIMIENTO_ESPERA_SEG", 5))
+    preparar_servicio_embeddings()
+    while not detener_workers_flag.is_set():
+        try:
+            lote = reclamar_lote(nombre_worker)
+        except Exception as e:
+            logging.error(f"❌ Error reclamando trabajos de enriquecimiento: {e}")
+            lote = []
+
+        if not lote:
+            detener_workers_flag.wait(timeout=espera)
+            continue
+
+        procesar_lote_enriquecimiento(lote)
+    logging.info(f"🎯 Worker de enriquecimiento '{nombre_worker}' finalizado.")
+
+
+def iniciar_workers_enriquecimiento(num_workers=None):
+    """
+    Lanza los workers de enriquecimiento en hilos en segundo plano.
+    """
+    if num_workers is None:
+        num_workers = num_workers_enriquecimiento()
+    detener_workers_flag.clear()
+    hilos = []
+    for i in range(num_workers):
+        nombre = f"{socket.gethostname()}-{os.getpid()}-{i}"
+        hilo = threading.Thread(target=worker_enriquecimiento, args=(nombre,), daemon=True)
+        hilo.start()
+        hilos.append(hilo)
+    return hilos
+
+
+def detener_workers_enriquecimiento():
+    detener_workers_flag.set()
+    logging.info("🛑 Señal enviada para detener los workers de enriquecimiento.")
+
+
+if __name__ == "__main__":
+    from app.config import logqing_config, load_config_from_args
+    from app.mongo.mongo_utils import init_mongo
+
+    logqing_config()
+    configuracion = load_config_from_args()
+    init_mongo(configuracion["MONGO_URI"])
+    for hilo in iniciar_workers_enriquecimiento(max(num_workers_enriquecimiento(), 1)):
+        hilo.join()
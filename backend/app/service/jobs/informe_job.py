@@ -0,0 +1,310 @@
+# informe_job.py
+# Generación de informes de impacto en segundo plano.
+# La API crea un trabajo "informe" en la colección jobs con los filtros y devuelve su id;
+# el informe se genera fuera de la petición, publica su progreso (lotes analizados del total)
+# y el DOCX resultante se guarda en GridFS (bucket "informes") para descargarlo después.
+# Los filtros se normalizan y se resumen en un hash: si ya hay un informe igual en curso
+# o terminado hace menos de INFORMES_VIGENCIA_HORAS, se reutiliza en lugar de generarlo otra vez.
+
+import hashlib
+import json
+import logging
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import gridfs
+from bson import ObjectId
+from gridfs.errors import NoFile
+from pymongo.errors import DuplicateKeyError
+
+from app.mongo.mongo_utils import get_db, get_collection
+from app.mongo.mongo_jobs import (
+    encolar_job, reclamar_job, completar_job, fallar_job, actualizar_contadores_job,
+    PENDIENTE, EN_CURSO, COMPLETADO
+)
+from app.mongo.mongo_publicaciones import filtrar_publicaciones, TONO_MAP
+
+TIPO_INFORME = "informe"
+BUCKET_INFORMES = "informes"
+MIME_DOCX = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+# Tiempo máximo de generación de un informe (en segundos)
+INFORME_TIMEOUT = 3600
+
+# Filtros admitidos (los mismos que /generar_informe_impacto_temporal)
+CAMPOS_FILTROS = (
+    "fechaInicio", "fechaFin", "concepto_interes", "area_id", "fuente_id",
+    "tono", "busqueda_palabras", "pais", "keywordsRelacionadas"
+)
+# Filtros que son listas de IDs (un cuerpo JSON puede mandarlos como texto separado por comas)
+CAMPOS_LISTA = ("keywordsRelacionadas",)
+
+# Los informes pedidos desde la API se generan fuera del hilo de la petición.
+# Cada informe ya hace varias llamadas al LLM en paralelo: se limitan los informes simultáneos
+_executor_informes = ThreadPoolExecutor(max_workers=2, thread_name_prefix="informes")
+
+
+# La configuración se lee al usarla: este módulo se importa antes de cargar el .env
+def vigencia_informes():
+    """
+    Tiempo durante el que un informe terminado se reutiliza para los mismos filtros
+    """
+    return timedelta(hours=float(os.getenv("INFORMES_VIGENCIA_HORAS", 24)))
+
+
+# =========================
+# Filtros
+# =========================
+def filtros_canonicos(filtros):
+    """
+    Normaliza los filtros: solo campos admitidos, sin valores vacíos y con las listas ordenadas,
+    de modo que dos peticiones equivalentes den el mismo hash.
+    """
+    canonicos = {}
+    for campo in CAMPOS_FILTROS:
+        valor = filtros.get(campo)
+        if campo in CAMPOS_LISTA and isinstance(valor, str):
+            valor = valor.split(",")
+        if isinstance(valor, (list, tuple)):
+            valor = sorted({str(v).strip() for v in valor if str(v).strip()})
+        elif valor is not None:
+            valor = str(valor).strip()
+        if valor:
+            canonicos[campo] = valor
+    if "tono" in canonicos:
+        canonicos["tono"] = canonicos["tono"].lower()
+    return canonicos
+
+
+def hash_filtros(filtros):
+    contenido = json.dumps(filtros_canonicos(filtros), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def validar_filtros(filtros):
+    """
+    Comprueba los filtros antes de encolar el informe. Lanza ValueError si no son válidos.
+    """
+    if not filtros.get("fechaInicio") or not filtros.get("fechaFin"):
+        raise ValueError("Los parámetros fechaInicio y fechaFin son obligatorios")
+    if not filtros.get("area_id"):
+        raise ValueError("Se requiere un área de trabajo (area_id) para el análisis.")
+    datetime.fromisoformat(filtros["fechaInicio"])
+    datetime.fromisoformat(filtros["fechaFin"])
+    for campo in ("concepto_interes", "area_id", "fuente_id"):
+        if filtros.get(campo) and not ObjectId.is_valid(filtros[campo]):
+            raise ValueError(f"{campo} no es un ID válido")
+    if any(not ObjectId.is_valid(k) for k in filtros.get("keywordsRelacionadas", [])):
+        raise ValueError("keywordsRelacionadas contiene IDs no válidos")
+
+
+def publicaciones_para_informe(filtros):
+    """
+    Publicaciones que entran en el informe de impacto según los filtros (formato de la API).
+    """
+    ci = filtros.get("concepto_interes")
+    kws = filtros.get("keywordsRelacionadas")
+    tone = filtros.get("tono")
+
+    publicaciones = filtrar_publicaciones(
+        fecha_inicio=datetime.fromisoformat(filtros["fechaInicio"]),
+        fecha_fin=datetime.fromisoformat(filtros["fechaFin"]),
+        tono=TONO_MAP.get(tone.lower()) if tone else None,
+        keywords_relacionadas=[ObjectId(k) for k in kws] if kws else None,
+        busqueda_palabras=filtros.get("busqueda_palabras"),
+        area_id=ObjectId(filtros["area_id"]) if filtros.get("area_id") else None,
+        fuente_id=ObjectId(filtros["fuente_id"]) if filtros.get("fuente_id") else None,
+        pais=filtros.get("pais")
+    )
+
+    if ci:
+        concepto_oid = ObjectId(ci)
+        publicaciones = [
+            pub for pub in publicaciones
+            if concepto_oid in pub.get("conceptos_relacionados_ids", [])
+        ]
+    return publicaciones
+
+
+def filtros_para_documento(filtros):
+    """
+    Filtros con el formato que espera generar_informe_impacto_temporal para la sección de datos.
+    """
+    return {
+        "concepto_interes": filtros.get("concepto_interes"),
+        "area_id": filtros.get("area_id"),
+        "fuente_id": filtros.get("fuente_id"),
+        "tono": filtros.get("tono"),
+        "busqueda_palabras": filtros.get("busqueda_palabras"),
+        "pais": filtros.get("pais"),
+        "keywordsRelacionadas": filtros.get("keywordsRelacionadas", [])
+    }
+
+
+# =========================
+# Trabajos
+# =========================
+def buscar_informe_reutilizable(hash_informe):
+    """
+    Trabajo con el mismo hash de filtros que sigue en cola, en curso o terminado y vigente.
+    """
+    return get_collection("jobs").find_one(
+        {
+            "tipo": TIPO_INFORME,
+            "payload.hash": hash_informe,
+            "$or": [
+                {"estado": {"$in": [PENDIENTE, EN_CURSO]}},
+                {"estado": COMPLETADO, "finalizado": {"$gte": datetime.now() - vigencia_informes()}},
+            ],
+        },
+        sort=[("creado", -1)],
+    )
+
+
+def solicitar_informe(filtros):
+    """
+    Devuelve (job_id, reutilizado). Si no hay un informe reutilizable para los filtros,
+    encola uno nuevo y lo lanza en segundo plano.
+    """
+    filtros = filtros_canonicos(filtros)
+    validar_filtros(filtros)
+    hash_informe = hash_filtros(filtros)
+
+    existente = buscar_informe_reutilizable(hash_informe)
+    if existente:
+        logging.info(f"♻️ Informe reutilizado para los mismos filtros: {existente['_id']}")
+        if existente["estado"] != COMPLETADO:
+            # Por si el proceso que lo encoló se reinició: la cola lo retoma (o lo reclama al caducar su bloqueo)
+            _executor_informes.submit(procesar_cola_informes)
+        return str(existente["_id"]), True
+
+    try:
+        job_id = encolar_job(
+            TIPO_INFORME, {"filtros": filtros, "hash": hash_informe},
+            max_intentos=1, clave_unica=f"{TIPO_INFORME}:{hash_informe}"
+        )
+    except DuplicateKeyError:
+        # Otra petición con los mismos filtros lo encoló entre la búsqueda y la inserción
+        existente = buscar_informe_reutilizable(hash_informe)
+        if existente is None:
+            raise
+        logging.info(f"♻️ Informe reutilizado para los mismos filtros: {existente['_id']}")
+        return str(existente["_id"]), True
+    _executor_informes.submit(procesar_cola_informes)
+    return job_id, False
+
+
+def reanudar_informes_pendientes():
+    """
+    Al arrancar la aplicación, retoma los informes que quedaron en cola o a medias
+    (p. ej. por un reinicio) sin esperar a que alguien los vuelva a pedir.
+    """
+    pendientes = get_collection("jobs").count_documents({"tipo": TIPO_INFORME, "estado": {"$in": [PENDIENTE, EN_CURSO]}})
+    if pendientes:
+        logging.info(f"📝 Retomando {pendientes} informes pendientes en segundo plano...")
+        _executor_informes.submit(procesar_cola_informes)
+    return pendientes
+
+
+def procesar_cola_informes():
+    """
+    Genera los informes pendientes hasta vaciar la cola.
+    """
+    worker = f"{socket.gethostname()}-{os.getpid()}-informes"
+    while True:
+        try:
+            job = reclamar_job(TIPO_INFORME, worker, segundos_bloqueo=INFORME_TIMEOUT)
+        except Exception as e:
+            logging.error(f"❌ Error reclamando trabajos de informe: {e}")
+            return
+        if job is None:
+            return
+
+        try:
+            completar_job(job["_id"], generar_informe(job))
+        except Exception as e:
+            fallar_job(job, e)
+
+
+def generar_informe(job):
+    # Importación diferida: el stack del LLM y python-docx solo se cargan al generar informes
+    from app.service.llm.llm_utils import generar_informe_impacto_temporal
+
+    filtros = job["payload"]["filtros"]
+    publicaciones = publicaciones_para_informe(filtros)
+    logging.info(f"📝 Generando informe {job['_id']} con {len(publicaciones)} publicaciones...")
+
+    def progreso(lotes_hechos, total_lotes):
+        actualizar_contadores_job(job["_id"], {
+            "publicaciones": len(publicaciones),
+            "lotes_hechos": lotes_hechos,
+            "lotes_totales": total_lotes,
+        })
+
+    word_file = generar_informe_impacto_temporal(
+        publicaciones, filtros["area_id"], filtros_para_documento(filtros), progreso=progreso
+    )
+
+    nombre = f"informe_impacto_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"
+    archivo_id = gridfs.GridFS(get_db(), collection=BUCKET_INFORMES).put(
+        word_file.getvalue(),
+        filename=nombre,
+        contentType=MIME_DOCX,
+        job_id=str(job["_id"]),
+        hash=job["payload"]["hash"],
+    )
+    eliminar_informes_anteriores(job["payload"]["hash"], conservar=archivo_id)
+    return {"archivo_id": str(archivo_id), "nombre": nombre, "publicaciones": len(publicaciones)}
+
+
+def eliminar_informes_anteriores(hash_informe, conservar):
+    """
+    Borra de GridFS los DOCX anteriores generados con los mismos filtros.
+    """
+    fs = gridfs.GridFS(get_db(), collection=BUCKET_INFORMES)
+    for anterior in fs.find({"hash": hash_informe, "_id": {"$ne": conservar}}):
+        fs.delete(anterior._id)
+
+
+def abrir_informe(job):
+    """
+    Devuelve (fichero, nombre) del DOCX de un informe completado. El fichero se lee como un stream.
+    """
+    resultado = job.get("resultado") or {}
+    if job.get("estado") != COMPLETADO or not resultado.get("archivo_id"):
+        return None, None
+    fs = gridfs.GridFS(get_db(), collection=BUCKET_INFORMES)
+    try:
+        return fs.get(ObjectId(resultado["archivo_id"])), resultado.get("nombre")
+    except NoFile:
+        return None, None
+
+
+def resumen_job_informe(job):
+    """
+    Estado de un trabajo de informe tal y como lo devuelve la API.
+    """
+    duracion = None
+    if job.get("iniciado"):
+        duracion = ((job.get("finalizado") or datetime.now()) - job["iniciado"]).total_seconds()
+
+    contadores = job.get("contadores") or {}
+    resultado = job.get("resultado") or {}
+    lotes_totales = contadores.get("lotes_totales")
+    job_id = str(job["_id"])
+    return {
+        "job_id": job_id,
+        "estado": job["estado"],
+        "filtros": job["payload"].get("filtros"),
+        "publicaciones": resultado.get("publicaciones", contadores.get("publicaciones")),
+        "lotes_hechos": contadores.get("lotes_hechos", 0),
+        "lotes_totales": lotes_totales,
+        "progreso": round(100 * contadores.get("lotes_hechos", 0) / lotes_totales, 1) if lotes_totales else None,
+        "creado": job.get("creado"),
+        "iniciado": job.get("iniciado"),
+        "finalizado": job.get("finalizado"),
+        "duracion_segundos": round(duracion, 1) if duracion is not None else None,
+        "error": job.get("error"),
+        "descarga_url": f"/api/informes_impacto_temporal/{job_id}/descarga" if job["estado"] == COMPLETADO else None,
+    }
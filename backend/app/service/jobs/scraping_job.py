@@ -6,29 +6,59 @@ import time
 import threading
 import subprocess
 import random
+import socket
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from app.mongo.mongo_utils import get_collection
+from app.mongo.mongo_fuentes import get_fuente_by_id
+from app.mongo.mongo_jobs import encolar_job, reclamar_job, completar_job, fallar_job
 from app.models.fuente import Fuente
+from app.service.embeddings.embeddings import embeddings_backend
+from app.service.embeddings.servidor_embeddings import lanzar_servicio_embeddings
 
 # Frecuencia base para ejecutar scraping (en minutos)
 SCRAPING_FREQ_MIN = os.getenv("SCRAPING_FREQUENCY", 40)
+# Tiempo máximo de scraping de una fuente (en segundos)
+SCRAPING_TIMEOUT_FUENTE = 1200
+TIPO_SCRAPING = "scraping"
 detener_flag = threading.Event()
 
+# Los scrapings pedidos desde la API se ejecutan de uno en uno fuera del hilo de la petición
+_executor_scraping = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scraping")
+
+# La configuración propia del scraping se lee al usarla: este módulo se importa antes de cargar el .env
+def modo_scraping():
+    """
+    "conjunto" → todas las fuentes en un único proceso de Scrapy | "individual" → un proceso por fuente
+    """
+    return os.getenv("SCRAPING_MODO", "conjunto").lower()
+
+def timeout_scraping_conjunto():
+    """
+    Tiempo máximo de un ciclo completo en modo conjunto (en segundos)
+    """
+    return int(os.getenv("SCRAPING_TIMEOUT_CONJUNTO", 3600))
+
 # =========================
 # Ejecuta el script spider_executor.py pasando la URL como argumento
 # =========================
-def ejecutar_scraping(fuente: Fuente):
+def ejecutar_scraping(fuente: Fuente, job_id=None):
     """
     Ejecuta el proceso de scraping para una instancia de Fuente.
+    Si se indica job_id, el spider publica sus contadores en ese trabajo.
     """
     logging.info(f" 🕷️ Ejecutando scraping para: {fuente.nombre} ({fuente.url})")
+    preparar_servicio_embeddings()
     fuente_json = json.dumps(fuente.to_dict())
+    argumentos = [sys.executable, "app/service/spiders/spider_executor.py", fuente_json]
+    if job_id:
+        argumentos += ["--job", str(job_id)]
     try:
         subprocess.run(
-            [sys.executable, "app/service/spiders/spider_executor.py", fuente_json],
+            argumentos,
             env=os.environ.copy(),
             check=True,
-            timeout=1200  # Si tarda más de 20 minutos, se aborta
+            timeout=SCRAPING_TIMEOUT_FUENTE  # Si tarda más de 20 minutos, se aborta
         )
     except subprocess.CalledProcessError as e:
         logging.error(f"❌ Scraping falló con código {e.returncode}")
@@ -39,16 +69,124 @@ def ejecutar_scraping(fuente: Fuente):
 
 
 # =========================
-# Ejecuta scraping para todas las fuentes guardadas en MongoDB
+# Scraping asíncrono desde la API: se encola un job y se consulta su estado
+# =========================
+def encolar_scraping(fuente: Fuente):
+    """
+    Crea un trabajo de scraping para la fuente y lo lanza en segundo plano.
+    Devuelve el id del trabajo.
+    """
+    job_id = encolar_job(TIPO_SCRAPING, {"fuente_id": str(fuente._id), "fuente": fuente.nombre}, max_intentos=1)
+    _executor_scraping.submit(procesar_cola_scraping)
+    return job_id
+
+
+def procesar_cola_scraping():
+    """
+    Ejecuta los trabajos de scraping pendientes hasta vaciar la cola.
+    """
+    worker = f"{socket.gethostname()}-{os.getpid()}-scraping"
+    while True:
+        try:
+            job = reclamar_job(TIPO_SCRAPING, worker, segundos_bloqueo=SCRAPING_TIMEOUT_FUENTE + 300)
+        except Exception as e:
+            logging.error(f"❌ Error reclamando trabajos de scraping: {e}")
+            return
+        if job is None:
+            return
+
+        try:
+            fuente = get_fuente_by_id(job["payload"]["fuente_id"])
+            if not fuente:
+                raise RuntimeError(f"No se encontró ninguna fuente con ID {job['payload']['fuente_id']}")
+            ejecutar_scraping(fuente, job_id=job["_id"])
+            completar_job(job["_id"])
+        except Exception as e:
+            fallar_job(job, e)
+
+
+def resumen_job_scraping(job):
+    """
+    Estado de un trabajo de scraping tal y como lo devuelve la API.
+    """
+    duracion = None
+    if job.get("iniciado"):
+        duracion = ((job.get("finalizado") or datetime.now()) - job["iniciado"]).total_seconds()
+
+    contadores = job.get("contadores") or {}
+    return {
+        "job_id": str(job["_id"]),
+        "estado": job["estado"],
+        "fuente_id": job["payload"].get("fuente_id"),
+        "fuente": job["payload"].get("fuente"),
+        "total_guardados": contadores.get("guardados", 0),
+        "total_ignorados": contadores.get("ignorados", 0),
+        "total_relacionados": contadores.get("relacionados", 0),
+        "total_errores": contadores.get("errores", 0),
+        "creado": job.get("creado"),
+        "iniciado": job.get("iniciado"),
+        "finalizado": job.get("finalizado"),
+        "duracion_segundos": round(duracion, 1) if duracion is not None else None,
+        "error": job.get("error"),
+    }
+
+
+# =========================
+# Levanta (si hace falta) el servicio de embeddings compartido por los spiders
+# =========================
+def preparar_servicio_embeddings():
+    """
+    Con EMBEDDINGS_BACKEND=servicio, asegura que el servicio residente está levantado
+    para que cada proceso de spider no tenga que cargar el modelo.
+    """
+    if embeddings_backend() != "servicio":
+        return
+    if not lanzar_servicio_embeddings():
+        logging.warning("⚠️ Sin servicio de embeddings: cada spider cargará el modelo en su proceso.")
+
+
+# =========================
+# Ejecuta en un único proceso de Scrapy todas las fuentes de noticias activas
+# =========================
+def ejecutar_scraping_conjunto():
+    """
+    Lanza spider_executor.py en modo --todas: un solo intérprete, un solo reactor
+    y una sola carga del modelo para todas las fuentes, rastreadas en paralelo.
+    """
+    logging.info(" 🕷️ Ejecutando scraping conjunto de todas las fuentes activas")
+    preparar_servicio_embeddings()
+    try:
+        subprocess.run(
+            [sys.executable, "app/service/spiders/spider_executor.py", "--todas"],
+            env=os.environ.copy(),
+            check=True,
+            timeout=timeout_scraping_conjunto()
+        )
+    except subprocess.CalledProcessError as e:
+        logging.error(f"❌ Scraping conjunto falló con código {e.returncode}")
+    except Exception as e:
+        logging.error(f"💥 Error ejecutando scraping conjunto: {e}")
+
+
+# =========================
+# Ejecuta scraping para todas las fuentes activas guardadas en MongoDB
 # =========================
 def scraping_todas_las_fuentes():
-    fuentes = list(get_collection("fuentes").find())
-    for fuente_dict in fuentes:
+    fuentes = [Fuente.from_dict(f) for f in get_collection("fuentes").find({"activa": {"$ne": False}})]
+
+    if modo_scraping() == "conjunto":
+        ejecutar_scraping_conjunto()
+        # Telegram usa otro reactor (asyncio + Playwright): se sigue lanzando por separado
+        fuentes = [f for f in fuentes if f.es_telegram()]
+
+    for fuente in fuentes:
         if detener_flag.is_set():
             logging.info("🛑 Detención solicitada. Cancelando scraping de fuentes.")
             break
-        fuente = Fuente.from_dict(fuente_dict)
-        ejecutar_scraping(fuente)
+        try:
+            ejecutar_scraping(fuente)
+        except RuntimeError as e:
+            logging.error(f"❌ {e}")
 
 # =========================
 # Bucle principal del scheduler: ejecuta el scraping cada X minutos con variación aleatoria
@@ -0,0 +1,140 @@
+# cache_llm.py
+# Caché de respuestas del LLM en la colección "llm_cache", direccionada por contenido:
+# la clave es un hash de modelo + mensajes + temperatura, así que un mismo prompt
+# (artículo republicado, la misma publicación evaluada contra el mismo concepto, un
+# informe regenerado con los mismos filtros) no vuelve a pagarse en latencia ni en coste.
+# Las entradas caducan con un índice TTL sobre "expira" y, si se supera el máximo de
+# entradas, se eliminan las menos usadas recientemente.
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from pymongo.errors import PyMongoError
+
+from app.mongo.mongo_utils import get_collection
+
+COLECCION_CACHE = "llm_cache"
+# Cada cuántas escrituras se comprueba el tamaño de la caché
+ESCRITURAS_ENTRE_PODAS = 100
+
+_contadores = {"aciertos": 0, "fallos": 0, "guardadas": 0, "descartadas": 0, "errores": 0}
+_lock_contadores = threading.Lock()
+
+
+# La configuración se lee al usarla: este módulo se importa antes de cargar el .env
+def cache_llm_activa():
+    return os.getenv("LLM_CACHE_ACTIVA", "true").lower() == "true"
+
+def ttl_cache_llm():
+    return timedelta(hours=float(os.getenv("LLM_CACHE_TTL_HORAS", 168)))
+
+def max_entradas_cache_llm():
+    return int(os.getenv("LLM_CACHE_MAX_ENTRADAS", 50000))
+
+
+def _contar(nombre):
+    with _lock_contadores:
+        _contadores[nombre] += 1
+
+
+def clave_cache(modelo, messages, temperature):
+    contenido = json.dumps(
+        {"modelo": modelo, "messages": messages, "temperature": temperature},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def leer_respuesta(modelo, messages, temperature):
+    """
+    Devuelve la respuesta guardada para el prompt o None. Un error de Mongo cuenta como fallo.
+    """
+    ahora = datetime.now()
+    try:
+        entrada = get_collection(COLECCION_CACHE).find_one_and_update(
+            {"_id": clave_cache(modelo, messages, temperature), "expira": {"$gt": ahora}},
+            {"$set": {"ultimo_acceso": ahora}, "$inc": {"accesos": 1}},
+            projection={"respuesta": 1},
+        )
+    except PyMongoError as e:
+        logging.warning(f"⚠️ No se pudo leer la caché del LLM: {e}")
+        _contar("errores")
+        entrada = None
+
+    _contar("aciertos" if entrada else "fallos")
+    return entrada["respuesta"] if entrada else None
+
+
+def guardar_respuesta(modelo, messages, temperature, respuesta):
+    ahora = datetime.now()
+    try:
+        get_collection(COLECCION_CACHE).replace_one(
+            {"_id": clave_cache(modelo, messages, temperature)},
+            {
+                "modelo": modelo,
+                "respuesta": respuesta,
+                "creado": ahora,
+                "ultimo_acceso": ahora,
+                "expira": ahora + ttl_cache_llm(),
+                "accesos": 0,
+            },
+            upsert=True,
+        )
+    except PyMongoError as e:
+        logging.warning(f"⚠️ No se pudo guardar en la caché del LLM: {e}")
+        _contar("errores")
+        return
+
+    _contar("guardadas")
+    if _contadores["guardadas"] % ESCRITURAS_ENTRE_PODAS == 0:
+        podar_cache()
+
+
+def descartar_respuesta(modelo, messages, temperature):
+    """
+    Elimina una respuesta guardada, p. ej. cuando no se ha podido interpretar y se va a reintentar.
+    """
+    try:
+        resultado = get_collection(COLECCION_CACHE).delete_one({"_id": clave_cache(modelo, messages, temperature)})
+        if resultado.deleted_count:
+            _contar("descartadas")
+    except PyMongoError as e:
+        logging.warning(f"⚠️ No se pudo descartar la entrada de la caché del LLM: {e}")
+
+
+def podar_cache():
+    """
+    Si la caché supera LLM_CACHE_MAX_ENTRADAS, elimina las entradas con el acceso más antiguo.
+    """
+    coleccion = get_collection(COLECCION_CACHE)
+    try:
+        sobrantes = coleccion.estimated_document_count() - max_entradas_cache_llm()
+        if sobrantes <= 0:
+            return 0
+        ids = [d["_id"] for d in coleccion.find({}, {"_id": 1}).sort("ultimo_acceso", 1).limit(sobrantes)]
+        eliminadas = coleccion.delete_many({"_id": {"$in": ids}}).deleted_count
+        logging.info(f"🧹 Caché del LLM podada: {eliminadas} entradas eliminadas")
+        return eliminadas
+    except PyMongoError as e:
+        logging.warning(f"⚠️ No se pudo podar la caché del LLM: {e}")
+        return 0
+
+
+def estadisticas_cache_llm():
+    """
+    Contadores de este proceso desde su arranque y tamaño actual de la caché.
+    """
+    with _lock_contadores:
+        contadores = dict(_contadores)
+    consultas = contadores["aciertos"] + contadores["fallos"]
+    contadores["tasa_aciertos"] = round(contadores["aciertos"] / consultas, 4) if consultas else None
+    contadores["activa"] = cache_llm_activa()
+    try:
+        contadores["entradas"] = get_collection(COLECCION_CACHE).estimated_document_count()
+    except PyMongoError:
+        contadores["entradas"] = None
+    return contadores
@@ -0,0 +1,120 @@
+# cliente_llm.py
+# Clientes de la API de OpenAI compartidos por todo el proceso.
+# Se crea un cliente por backend (OpenAI u OpenRouter, según USE_OPEN_ROUTER) la primera
+# vez que se usa y se reutiliza después: su pool de conexiones httpx mantiene las
+# conexiones abiertas (keep-alive), de modo que cada petición no paga un nuevo handshake TLS.
+# El cliente de OpenAI es seguro entre hilos, así que los workers lo comparten.
+
+import logging
+import os
+import threading
+
+import httpx
+from dotenv import load_dotenv
+from openai import OpenAI
+
+URL_OPEN_ROUTER = "https://openrouter.ai/api/v1"
+
+# Clientes creados en este proceso, por (backend, api_key)
+_clientes = {}
+_lock_clientes = threading.Lock()
+_env_cargado = False
+
+
+# La configuración se lee al usarla: este módulo se importa antes de cargar el .env
+def backend_llm():
+    """
+    "openrouter" si USE_OPEN_ROUTER=true (por límites de uso de OpenAI) | "openai" en otro caso
+    """
+    return "openrouter" if os.getenv("USE_OPEN_ROUTER", "false").lower() == "true" else "openai"
+
+def modelo_llm():
+    model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+    # OpenRouter necesita el proveedor como prefijo del modelo
+    return f"openai/{model}" if backend_llm() == "openrouter" else model
+
+def max_conexiones():
+    return int(os.getenv("LLM_MAX_CONEXIONES", 20))
+
+def max_conexiones_keepalive():
+    return int(os.getenv("LLM_MAX_CONEXIONES_KEEPALIVE", 10))
+
+def timeout_llm():
+    """
+    Segundos máximos por petición (la conexión tiene su propio límite, más corto)
+    """
+    return float(os.getenv("LLM_TIMEOUT", 120))
+
+def max_reintentos_llm():
+    return int(os.getenv("LLM_MAX_REINTENTOS", 2))
+
+
+def _cargar_env_una_vez():
+    # Los procesos que no cargan la configuración (spider) leen el .env una sola vez, no en cada llamada
+    global _env_cargado
+    if not _env_cargado:
+        load_dotenv()
+        _env_cargado = True
+
+
+def _api_key(backend):
+    if backend == "openrouter":
+        api_key = os.getenv("OPEN_ROUTER_API_KEY")
+        if not api_key:
+            raise Exception("❌ Falta la variable OPEN_ROUTER_API_KEY en el entorno.")
+        return api_key
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key or not api_key.startswith("sk-"):
+        raise Exception("❌ Falta la variable OPENAI_API_KEY en el entorno.")
+    return api_key
+
+
+def _crear_cliente(backend, api_key):
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=max_conexiones(),
+            max_keepalive_connections=max_conexiones_keepalive(),
+            keepalive_expiry=60,
+        ),
+        timeout=httpx.Timeout(timeout_llm(), connect=10.0),
+    )
+    logging.info(f"🔌 Cliente LLM creado ({backend}, hasta {max_conexiones()} conexiones)")
+    return OpenAI(
+        api_key=api_key,
+        base_url=URL_OPEN_ROUTER if backend == "openrouter" else None,
+        http_client=http_client,
+        timeout=timeout_llm(),
+        max_retries=max_reintentos_llm(),
+    )
+
+
+def get_cliente_llm():
+    """
+    Devuelve (cliente, modelo) para el backend configurado, creando el cliente solo la primera vez.
+    """
+    _cargar_env_una_vez()
+    backend = backend_llm()
+    api_key = _api_key(backend)
+    clave = (backend, api_key)
+
+    cliente = _clientes.get(clave)
+    if cliente is None:
+        with _lock_clientes:
+            cliente = _clientes.get(clave)
+            if cliente is None:
+                cliente = _crear_cliente(backend, api_key)
+                _clientes[clave] = cliente
+    return cliente, modelo_llm()
+
+
+def cerrar_clientes_llm():
+    """
+    Cierra los pools de conexiones (al terminar el proceso o para forzar clientes nuevos).
+    """
+    with _lock_clientes:
+        for cliente in _clientes.values():
+            try:
+                cliente.close()
+            except Exception as e:
+                logging.warning(f"⚠️ Error cerrando cliente LLM: {e}")
+        _clientes.clear()
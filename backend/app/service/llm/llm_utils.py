@@ -4,20 +4,20 @@
 
 import logging
 import os
-from dotenv import load_dotenv  # Carga variables de entorno desde un archivo .env
-from openai import OpenAI, RateLimitError  # Cliente oficial para la API de OpenAI
+from openai import RateLimitError  # Cliente oficial para la API de OpenAI
 from openai._exceptions import APIConnectionError  # Agrega esta línea para importar APIConnectionError
 import ast  # Permite evaluar strings como estructuras de Python de forma segura
 import re
 from app.models.publicacion import Publicacion
 from app.models.keyword import Keyword
 from app.mongo.mongo_keywords import create_keyword
-import math
 import json
 from datetime import datetime
 from typing import List
 from app.mongo.mongo_fuentes import get_fuentes_dict
 from io import BytesIO
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from docx import Document
 from app.models.publicacion import Publicacion
 from bson import ObjectId
@@ -25,44 +25,45 @@ from app.mongo.mongo_areas import get_collection as get_areas_coll
 from app.mongo.mongo_conceptos import get_collection as get_conceptos_collection
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
+from app.service.llm.cliente_llm import get_cliente_llm, modelo_llm
+from app.service.llm.cache_llm import cache_llm_activa, leer_respuesta, guardar_respuesta, descartar_respuesta
+from app.service.llm.tokens_llm import recortar_a_tokens, empaquetar_en_lotes, registrar_uso
 
 
 def get_openai_client():
-    global open_ai_client
-    load_dotenv()
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key or not api_key.startswith("sk-"):
-        raise Exception("❌ Falta la variable OPENAI_API_KEY en el entorno.")
-    model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")  # Modelo de OpenAI a utilizar
-
-    # en caso que este configurado por limite el uso de chatgpt, se puede usar open router
-    if "true" == os.getenv("USE_OPEN_ROUTER", "false").lower():
-        # Si se usa open router, se debe usar el cliente de open router
-        logging.info("Usando OpenRouter como cliente de OpenAI.")
-        open_ai_client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=os.getenv("OPEN_ROUTER_API_KEY"),
-        )
-        model = f"openai/{model}"  # Cambia el modelo para que sea compatible con open router
-    else:
-        open_ai_client = OpenAI(api_key=api_key)
-    return open_ai_client, model
+    """
+    Devuelve (cliente, modelo). El cliente se crea una vez por proceso y backend
+    (OpenAI u OpenRouter) y reutiliza sus conexiones; ver cliente_llm.py.
+    """
+    return get_cliente_llm()
 
 
-def get_gpt_response(messages, temperature):
+def get_gpt_response(messages, temperature, cache=True):
     """
     Envía un mensaje a la API de OpenAI y devuelve la respuesta generada.
+    Las respuestas se guardan en la caché del LLM (cache_llm.py): un prompt idéntico
+    con el mismo modelo y temperatura devuelve la respuesta guardada.
     :param messages:
     :param temperature:
+    :param cache: False para llamadas que deben dar una respuesta nueva cada vez.
     :return:
     """
 
-    # Cargar la API Key desde el archivo .env
+    # Cliente compartido del proceso (no se crea uno nuevo por llamada)
     client, model = get_openai_client()
+    usar_cache = cache and cache_llm_activa()
+    if usar_cache:
+        cacheada = leer_respuesta(model, messages, temperature)
+        if cacheada is not None:
+            registrar_uso(model, cacheada=True)
+            return cacheada
+
     response = None
     try:
-        response = client.chat.completions.create(model=model, messages=messages, temperature=temperature)
-        response = response.choices[0].message.content.strip()
+        completion = client.chat.completions.create(model=model, messages=messages, temperature=temperature)
+        # Tokens de entrada y salida de la llamada (los que devuelve la API)
+        registrar_uso(model, completion.usage)
+        response = completion.choices[0].message.content.strip()
     except APIConnectionError as e:
         logging.error(f"Error al conectar con la API de OpenAi: \n{e}")
         raise e
@@ -73,8 +74,21 @@ def get_gpt_response(messages, temperature):
     except RateLimitError as e:
         logging.error("🚫 Límite de cuota alcanzado. Verifica tu facturación en OpenAI.\n La IA no puede generar una respuesta en este momento: se ha alcanzado el límite de uso.")
         raise e
+    if not response:
+        return "Error al obtener respuesta de la IA."
+
+    if usar_cache:
+        guardar_respuesta(model, messages, temperature, response)
     # Se devuelve el contenido limpio del mensaje generado
-    return response if response else "Error al obtener respuesta de la IA."
+    return response
+
+
+def descartar_respuesta_cacheada(messages, temperature):
+    """
+    Elimina de la caché una respuesta que no se ha podido interpretar, para que el reintento llegue al LLM.
+    """
+    if cache_llm_activa():
+        descartar_respuesta(modelo_llm(), messages, temperature)
 
 # ------------------------------------------------------------------------------
 # Genera una descripción clara y concisa de un concepto dado
@@ -91,7 +105,8 @@ def generar_descripcion_concepto(nombre_concepto: str) -> str:
         {"role": "user", "content": prompt}
     ]
 
-    response = get_gpt_response(messages, 0.7)
+    # Sin caché: volver a generarla debe dar una redacción nueva
+    response = get_gpt_response(messages, 0.7, cache=False)
     return response if response else "Error al generar la descripción."
 
 
@@ -114,7 +129,8 @@ def generar_keywords_descriptivos(descripcion_concepto: str) -> list[Keyword]:
     ]
 
     try:
-        response = get_gpt_response(messages, 0.5)
+        # Sin caché: regenerar las keywords de un concepto debe proponer otras
+        response = get_gpt_response(messages, 0.5, cache=False)
         if not response:
             raise ValueError("Respuesta vacía del modelo.")
 
@@ -178,8 +194,14 @@ def estimar_tono_publicacion(publicacion) -> int:
     try:
         return int(tono_str)  # Convertimos el resultado a entero
     except ValueError:
+        descartar_respuesta_cacheada(messages, 0)
         raise ValueError(f"Respuesta inesperada del modelo: {tono_str}")  # Manejo de errores si no devuelve un número
 
+# Tokens máximos del contenido de la publicación en los prompts de resumen y análisis
+# (equivalen aproximadamente a los antiguos recortes de 15.000 y 25.000 caracteres)
+MAX_TOKENS_CONTENIDO_RESUMEN = 4000
+MAX_TOKENS_CONTENIDO_ANALISIS = 6500
+
 # Resume el contenido de una publicación, reformulando con sinónimos para evitar infracción de copyright
 def resumir_contenido_reformulado(publicacion: Publicacion, keywords_dict=None, max_tokens=600) -> Publicacion:
     """
@@ -190,8 +212,7 @@ def resumir_contenido_reformulado(publicacion: Publicacion, keywords_dict=None,
     if not publicacion.contenido.strip():
         raise ValueError("El contenido está vacío o no disponible.")
 
-    if len(publicacion.contenido) > 15000:
-        publicacion.contenido = publicacion.contenido[:15000]
+    publicacion.contenido = recortar_a_tokens(publicacion.contenido, MAX_TOKENS_CONTENIDO_RESUMEN)
 
     # Extraer nombres de keywords si están disponibles
     keyword_nombres = []
@@ -237,8 +258,7 @@ def analizar_publicacion(publicacion, max_tokens=600):
     if not publicacion.contenido.strip():
         raise ValueError("El contenido está vacío o no disponible.")
 
-    if len(publicacion.contenido) > 25000:
-        publicacion.contenido = publicacion.contenido[:25000]
+    publicacion.contenido = recortar_a_tokens(publicacion.contenido, MAX_TOKENS_CONTENIDO_ANALISIS)
 
     titulo_limpio = re.sub(r'https?://\S+|www\.\S+', '', publicacion.titulo).strip()
 
@@ -278,10 +298,25 @@ def analizar_publicacion(publicacion, max_tokens=600):
         logging.info(f"🎯 Pais: {publicacion.pais}")
         return publicacion
     except (json.JSONDecodeError, KeyError, ValueError):
+        descartar_respuesta_cacheada(messages, 0.7)
         raise ValueError(f"Respuesta inesperada del modelo, se esperaba JSON con claves 'resumen', 'tono', 'ciuda-region' y 'pais': {respuesta}")
 
+# Tokens de noticias por lote del informe (sin contar las instrucciones del prompt)
 MAX_TOKENS_TOTAL = 12000
-TOKENS_POR_PUB = 500
+# Una publicación no puede ocupar más que esto dentro de un lote: se recorta
+MAX_TOKENS_POR_PUB = 1000
+
+def tokens_lote_informe():
+    """
+    Presupuesto de tokens de cada lote del informe: los lotes se llenan hasta este límite
+    """
+    return int(os.getenv("LLM_TOKENS_LOTE_INFORME", MAX_TOKENS_TOTAL))
+
+def informe_llamadas_paralelas():
+    """
+    Llamadas simultáneas al LLM al generar un informe (lotes, consolidación por área y predicción)
+    """
+    return max(int(os.getenv("INFORME_LLAMADAS_PARALELAS", 8)), 1)
 
 #--------------------------------------------------------------
 
@@ -290,7 +325,109 @@ from docx.oxml.ns import qn
 from docx.opc.constants import RELATIONSHIP_TYPE as RT
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 
-def generar_informe_impacto_temporal(publicaciones: List[dict], area_id: str, filtros: dict = None) -> BytesIO:
+def _entrada_informe(pub, fuentes_map):
+    """
+    Texto de una publicación dentro del prompt del informe de impacto.
+    """
+    tono = pub.get("tono", "-")
+    pais = pub.get("pais", "??")
+    titulo = pub.get("titulo", "").strip()
+    contenido = pub.get("contenido", "").strip()
+    fecha = pub.get("fecha")
+    fecha_str = fecha.strftime("%d/%m/%Y") if fecha else "??/??/????"
+    fuente_id = str(pub.get("fuente_id", ""))
+    fuente_nombre = fuentes_map.get(fuente_id, {}).get("nombre", "Fuente desconocida")
+
+    return f"- ({tono}/10) [{pais}] {titulo} (publicado el {fecha_str} por {fuente_nombre})\n{contenido}"
+
+
+def _analizar_lote_impacto(i, total_lotes, entradas, descripciones_impacto, claves_impacto):
+    """
+    Analiza un lote de publicaciones del informe de impacto (sus entradas ya empaquetadas por tokens).
+    Devuelve el diccionario de impactos por área o None si el modelo no devolvió un JSON válido.
+    """
+    prompt = (
+        "A partir de los siguientes titulares y contenidos de noticias ordenadas en el tiempo, redacta un análisis de cómo evoluciona la situación y su impacto.\n"
+        "Analiza el impacto en base a estas dimensiones definidas por el usuario:\n"
+        f"{descripciones_impacto}\n\n"
+        "Para cada una, resume en 1-2 líneas lo que se puede deducir del conjunto de noticias.\n"
+        "Indica evolución, intensidad, y ejemplos concretos si los hay.\n"
+        "Haz mención a las publicaciones más relevantes indicando fecha_str (DD/MM/YYYY) y fuente_nombre. Ejemplo, (06/07/2025, ElPais)\n"
+        "Evita introducciones, explicaciones o cualquier texto adicional: este análisis será integrado automáticamente a un informe generado por IA.\n"
+        "IMPORTANTE: Devuelve exclusivamente un JSON válido con esta estructura exacta:\n"
+        '{\n'
+        '  "impactos": {\n' +
+        "".join([f'    "{clave}": "...",\n' for clave in claves_impacto]).rstrip(',\n') + '\n'
+        '  }\n'
+        '}\n'
+        "No incluyas ningún comentario, encabezado, ni código markdown como ```json.\n"
+        "Solo responde con el JSON limpio.\n"
+        "Noticias:\n" + "\n\n".join(entradas)
+    )
+
+    messages = [
+        {"role": "system", "content": "Eres un experto en análisis de impacto con base en noticias."},
+        {"role": "user", "content": prompt}
+    ]
+
+    try:
+        data = None
+        for attempt in range(2):
+            # El reintento no usa la caché: pide una respuesta nueva al modelo
+            respuesta = get_gpt_response(messages, temperature=0.6, cache=attempt == 0).strip()
+            logging.debug(f"🔍 Respuesta cruda (intento {attempt+1}):\n{respuesta}")
+            if respuesta:
+                try:
+                    data = json.loads(respuesta)
+                    break
+                except json.JSONDecodeError:
+                    logging.warning(f"🚧 JSON inválido en intento {attempt+1}")
+                    descartar_respuesta_cacheada(messages, 0.6)
+            else:
+                logging.warning(f"🚧 Respuesta vacía en intento {attempt+1}")
+        if not data:
+            logging.error(f"❌ No se obtuvo JSON válido del modelo para el lote {i+1}")
+            return None
+
+        logging.info(f"✅ Lote {i+1}/{total_lotes} procesado correctamente.")
+        return data["impactos"]
+    except Exception as e:
+        logging.error(f"❌ Error en análisis del lote {i+1}: {e}")
+        return None
+
+
+def _predecir_evolucion(publicaciones: List[dict]) -> str:
+    """
+    Párrafos predictivos a corto y medio/largo plazo a partir de los titulares del informe.
+    """
+    resumen_titulares = "\n".join([
+        f"- [{pub.get('pais', '??')}] {pub.get('titulo', '')} {pub.get('fecha', '')}" for pub in publicaciones[:50]
+    ])
+    prompt_pred = (
+        "Dado este conjunto de publicaciones recientes con pais donde ocurren, titulo y fecha:\n"
+        f"{resumen_titulares}\n\n"
+        "Redacta dos párrafos predictivos, haz un análisis de los hechos tenindo en cuenta cuando y donde ocurren.\n"
+        "1. ¿Qué podría suceder a corto plazo en base a esta situación?\n"
+        "2. ¿Qué consecuencias o escenarios podrían desarrollarse a medio o largo plazo?\n"
+        "Evita cualquier introducción o explicación, simplemente escribe los dos párrafos seguidos."
+    )
+    messages_pred = [
+        {"role": "system", "content": "Eres un analista experto en inteligencia y predicciones políticas, económicas y sociales."},
+        {"role": "user", "content": prompt_pred}
+    ]
+    try:
+        # Sin caché: cada informe pide una predicción nueva aunque los titulares se repitan
+        return get_gpt_response(messages_pred, temperature=0.7, cache=False).strip()
+    except Exception as e:
+        logging.error(f"❌ Error generando predicción: {e}")
+        return "No se pudo generar predicción."
+
+
+def generar_informe_impacto_temporal(publicaciones: List[dict], area_id: str, filtros: dict = None, progreso=None) -> BytesIO:
+    """
+    Genera el informe de impacto en Word.
+    :param progreso: función opcional progreso(lotes_hechos, total_lotes), llamada al terminar cada lote.
+    """
     if not publicaciones:
         raise ValueError("No hay publicaciones para analizar.")
     if not area_id:
@@ -314,81 +451,50 @@ def generar_informe_impacto_temporal(publicaciones: List[dict], area_id: str, fi
 
     fuentes_map = {str(f['_id']): f for f in get_fuentes_dict()}
 
-    lote_size = MAX_TOKENS_TOTAL // TOKENS_POR_PUB
-    total_lotes = math.ceil(len(publicaciones) / lote_size)
-    logging.info(f"📚 Dividiendo {len(publicaciones)} publicaciones en {total_lotes} lotes para análisis temporal.")
-
-    impactos_lotes = []
-
-    for i in range(total_lotes):
-        inicio = i * lote_size
-        fin = inicio + lote_size
-        lote = publicaciones[inicio:fin]
-
-        entradas = []
-        for pub in lote:
-            tono = pub.get("tono", "-")
-            pais = pub.get("pais", "??")
-            titulo = pub.get("titulo", "").strip()
-            contenido = pub.get("contenido", "").strip()
-            fecha = pub.get("fecha")
-            fecha_str = fecha.strftime("%d/%m/%Y") if fecha else "??/??/????"
-            fuente_id = str(pub.get("fuente_id", ""))
-            fuente_nombre = fuentes_map.get(fuente_id, {}).get("nombre", "Fuente desconocida")
-
-            entradas.append(f"- ({tono}/10) [{pais}] {titulo} (publicado el {fecha_str} por {fuente_nombre})\n{contenido}")
-
-        prompt = (
-            "A partir de los siguientes titulares y contenidos de noticias ordenadas en el tiempo, redacta un análisis de cómo evoluciona la situación y su impacto.\n"
-            "Analiza el impacto en base a estas dimensiones definidas por el usuario:\n"
-            f"{descripciones_impacto}\n\n"
-            "Para cada una, resume en 1-2 líneas lo que se puede deducir del conjunto de noticias.\n"
-            "Indica evolución, intensidad, y ejemplos concretos si los hay.\n"
-            "Haz mención a las publicaciones más relevantes indicando fecha_str (DD/MM/YYYY) y fuente_nombre. Ejemplo, (06/07/2025, ElPais)\n"
-            "Evita introducciones, explicaciones o cualquier texto adicional: este análisis será integrado automáticamente a un informe generado por IA.\n"
-            "IMPORTANTE: Devuelve exclusivamente un JSON válido con esta estructura exacta:\n"
-            '{\n'
-            '  "impactos": {\n' +
-            "".join([f'    "{clave}": "...",\n' for clave in claves_impacto]).rstrip(',\n') + '\n'
-            '  }\n'
-            '}\n'
-            "No incluyas ningún comentario, encabezado, ni código markdown como ```json.\n"
-            "Solo responde con el JSON limpio.\n"
-            "Noticias:\n" + "\n\n".join(entradas[:150])
+    # Los lotes se llenan hasta el presupuesto de tokens, en orden cronológico:
+    # menos llamadas con resúmenes cortos y sin desbordar el contexto con los largos
+    lotes = empaquetar_en_lotes(
+        [_entrada_informe(pub, fuentes_map) for pub in publicaciones],
+        tokens_lote_informe(),
+        MAX_TOKENS_POR_PUB
+    )
+    total_lotes = len(lotes)
+    logging.info(f"📚 Dividiendo {len(publicaciones)} publicaciones en {total_lotes} lotes de hasta {tokens_lote_informe()} tokens para análisis temporal.")
+
+    lotes_hechos = [0]
+    lock_progreso = threading.Lock()
+
+    def analizar_lote(args):
+        impactos = _analizar_lote_impacto(*args)
+        if progreso:
+            with lock_progreso:
+                lotes_hechos[0] += 1
+                progreso(lotes_hechos[0], total_lotes)
+        return impactos
+
+    # Las llamadas al LLM de cada lote, la consolidación por área y la predicción son
+    # independientes: se hacen en paralelo. map conserva el orden de los lotes y de las áreas.
+    with ThreadPoolExecutor(max_workers=informe_llamadas_paralelas()) as executor:
+        # La predicción no depende de los lotes: se pide a la vez que ellos
+        futuro_prediccion = executor.submit(_predecir_evolucion, publicaciones)
+
+        resultados_lotes = executor.map(
+            analizar_lote,
+            [(i, total_lotes, lote, descripciones_impacto, claves_impacto) for i, lote in enumerate(lotes)]
         )
+        impactos_lotes = [impactos for impactos in resultados_lotes if impactos]
 
+        texto_por_area = {clave: [] for clave in claves_impacto}
+        for impacto in impactos_lotes:
+            for clave in texto_por_area:
+                texto_por_area[clave].append(impacto.get(clave, ""))
 
-        messages = [
-            {"role": "system", "content": "Eres un experto en análisis de impacto con base en noticias."},
-            {"role": "user", "content": prompt}
-        ]
-
-        try:
-            data = None
-            for attempt in range(2):
-                respuesta = get_gpt_response(messages, temperature=0.6).strip()
-                logging.debug(f"🔍 Respuesta cruda (intento {attempt+1}):\n{respuesta}")
-                if respuesta:
-                    try:
-                        data = json.loads(respuesta)
-                        break
-                    except json.JSONDecodeError:
-                        logging.warning(f"🚧 JSON inválido en intento {attempt+1}")
-                else:
-                    logging.warning(f"🚧 Respuesta vacía en intento {attempt+1}")
-            if not data:
-                logging.error(f"❌ No se obtuvo JSON válido del modelo para el lote {i+1}")
-                continue
-
-            impactos_lotes.append(data["impactos"])
-            logging.info(f"✅ Lote {i+1}/{total_lotes} procesado correctamente.")
-        except Exception as e:
-            logging.error(f"❌ Error en análisis del lote {i+1}: {e}")
+        textos_consolidados = dict(zip(claves_impacto, executor.map(
+            resumir_parrafos_si_muchos,
+            ["\n\n".join(texto_por_area[clave]).strip() for clave in claves_impacto]
+        )))
 
-    texto_por_area = {clave: [] for clave in claves_impacto}
-    for impacto in impactos_lotes:
-        for clave in texto_por_area:
-            texto_por_area[clave].append(impacto.get(clave, ""))
+        prediccion_texto = futuro_prediccion.result()
 
     doc = Document()
     doc.add_heading('Informe de Impacto', 0)
@@ -439,8 +545,7 @@ def generar_informe_impacto_temporal(publicaciones: List[dict], area_id: str, fi
     referencias_usadas = set()
     for area in claves_impacto:
         doc.add_heading(area.capitalize(), level=2)
-        area_texto = "\n\n".join(texto_por_area[area]).strip()
-        area_texto = resumir_parrafos_si_muchos(area_texto)
+        area_texto = textos_consolidados[area]
         p = doc.add_paragraph(area_texto)
         p.paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
 
@@ -483,27 +588,6 @@ def generar_informe_impacto_temporal(publicaciones: List[dict], area_id: str, fi
         else:
             p.add_run(titulo)
 
-    resumen_titulares = "\n".join([
-        f"- [{pub.get('pais', '??')}] {pub.get('titulo', '')} {pub.get('fecha', '')}" for pub in publicaciones[:50]
-    ])
-    prompt_pred = (
-        "Dado este conjunto de publicaciones recientes con pais donde ocurren, titulo y fecha:\n"
-        f"{resumen_titulares}\n\n"
-        "Redacta dos párrafos predictivos, haz un análisis de los hechos tenindo en cuenta cuando y donde ocurren.\n"
-        "1. ¿Qué podría suceder a corto plazo en base a esta situación?\n"
-        "2. ¿Qué consecuencias o escenarios podrían desarrollarse a medio o largo plazo?\n"
-        "Evita cualquier introducción o explicación, simplemente escribe los dos párrafos seguidos."
-    )
-    messages_pred = [
-        {"role": "system", "content": "Eres un analista experto en inteligencia y predicciones políticas, económicas y sociales."},
-        {"role": "user", "content": prompt_pred}
-    ]
-    try:
-        prediccion_texto = get_gpt_response(messages_pred, temperature=0.7).strip()
-    except Exception as e:
-        logging.error(f"❌ Error generando predicción: {e}")
-        prediccion_texto = "No se pudo generar predicción."
-
     doc.add_heading("3. Predicción", level=1)
     p_pred = doc.add_paragraph(prediccion_texto)
     p_pred.paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
@@ -0,0 +1,176 @@
+# tokens_llm.py
+# Recuento de tokens para ajustar los prompts al contexto del modelo y registro del uso de tokens.
+# Se usa tiktoken con la codificación del modelo configurado. tiktoken descarga el fichero de
+# la codificación la primera vez; para trabajar sin red se precarga en TIKTOKEN_CACHE_DIR
+# (por defecto backend/data/tiktoken) al instalar:
+#   python -m app.service.llm.tokens_llm --precargar
+# Si aun así no se puede cargar, se avisa una vez y se estima el recuento por caracteres.
+#
+# El empaquetador llena cada lote de entradas hasta un presupuesto de tokens, en lugar de
+# usar un número fijo de entradas por lote: menos llamadas y sin desbordar el contexto.
+
+import logging
+import os
+import threading
+from pathlib import Path
+
+# Estimación sin tokenizador: en español se generan más tokens por carácter que en inglés
+CARACTERES_POR_TOKEN = 3.0
+# Codificación de los modelos recientes de OpenAI si no se reconoce el modelo
+CODIFICACION_DEFECTO = "o200k_base"
+# Caché de las codificaciones de tiktoken si no se indica TIKTOKEN_CACHE_DIR
+DIRECTORIO_CACHE_DEFECTO = Path(__file__).resolve().parents[3] / "data" / "tiktoken"
+
+_codificadores = {}
+_lock_codificadores = threading.Lock()
+_aviso_estimacion = False
+
+_uso = {"llamadas": 0, "cacheadas": 0, "tokens_entrada": 0, "tokens_salida": 0}
+_lock_uso = threading.Lock()
+
+
+def _codificador(modelo=None):
+    """
+    Codificación de tiktoken para el modelo (sin el prefijo de proveedor de OpenRouter) o None.
+    """
+    if modelo is None:
+        from app.service.llm.cliente_llm import modelo_llm
+        modelo = modelo_llm()
+    modelo = modelo.split("/")[-1]
+
+    if modelo not in _codificadores:
+        with _lock_codificadores:
+            if modelo not in _codificadores:
+                _codificadores[modelo] = _cargar_codificador(modelo)
+    return _codificadores[modelo]
+
+
+# La configuración se lee al usarla: este módulo se importa antes de cargar el .env
+def directorio_cache_tiktoken() -> Path:
+    return Path(os.getenv("TIKTOKEN_CACHE_DIR", DIRECTORIO_CACHE_DEFECTO))
+
+
+def _cargar_codificador(modelo):
+    # tiktoken lee TIKTOKEN_CACHE_DIR al abrir cada codificación
+    os.environ.setdefault("TIKTOKEN_CACHE_DIR", str(DIRECTORIO_CACHE_DEFECTO))
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(modelo)
+        except KeyError:
+            return tiktoken.get_encoding(CODIFICACION_DEFECTO)
+    except Exception as e:
+        _avisar_estimacion(e)
+        return None
+
+
+def _avisar_estimacion(error):
+    global _aviso_estimacion
+    if not _aviso_estimacion:
+        _aviso_estimacion = True
+        logging.error(
+            f"❌ No se pudo cargar tiktoken ({error}): los tokens se estiman por caracteres. "
+            f"Precarga la codificación con: python -m app.service.llm.tokens_llm --precargar "
+            f"(caché en {directorio_cache_tiktoken()})"
+        )
+
+
+def contar_tokens(texto, modelo=None):
+    if not texto:
+        return 0
+    codificador = _codificador(modelo)
+    if codificador is None:
+        return int(len(texto) / CARACTERES_POR_TOKEN) + 1
+    return len(codificador.encode(texto, disallowed_special=()))
+
+
+def recortar_a_tokens(texto, max_tokens, modelo=None):
+    """
+    Devuelve el texto recortado para que no supere max_tokens.
+    """
+    if not texto:
+        return texto
+    codificador = _codificador(modelo)
+    if codificador is None:
+        return texto[:int(max_tokens * CARACTERES_POR_TOKEN)]
+    tokens = codificador.encode(texto, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return texto
+    return codificador.decode(tokens[:max_tokens])
+
+
+def empaquetar_en_lotes(entradas, presupuesto, max_tokens_entrada=None, modelo=None):
+    """
+    Reparte las entradas (textos) en lotes consecutivos sin superar el presupuesto de tokens por lote.
+    Se conserva el orden. Una entrada más larga que max_tokens_entrada (o que el presupuesto) se recorta.
+    """
+    limite_entrada = min(max_tokens_entrada or presupuesto, presupuesto)
+    lotes, lote, tokens_lote = [], [], 0
+    for entrada in entradas:
+        tokens = contar_tokens(entrada, modelo)
+        if tokens > limite_entrada:
+            entrada = recortar_a_tokens(entrada, limite_entrada, modelo)
+            tokens = limite_entrada
+        if lote and tokens_lote + tokens > presupuesto:
+            lotes.append(lote)
+            lote, tokens_lote = [], 0
+        lote.append(entrada)
+        tokens_lote += tokens
+    if lote:
+        lotes.append(lote)
+    return lotes
+
+
+# --------------------------------------------------
+# Uso de tokens
+def registrar_uso(modelo, usage=None, cacheada=False):
+    """
+    Registra y muestra los tokens de entrada y salida de una llamada (usage de la respuesta de la API).
+    """
+    tokens_entrada = getattr(usage, "prompt_tokens", 0) or 0
+    tokens_salida = getattr(usage, "completion_tokens", 0) or 0
+    with _lock_uso:
+        _uso["llamadas"] += 1
+        _uso["cacheadas"] += int(cacheada)
+        _uso["tokens_entrada"] += tokens_entrada
+        _uso["tokens_salida"] += tokens_salida
+    if not cacheada:
+        logging.info(f"🔢 Tokens LLM ({modelo}): {tokens_entrada} de entrada, {tokens_salida} de salida")
+
+
+def estadisticas_uso_llm():
+    """
+    Llamadas y tokens consumidos en este proceso desde su arranque.
+    """
+    with _lock_uso:
+        return dict(_uso)
+
+
+def precargar_codificacion(modelo=None):
+    """
+    Descarga en la caché de tiktoken la codificación del modelo (y la de respaldo),
+    para que después el recuento funcione sin red.
+    """
+    directorio = directorio_cache_tiktoken()
+    directorio.mkdir(parents=True, exist_ok=True)
+    os.environ["TIKTOKEN_CACHE_DIR"] = str(directorio)
+    import tiktoken
+
+    tiktoken.get_encoding(CODIFICACION_DEFECTO)
+    if modelo:
+        try:
+            tiktoken.encoding_for_model(modelo.split("/")[-1])
+        except KeyError:
+            pass
+    logging.info(f"✅ Codificaciones de tiktoken guardadas en {directorio}")
+
+
+if __name__ == "__main__":
+    import sys
+    from app.config import logqing_config, load_config_from_args
+
+    logqing_config()
+    load_config_from_args()
+    if "--precargar" in sys.argv:
+        from app.service.llm.cliente_llm import modelo_llm
+        precargar_codificacion(modelo_llm())
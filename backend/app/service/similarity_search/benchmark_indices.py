@@ -0,0 +1,93 @@
+# benchmark_indices.py
+# Compara los tipos de índice de fabrica_indices.py con la búsqueda exacta sobre los
+# embeddings de publicaciones guardados: tiempo de construcción, latencia media y recall@k.
+# Las consultas son publicaciones de la propia colección, así que la medida refleja nuestros datos reales.
+#
+# Ejecución manual (desde la carpeta backend):
+#   python -m app.service.similarity_search.benchmark_indices [--consultas 200] [--top_k 20]
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.service.similarity_search.fabrica_indices import TIPOS_INDICE, crear_indice_faiss, buscar_en_indice
+
+
+def muestrear_consultas(vectores, num_consultas, semilla=0):
+    generador = np.random.default_rng(semilla)
+    filas = generador.choice(len(vectores), size=min(num_consultas, len(vectores)), replace=False)
+    return np.ascontiguousarray(vectores[filas], dtype="float32")
+
+
+def recall(resultados, exactos):
+    """
+    Fracción media de los top_k exactos que aparecen en los resultados del índice.
+    """
+    aciertos = [
+        len(set(r[r != -1]) & set(e[e != -1])) / max(len(e[e != -1]), 1)
+        for r, e in zip(resultados, exactos)
+    ]
+    return float(np.mean(aciertos))
+
+
+def medir_indice(vectores, consultas, exactos, tipo, top_k):
+    inicio = time.perf_counter()
+    # Sin el mínimo de tamaño se mide el índice pedido aunque la colección sea pequeña
+    indice = crear_indice_faiss(vectores, tipo, min_vectores_aproximado=0)
+    construccion = time.perf_counter() - inicio
+
+    latencias = []
+    resultados = []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        _, I = buscar_en_indice(indice, vectores, consulta[None, :], top_k)
+        latencias.append(time.perf_counter() - inicio)
+        resultados.append(I[0])
+
+    return {
+        "tipo": tipo,
+        "indice_real": type(indice).__name__,
+        "construccion_seg": round(construccion, 3),
+        "latencia_media_ms": round(1000 * float(np.mean(latencias)), 3),
+        "latencia_p95_ms": round(1000 * float(np.percentile(latencias, 95)), 3),
+        f"recall@{top_k}": round(recall(resultados, exactos), 4),
+    }
+
+
+def benchmark(vectores, num_consultas=200, top_k=20, tipos=TIPOS_INDICE):
+    """
+    Devuelve una medida por tipo de índice. El índice exacto define la verdad de referencia.
+    """
+    vectores = np.asarray(vectores)
+    consultas = muestrear_consultas(vectores, num_consultas)
+    exacto = crear_indice_faiss(vectores, "flat")
+    _, exactos = exacto.search(consultas, min(top_k, len(vectores)))
+    return [medir_indice(vectores, consultas, exactos, tipo, top_k) for tipo in tipos]
+
+
+if __name__ == "__main__":
+    from app.config import logqing_config, load_config_from_args
+    from app.mongo.mongo_utils import init_mongo
+    from app.service.similarity_search.indice_publicaciones import IndicePublicaciones
+
+    parser = argparse.ArgumentParser(description="Recall y latencia de los índices FAISS")
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--top_k", type=int, default=20)
+    parser.add_argument("--tipos", nargs="+", default=list(TIPOS_INDICE), choices=TIPOS_INDICE)
+    args, _ = parser.parse_known_args()
+
+    logqing_config()
+    configuracion = load_config_from_args()
+    init_mongo(configuracion["MONGO_URI"])
+
+    indice = IndicePublicaciones()
+    indice.cargar()
+    indice.actualizar(forzar=True)
+    if indice.vectores is None or not len(indice.ids):
+        print("No hay embeddings de publicaciones. Ejecuta antes indice_publicaciones --backfill")
+    else:
+        print(f"{len(indice.ids)} vectores de dimensión {indice.vectores.shape[1]}")
+        medidas = benchmark(indice.vectores, args.consultas, args.top_k, args.tipos)
+        print(json.dumps(medidas, indent=2, ensure_ascii=False))
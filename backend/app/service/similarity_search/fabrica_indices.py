@@ -0,0 +1,124 @@
+# fabrica_indices.py
+# Creación de índices FAISS de producto interno (embeddings normalizados) según el tamaño:
+#   "flat"  → búsqueda exacta. Adecuado para conceptos y keywords (decenas o cientos de vectores)
+#   "ivfpq" → IVF con cuantización de producto: memoria y coste de búsqueda sublineales
+#   "hnsw"  → grafo HNSW: búsqueda sublineal sin entrenamiento
+# Los índices aproximados devuelven candidatos que se vuelven a puntuar con los vectores
+# exactos (refinado), de modo que las similitudes y los umbrales no cambian de escala.
+
+import logging
+import os
+
+import faiss
+import numpy as np
+
+TIPOS_INDICE = ("flat", "ivfpq", "hnsw")
+
+# Por debajo de este número de vectores un índice aproximado no compensa
+MIN_VECTORES_APROXIMADO = 10000
+
+
+# La configuración se lee al usarla: este módulo se importa antes de cargar el .env
+def tipo_indice(nombre):
+    """
+    Tipo de índice configurado para un índice vectorial (INDICE_<NOMBRE>_TIPO), "flat" por defecto.
+    """
+    tipo = os.getenv(f"INDICE_{nombre.upper()}_TIPO", "flat").lower()
+    if tipo not in TIPOS_INDICE:
+        logging.warning(f"⚠️ Tipo de índice '{tipo}' no válido para '{nombre}'. Se usa 'flat'.")
+        return "flat"
+    return tipo
+
+def nprobe():
+    return int(os.getenv("INDICE_IVF_NPROBE", 16))
+
+def ef_search():
+    return int(os.getenv("INDICE_HNSW_EF_SEARCH", 128))
+
+def factor_refinado():
+    """
+    Candidatos pedidos al índice aproximado por cada resultado, antes de puntuarlos con exactitud.
+    """
+    return int(os.getenv("INDICE_FACTOR_REFINADO", 4))
+
+
+def crear_indice_faiss(vectores, tipo="flat", min_vectores_aproximado=MIN_VECTORES_APROXIMADO):
+    """
+    Crea, entrena (si hace falta) y llena un índice del tipo pedido con los vectores.
+    Si hay menos de min_vectores_aproximado para un índice aproximado, se usa uno exacto y se avisa.
+    """
+    vectores = np.ascontiguousarray(vectores, dtype="float32")
+    n, dim = vectores.shape
+
+    if tipo != "flat" and n < min_vectores_aproximado:
+        logging.info(f"ℹ️ {n} vectores: se usa un índice exacto en lugar de '{tipo}'.")
+        tipo = "flat"
+
+    if tipo == "ivfpq":
+        # ~4·√n listas y subcuantizadores de 16 dimensiones (8 bits cada uno)
+        nlist = int(4 * np.sqrt(n))
+        m = _num_subcuantizadores(dim)
+        cuantizador = faiss.IndexFlatIP(dim)
+        indice = faiss.IndexIVFPQ(cuantizador, dim, nlist, m, 8, faiss.METRIC_INNER_PRODUCT)
+        logging.info(f"🏋️ Entrenando índice IVF-PQ (nlist={nlist}, m={m}) con {n} vectores...")
+        indice.train(vectores)
+        indice.nprobe = nprobe()
+    elif tipo == "hnsw":
+        indice = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+        indice.hnsw.efConstruction = 200
+        indice.hnsw.efSearch = ef_search()
+    else:
+        indice = faiss.IndexFlatIP(dim)
+
+    indice.add(vectores)
+    return indice
+
+
+def _num_subcuantizadores(dim):
+    for m in (dim // 16, 64, 48, 32, 24, 16, 8):
+        if m > 0 and dim % m == 0:
+            return m
+    return 1
+
+
+def es_aproximado(indice):
+    return not isinstance(indice, faiss.IndexFlat)
+
+
+def buscar_en_indice(indice, vectores, consultas, top_k):
+    """
+    Busca en el índice y devuelve (D, I) como faiss.search. Con un índice aproximado se
+    piden top_k · factor candidatos y se reordenan con el producto interno exacto.
+    """
+    consultas = np.ascontiguousarray(consultas, dtype="float32")
+    top_k = min(top_k, indice.ntotal)
+    if not es_aproximado(indice):
+        return indice.search(consultas, top_k)
+
+    _, candidatos = indice.search(consultas, min(top_k * factor_refinado(), indice.ntotal))
+    D = np.full((len(consultas), top_k), -np.inf, dtype="float32")
+    I = np.full((len(consultas), top_k), -1, dtype="int64")
+    for q, filas in enumerate(candidatos):
+        filas = filas[filas != -1]
+        if not len(filas):
+            continue
+        scores = np.asarray(vectores[filas], dtype="float32") @ consultas[q]
+        orden = np.argsort(-scores)[:top_k]
+        D[q, :len(orden)] = scores[orden]
+        I[q, :len(orden)] = filas[orden]
+    return D, I
+
+
+def guardar_indice_faiss(indice, ruta):
+    tmp = ruta.with_suffix(f".{os.getpid()}.tmp")
+    faiss.write_index(indice, str(tmp))
+    os.replace(tmp, ruta)
+
+
+def cargar_indice_faiss(ruta):
+    indice = faiss.read_index(str(ruta))
+    if isinstance(indice, faiss.IndexIVF):
+        indice.nprobe = nprobe()
+    elif isinstance(indice, faiss.IndexHNSW):
+        indice.hnsw.efSearch = ef_search()
+    return indice
@@ -0,0 +1,361 @@
+# indice_publicaciones.py
+# Índice vectorial de publicaciones para la búsqueda semántica.
+# Los embeddings se calculan al enriquecer cada publicación y se guardan en Mongo en
+# float16 (campo "embedding"); este índice solo los lee, nunca recodifica artículos.
+# Se mantiene en memoria y en disco, y se actualiza de forma incremental con las
+# publicaciones cuyo "embedding_actualizado" es posterior a la última actualización.
+# Esa marca la pone el reloj de cada worker antes de escribir: un documento marcado antes
+# puede confirmarse después de otro ya indexado. Por eso cada actualización vuelve a leer
+# una ventana de INDICE_PUBLICACIONES_MARGEN_SEG hacia atrás y descarta lo ya indexado.
+# Cada embedding guarda el runtime que lo calculó ("embedding_runtime"; sin él, torch) y el
+# índice solo usa los del runtime configurado: torch y ONNX no dan vectores idénticos. Tras
+# cambiar EMBEDDINGS_RUNTIME, el índice se reconstruye y --backfill recalcula los demás.
+#
+# Ejecución manual (desde la carpeta backend):
+#   python -m app.service.similarity_search.indice_publicaciones --backfill     -> calcula los embeddings que falten
+#   python -m app.service.similarity_search.indice_publicaciones --reconstruir  -> rehace el índice desde Mongo
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from bson import ObjectId
+
+from app.mongo.mongo_utils import get_collection
+from app.mongo.mongo_publicaciones import PROYECCION_PAGINA, combinar_condiciones
+from app.service.embeddings.embeddings import MODELO_EMBEDDINGS, desempaquetar_embedding, embeddings_runtime
+from app.service.similarity_search.indice_vectorial import FORMATO_INDICE, directorio_indices
+from app.service.similarity_search.fabrica_indices import (
+    crear_indice_faiss, buscar_en_indice, es_aproximado, tipo_indice,
+    guardar_indice_faiss, cargar_indice_faiss
+)
+
+NOMBRE_INDICE = "publicaciones"
+# Segundos mínimos entre comprobaciones de embeddings nuevos en Mongo
+SEGUNDOS_ENTRE_ACTUALIZACIONES = 10
+# Publicaciones leídas de Mongo por lote al actualizar
+TAMANO_LOTE = 2000
+# Un índice aproximado se reentrena cuando la colección crece este factor desde su entrenamiento
+FACTOR_REENTRENAMIENTO = 4
+
+_indice_publicaciones = None
+_lock_indice = threading.Lock()
+
+
+# La configuración se lee al usarla: este módulo se importa antes de cargar el .env
+def margen_actualizacion():
+    """
+    Ventana que se vuelve a leer antes de la última actualización (escrituras confirmadas
+    tarde, diferencias de reloj entre workers)
+    """
+    return timedelta(seconds=float(os.getenv("INDICE_PUBLICACIONES_MARGEN_SEG", 600)))
+
+
+def condicion_runtime_embedding(runtime=None):
+    """
+    Condición de Mongo para las publicaciones cuyo embedding se calculó con el runtime indicado
+    (por defecto, el configurado). Los embeddings anteriores al campo se calcularon con torch.
+    """
+    runtime = runtime or embeddings_runtime()
+    if runtime == "torch":
+        return {"embedding_runtime": {"$in": [None, "torch"]}}
+    return {"embedding_runtime": runtime}
+
+
+class IndicePublicaciones:
+
+    def __init__(self, directorio=None):
+        self.directorio = directorio or directorio_indices()
+        self.ids = []               # _id (str) de cada fila
+        self.posiciones = {}        # _id -> fila
+        self.vectores = None        # matriz (n, dim) float16
+        self.ultima_actualizacion = None   # embedding_actualizado más reciente indexado
+        self._ultima_comprobacion = 0.0
+        self._faiss = None
+        self._faiss_entrenado_con = 0
+        self._lock = threading.RLock()
+
+    # --------------------------------------------------
+    # Persistencia
+    def _rutas(self):
+        return (
+            self.directorio / f"{NOMBRE_INDICE}.npy",
+            self.directorio / f"{NOMBRE_INDICE}.json",
+        )
+
+    def _ruta_faiss(self):
+        # Solo se persisten los índices aproximados: entrenarlos o construirlos es lo costoso
+        return self.directorio / f"{NOMBRE_INDICE}.{tipo_indice(NOMBRE_INDICE)}.faiss"
+
+    def _cargar_faiss(self):
+        ruta = self._ruta_faiss()
+        if tipo_indice(NOMBRE_INDICE) == "flat" or not ruta.exists():
+            return
+        try:
+            indice = cargar_indice_faiss(ruta)
+            if indice.ntotal <= len(self.ids) and indice.d == self.vectores.shape[1]:
+                self._faiss = indice
+                self._faiss_entrenado_con = indice.ntotal
+        except Exception as e:
+            logging.warning(f"⚠️ No se pudo cargar el índice FAISS de publicaciones: {e}")
+
+    def _descartar_faiss(self):
+        self._faiss = None
+        self._ruta_faiss().unlink(missing_ok=True)
+
+    def cargar(self):
+        ruta_vectores, ruta_meta = self._rutas()
+        if not ruta_vectores.exists() or not ruta_meta.exists():
+            return False
+        try:
+            with open(ruta_meta, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            # Los índices anteriores al sello de runtime se calcularon con torch
+            if meta.get("formato") != FORMATO_INDICE or meta.get("modelo") != MODELO_EMBEDDINGS \
+                    or meta.get("runtime", "torch") != embeddings_runtime():
+                logging.info("♻️ Índice de publicaciones en disco con versión distinta. Se reconstruirá.")
+                return False
+            vectores = np.load(ruta_vectores)
+            if len(meta["ids"]) != len(vectores):
+                raise ValueError("El número de ids no coincide con el número de vectores")
+        except Exception as e:
+            logging.warning(f"⚠️ No se pudo cargar el índice de publicaciones desde disco: {e}")
+            return False
+
+        with self._lock:
+            self.ids = list(meta["ids"])
+            self.posiciones = {doc_id: i for i, doc_id in enumerate(self.ids)}
+            self.vectores = vectores.astype("float16") if len(vectores) else None
+            ultima = meta.get("ultima_actualizacion")
+            self.ultima_actualizacion = datetime.fromisoformat(ultima) if ultima else None
+            self._faiss = None
+            if self.vectores is not None:
+                self._cargar_faiss()
+        logging.info(f"📂 Índice de publicaciones cargado de disco ({len(self.ids)} vectores)")
+        return True
+
+    def guardar(self):
+        ruta_vectores, ruta_meta = self._rutas()
+        try:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                vectores = self.vectores if self.vectores is not None else np.zeros((0, 0), dtype="float16")
+                meta = {
+                    "formato": FORMATO_INDICE,
+                    "modelo": MODELO_EMBEDDINGS,
+                    "runtime": embeddings_runtime(),
+                    "ultima_actualizacion": self.ultima_actualizacion.isoformat() if self.ultima_actualizacion else None,
+                    "ids": self.ids,
+                }
+                tmp_vectores = ruta_vectores.with_suffix(f".{os.getpid()}.tmp.npy")
+                tmp_meta = ruta_meta.with_suffix(f".{os.getpid()}.tmp")
+                np.save(tmp_vectores, vectores)
+                with open(tmp_meta, "w", encoding="utf-8") as f:
+                    json.dump(meta, f)
+                os.replace(tmp_vectores, ruta_vectores)
+                os.replace(tmp_meta, ruta_meta)
+        except Exception as e:
+            logging.warning(f"⚠️ No se pudo guardar el índice de publicaciones en disco: {e}")
+
+    # --------------------------------------------------
+    # Mantenimiento incremental
+    def actualizar(self, forzar=False):
+        """
+        Añade (o reemplaza) los embeddings guardados en Mongo desde la última actualización,
+        menos el margen. Los documentos de la ventana ya indexados con el mismo vector se ignoran.
+        Solo se leen los embeddings calculados con el runtime configurado.
+        """
+        if not forzar and time.time() - self._ultima_comprobacion < SEGUNDOS_ENTRE_ACTUALIZACIONES:
+            return 0
+        self._ultima_comprobacion = time.time()
+
+        filtro = {"embedding": {"$exists": True}, **condicion_runtime_embedding()}
+        if self.ultima_actualizacion:
+            filtro["embedding_actualizado"] = {"$gte": self.ultima_actualizacion - margen_actualizacion()}
+        cursor = (
+            get_collection("publicaciones")
+            .find(filtro, {"embedding": 1, "embedding_actualizado": 1})
+            .sort("embedding_actualizado", 1)
+            .batch_size(TAMANO_LOTE)
+        )
+
+        cambios = 0
+        with self._lock:
+            nuevos = {}
+            reemplazados = False
+            for doc in cursor:
+                vector = desempaquetar_embedding(doc["embedding"]).astype("float16")
+                doc_id = str(doc["_id"])
+                if doc.get("embedding_actualizado"):
+                    self.ultima_actualizacion = max(self.ultima_actualizacion or doc["embedding_actualizado"],
+                                                    doc["embedding_actualizado"])
+                if doc_id in self.posiciones:
+                    fila = self.posiciones[doc_id]
+                    if np.array_equal(self.vectores[fila], vector):
+                        # Ya indexado en una actualización anterior (ventana de margen)
+                        continue
+                    self.vectores[fila] = vector
+                    reemplazados = True
+                else:
+                    # Un documento reescrito durante la lectura puede aparecer dos veces: vale el último
+                    nuevos[doc_id] = vector
+                cambios += 1
+
+            if nuevos:
+                matriz = np.vstack(list(nuevos.values()))
+                self.vectores = matriz if self.vectores is None else np.vstack([self.vectores, matriz])
+                for doc_id in nuevos:
+                    self.posiciones[doc_id] = len(self.ids)
+                    self.ids.append(doc_id)
+            # Las filas nuevas se añaden al índice FAISS al buscar; un vector reemplazado obliga a reconstruirlo
+            if reemplazados:
+                self._descartar_faiss()
+
+        if cambios:
+            logging.info(f"🔄 Índice de publicaciones actualizado: {cambios} embeddings ({len(self.ids)} en total)")
+            self.guardar()
+        return cambios
+
+    # --------------------------------------------------
+    # Búsqueda
+    def buscar(self, embedding, top_k):
+        """
+        Devuelve una lista de (_id, similitud) ordenada de mayor a menor similitud.
+        """
+        with self._lock:
+            if self.vectores is None or not self.ids:
+                return []
+            self._preparar_faiss()
+            D, I = buscar_en_indice(self._faiss, self.vectores, np.asarray([embedding], dtype="float32"), top_k)
+            return [(self.ids[i], float(score)) for i, score in zip(I[0], D[0]) if i != -1]
+
+    def _preparar_faiss(self):
+        """
+        Construye el índice FAISS si no existe (o si un índice aproximado ha quedado pequeño
+        para la colección) y añade las filas nuevas.
+        """
+        if self._faiss is not None and es_aproximado(self._faiss) \
+                and len(self.ids) > FACTOR_REENTRENAMIENTO * self._faiss_entrenado_con:
+            self._faiss = None
+
+        if self._faiss is None:
+            tipo = tipo_indice(NOMBRE_INDICE)
+            self._faiss = crear_indice_faiss(self.vectores, tipo)
+            self._faiss_entrenado_con = len(self.ids)
+            if es_aproximado(self._faiss):
+                try:
+                    self.directorio.mkdir(parents=True, exist_ok=True)
+                    guardar_indice_faiss(self._faiss, self._ruta_faiss())
+                except Exception as e:
+                    logging.warning(f"⚠️ No se pudo guardar el índice FAISS de publicaciones: {e}")
+        elif self._faiss.ntotal < len(self.ids):
+            self._faiss.add(np.ascontiguousarray(self.vectores[self._faiss.ntotal:], dtype="float32"))
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def get_indice_publicaciones():
+    """
+    Índice de publicaciones del proceso: se carga de disco la primera vez y se
+    completa con los embeddings nuevos de Mongo.
+    """
+    global _indice_publicaciones
+    with _lock_indice:
+        if _indice_publicaciones is None:
+            _indice_publicaciones = IndicePublicaciones()
+            _indice_publicaciones.cargar()
+    _indice_publicaciones.actualizar()
+    return _indice_publicaciones
+
+
+def buscar_publicaciones_similares(texto, top_k=20, query=None):
+    """
+    Publicaciones más parecidas al texto que cumplen la query de Mongo (fechas, fuente, país...).
+    Se piden a FAISS más candidatos de los necesarios y se filtran en Mongo; si no llegan
+    a top_k, se amplía la búsqueda.
+    """
+    # Importación diferida: similarity_search carga el stack de conceptos y LLM
+    from app.service.similarity_search.similarity_search import codificar_queries
+
+    indice = get_indice_publicaciones()
+    if not len(indice):
+        return []
+
+    embedding = codificar_queries([texto])[0]
+    candidatos = top_k * 10 if query else top_k
+    while True:
+        resultados = indice.buscar(embedding, candidatos)
+        filtro = {"_id": {"$in": [ObjectId(doc_id) for doc_id, _ in resultados]}}
+        if query:
+            filtro = combinar_condiciones(query, filtro)
+        documentos = {
+            str(doc["_id"]): doc
+            for doc in get_collection("publicaciones").find(filtro, PROYECCION_PAGINA)
+        }
+        encontrados = [(documentos[doc_id], score) for doc_id, score in resultados if doc_id in documentos]
+        if len(encontrados) >= top_k or candidatos >= len(indice):
+            break
+        candidatos = min(candidatos * 4, len(indice))
+
+    publicaciones = []
+    for documento, score in encontrados[:top_k]:
+        documento["similitud"] = round(score, 4)
+        publicaciones.append(documento)
+    return publicaciones
+
+
+def calcular_embeddings_pendientes(tamano_lote=64):
+    """
+    Calcula y guarda el embedding de las publicaciones antiguas que no lo tienen o que lo
+    tienen calculado con otro runtime.
+    Las no relacionadas con ningún concepto ya no conservan el contenido: se usa el título.
+    """
+    from app.service.similarity_search.similarity_search import codificar_queries, normalizar_texto
+    from app.service.embeddings.embeddings import empaquetar_embedding
+    from pymongo import UpdateOne
+
+    coleccion = get_collection("publicaciones")
+    runtime = embeddings_runtime()
+    pendientes = {"$or": [{"embedding": {"$exists": False}}, {"$nor": [condicion_runtime_embedding(runtime)]}]}
+    total = 0
+    while True:
+        lote = list(coleccion.find(pendientes, {"titulo": 1, "contenido": 1}).limit(tamano_lote))
+        if not lote:
+            break
+        textos = [normalizar_texto(f"{p.get('titulo', '')}. {p.get('contenido') or ''}") for p in lote]
+        vectores = codificar_queries(textos)
+        # Todo el lote comparte la marca: el índice relee la ventana de margen, así que no se pierde ninguno
+        ahora = datetime.now()
+        coleccion.bulk_write([
+            UpdateOne({"_id": p["_id"]}, {"$set": {
+                "embedding": empaquetar_embedding(v), "embedding_runtime": runtime, "embedding_actualizado": ahora
+            }})
+            for p, v in zip(lote, vectores)
+        ])
+        total += len(lote)
+        logging.info(f"🧮 Embeddings calculados: {total}")
+    return total
+
+
+if __name__ == "__main__":
+    import sys
+    from app.config import logqing_config, load_config_from_args
+    from app.mongo.mongo_utils import init_mongo
+
+    logqing_config()
+    configuracion = load_config_from_args()
+    init_mongo(configuracion["MONGO_URI"])
+
+    if "--backfill" in sys.argv:
+        calcular_embeddings_pendientes()
+
+    indice = IndicePublicaciones()
+    if "--reconstruir" not in sys.argv:
+        indice.cargar()
+    indice.actualizar(forzar=True)
+    logging.info(f"✅ Índice de publicaciones con {len(indice)} vectores")
@@ -0,0 +1,284 @@
+# indice_vectorial.py
+# Índice vectorial persistente y mantenido de forma incremental.
+# Guarda los embeddings de una colección (conceptos, keywords...) indexados por _id,
+# junto con un hash del texto codificado, para que solo se recalculen los documentos
+# nuevos o modificados. Los vectores se persisten en disco con un sello de versión.
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from app.service.embeddings.embeddings import embeddings_runtime
+from app.service.similarity_search.fabrica_indices import crear_indice_faiss, buscar_en_indice, tipo_indice
+
+# Versión del formato en disco. Si cambia, los índices persistidos se descartan.
+FORMATO_INDICE = 1
+
+# Directorio por defecto de los índices persistidos
+DIRECTORIO_INDICES_DEFECTO = Path(__file__).resolve().parents[3] / "data" / "indices"
+
+# Índices activos en este proceso, por nombre, para poder notificarles cambios
+_indices_activos = {}
+
+
+# La configuración se lee al usarla: este módulo se importa antes de cargar el .env
+def directorio_indices() -> Path:
+    return Path(os.getenv("INDICES_DIR", DIRECTORIO_INDICES_DEFECTO))
+
+def segundos_sincronizacion() -> float:
+    """
+    Segundos entre sincronizaciones completas con Mongo en procesos de larga duración
+    """
+    return float(os.getenv("INDICES_SINCRONIZACION_SEG", 300))
+
+
+def hash_texto(texto: str) -> str:
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+class IndiceVectorial:
+    """
+    Índice FAISS de producto interno sobre embeddings normalizados (tipo según INDICE_<NOMBRE>_TIPO).
+    :param nombre: nombre del índice, usado para los ficheros en disco.
+    :param modelo: nombre del modelo de embeddings (forma parte del sello de versión, junto con
+        EMBEDDINGS_RUNTIME: los vectores de torch y de ONNX int8 no son intercambiables).
+    :param cargar_documentos: función sin argumentos que devuelve todos los documentos de Mongo.
+    :param texto_documento: función que devuelve el texto a codificar de un documento.
+    :param codificar: función que recibe una lista de textos y devuelve una matriz float32 normalizada.
+    """
+
+    def __init__(self, nombre, modelo, cargar_documentos, texto_documento, codificar, directorio=None):
+        self.nombre = nombre
+        self.modelo = modelo
+        self.cargar_documentos = cargar_documentos
+        self.texto_documento = texto_documento
+        self.codificar = codificar
+        self.directorio = Path(directorio) if directorio else directorio_indices()
+
+        self.ids = []           # _id (str) de cada fila de la matriz
+        self.hashes = {}        # _id -> hash del texto codificado
+        self.documentos = {}    # _id -> documento de Mongo
+        self.vectores = None    # matriz (n, dim) float32
+        self.version = 0
+        self.ultima_sincronizacion = 0.0
+
+        self._faiss = None
+        self._lock = threading.RLock()
+
+    # --------------------------------------------------
+    # Persistencia
+    def _rutas(self):
+        return (
+            self.directorio / f"{self.nombre}.npy",
+            self.directorio / f"{self.nombre}.json",
+        )
+
+    def cargar(self):
+        """
+        Carga el índice desde disco si existe y su sello de versión es compatible.
+        """
+        ruta_vectores, ruta_meta = self._rutas()
+        if not ruta_vectores.exists() or not ruta_meta.exists():
+            return False
+        try:
+            with open(ruta_meta, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            # Los índices anteriores al sello de runtime se calcularon con torch
+            if meta.get("formato") != FORMATO_INDICE or meta.get("modelo") != self.modelo \
+                    or meta.get("runtime", "torch") != embeddings_runtime():
+                logging.info(f"♻️ Índice '{self.nombre}' en disco con versión distinta. Se reconstruirá.")
+                return False
+            vectores = np.load(ruta_vectores).astype("float32")
+            if len(meta["ids"]) != len(vectores):
+                raise ValueError("El número de ids no coincide con el número de vectores")
+        except Exception as e:
+            logging.warning(f"⚠️ No se pudo cargar el índice '{self.nombre}' desde disco: {e}")
+            return False
+
+        with self._lock:
+            self.ids = list(meta["ids"])
+            self.hashes = dict(meta["hashes"])
+            self.vectores = vectores if len(vectores) else None
+            self.version = meta.get("version", 0)
+            self._faiss = None
+        logging.info(f"📂 Índice '{self.nombre}' cargado de disco ({len(self.ids)} vectores, versión {self.version})")
+        return True
+
+    def guardar(self):
+        """
+        Guarda vectores y metadatos en disco de forma atómica (fichero temporal + rename).
+        """
+        ruta_vectores, ruta_meta = self._rutas()
+        try:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                vectores = self.vectores if self.vectores is not None else np.zeros((0, 0), dtype="float32")
+                meta = {
+                    "formato": FORMATO_INDICE,
+                    "modelo": self.modelo,
+                    "runtime": embeddings_runtime(),
+                    "version": self.version,
+                    "actualizado": datetime.now().isoformat(),
+                    "ids": self.ids,
+                    "hashes": self.hashes,
+                }
+                tmp_vectores = ruta_vectores.with_suffix(f".{os.getpid()}.tmp.npy")
+                tmp_meta = ruta_meta.with_suffix(f".{os.getpid()}.tmp")
+                np.save(tmp_vectores, vectores)
+                with open(tmp_meta, "w", encoding="utf-8") as f:
+                    json.dump(meta, f)
+                os.replace(tmp_vectores, ruta_vectores)
+                os.replace(tmp_meta, ruta_meta)
+        except Exception as e:
+            logging.warning(f"⚠️ No se pudo guardar el índice '{self.nombre}' en disco: {e}")
+
+    # --------------------------------------------------
+    # Mantenimiento incremental
+    def sincronizar(self):
+        """
+        Compara el índice con los documentos actuales de Mongo y solo codifica
+        los nuevos o aquellos cuyo texto ha cambiado. Elimina los que ya no existen.
+        """
+        documentos = self.cargar_documentos()
+        actuales = {str(d["_id"]): d for d in documentos}
+
+        with self._lock:
+            eliminados = [doc_id for doc_id in self.ids if doc_id not in actuales]
+            pendientes = []
+            for doc_id, doc in actuales.items():
+                texto = self.texto_documento(doc)
+                if self.hashes.get(doc_id) != hash_texto(texto):
+                    pendientes.append((doc_id, texto))
+
+            self.documentos = actuales
+            cambios = self._eliminar_filas(eliminados) + self._insertar_filas(pendientes)
+            self.ultima_sincronizacion = time.time()
+
+        if cambios:
+            logging.info(f"🔄 Índice '{self.nombre}' sincronizado: {len(pendientes)} codificados, {len(eliminados)} eliminados")
+            self.guardar()
+        return cambios
+
+    def actualizar(self, documento):
+        """
+        Inserta o reemplaza un documento. Solo recodifica si su texto ha cambiado.
+        """
+        doc_id = str(documento["_id"])
+        texto = self.texto_documento(documento)
+        with self._lock:
+            self.documentos[doc_id] = documento
+            if self.hashes.get(doc_id) == hash_texto(texto):
+                return False
+            self._insertar_filas([(doc_id, texto)])
+        self.guardar()
+        return True
+
+    def eliminar(self, doc_id):
+        doc_id = str(doc_id)
+        with self._lock:
+            self.documentos.pop(doc_id, None)
+            if not self._eliminar_filas([doc_id]):
+                return False
+        self.guardar()
+        return True
+
+    def _insertar_filas(self, pendientes):
+        if not pendientes:
+            return 0
+        nuevos = self.codificar([texto for _, texto in pendientes]).astype("float32")
+        self._eliminar_filas([doc_id for doc_id, _ in pendientes])
+        self.vectores = nuevos if self.vectores is None else np.vstack([self.vectores, nuevos])
+        for doc_id, texto in pendientes:
+            self.ids.append(doc_id)
+            self.hashes[doc_id] = hash_texto(texto)
+        self.version += 1
+        self._faiss = None
+        return len(pendientes)
+
+    def _eliminar_filas(self, ids_eliminar):
+        ids_eliminar = set(ids_eliminar) & set(self.ids)
+        if not ids_eliminar:
+            return 0
+        conservar = [i for i, doc_id in enumerate(self.ids) if doc_id not in ids_eliminar]
+        self.ids = [self.ids[i] for i in conservar]
+        self.vectores = self.vectores[conservar] if conservar else None
+        for doc_id in ids_eliminar:
+            self.hashes.pop(doc_id, None)
+        self.version += 1
+        self._faiss = None
+        return len(ids_eliminar)
+
+    # --------------------------------------------------
+    # Búsqueda
+    def necesita_sincronizar(self):
+        return time.time() - self.ultima_sincronizacion > segundos_sincronizacion()
+
+    def buscar(self, embedding, top_k):
+        """
+        Devuelve una lista de (documento, similitud) ordenada de mayor a menor similitud.
+        """
+        return self.buscar_lote([embedding], top_k)[0]
+
+    def buscar_lote(self, embeddings, top_k):
+        """
+        Busca varios embeddings en una sola búsqueda matricial.
+        Devuelve, por cada embedding, su lista de (documento, similitud).
+        """
+        with self._lock:
+            if self.vectores is None or not self.ids or not len(embeddings):
+                return [[] for _ in range(len(embeddings))]
+            if self._faiss is None:
+                self._faiss = crear_indice_faiss(self.vectores, tipo_indice(self.nombre))
+            D, I = buscar_en_indice(self._faiss, self.vectores, np.asarray(embeddings, dtype="float32"), top_k)
+
+            resultados_lote = []
+            for filas, scores in zip(I, D):
+                resultados = []
+                for i, score in zip(filas, scores):
+                    if i == -1:
+                        continue
+                    documento = self.documentos.get(self.ids[i])
+                    if documento is not None:
+                        resultados.append((documento, float(score)))
+                resultados_lote.append(resultados)
+            return resultados_lote
+
+    def __len__(self):
+        return len(self.ids)
+
+
+# --------------------------------------------------
+# Registro de índices activos del proceso
+def registrar_indice(indice: IndiceVectorial):
+    _indices_activos[indice.nombre] = indice
+
+
+def notificar_actualizacion(nombre, documento):
+    """
+    Aplica un alta o modificación a un índice si está cargado en este proceso.
+    Los procesos que no lo tengan cargado lo reconciliarán al sincronizar.
+    """
+    indice = _indices_activos.get(nombre)
+    if indice is None or not documento:
+        return
+    try:
+        indice.actualizar(documento)
+    except Exception as e:
+        logging.warning(f"⚠️ No se pudo actualizar el índice '{nombre}': {e}")
+
+
+def notificar_eliminacion(nombre, doc_id):
+    indice = _indices_activos.get(nombre)
+    if indice is None:
+        return
+    try:
+        indice.eliminar(doc_id)
+    except Exception as e:
+        logging.warning(f"⚠️ No se pudo eliminar del índice '{nombre}': {e}")
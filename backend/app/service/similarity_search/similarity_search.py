@@ -1,39 +1,92 @@
 import logging
 from bson import ObjectId
 from datetime import datetime
-import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from app.models.publicacion import Publicacion
 from app.mongo.mongo_conceptos import update_concepto_dict, get_conceptos_dict
 from app.mongo.mongo_keywords import get_keywords 
 from app.service.llm.llm_utils import evaluar_relacion_llm 
+from app.service.similarity_search.indice_vectorial import IndiceVectorial, registrar_indice
+from app.service.similarity_search.fabrica_indices import crear_indice_faiss, tipo_indice
+from app.service.embeddings.embeddings import MODELO_EMBEDDINGS, codificar_textos, desempaquetar_embedding
 
-# Modelo de embeddings semánticos
-model = SentenceTransformer("intfloat/multilingual-e5-base")
+# Índices de conceptos y keywords compartidos por todo el proceso (se crean bajo demanda)
+_indice_conceptos = None
+_indice_keywords = None
+
+# Candidatos buscados por publicación en cada índice
+TOP_K_CONCEPTOS = 30
+TOP_K_KEYWORDS = 10
 
 def normalizar_texto(texto):
     return texto.replace("\n", " ").strip()
 
-def construir_indice_conceptos(conceptos):
-    textos = []
+def codificar_queries(textos):
+    return codificar_textos(["query: " + t for t in textos])
+
+def texto_concepto(c):
+    nombre = c.get("nombre", "")
+    descripcion = c.get("descripcion", "")
+    keyword_objs = c.get("keywords", [])
+    nombres_keywords = [kw.get("nombre", "") for kw in keyword_objs if isinstance(kw, dict)]
+    texto = f"{nombre}. {descripcion}. {'; '.join(nombres_keywords)}"
+    return normalizar_texto(texto)
+
+def get_indice_conceptos():
+    """
+    Devuelve el índice de conceptos del proceso. La primera vez lo carga de disco y
+    lo reconcilia con Mongo; después se resincroniza periódicamente y recibe los
+    cambios hechos desde mongo_conceptos en este mismo proceso.
+    """
+    global _indice_conceptos
+    if _indice_conceptos is None:
+        _indice_conceptos = IndiceVectorial(
+            nombre="conceptos_interes",
+            modelo=MODELO_EMBEDDINGS,
+            cargar_documentos=get_conceptos_dict,
+            texto_documento=texto_concepto,
+            codificar=codificar_queries,
+        )
+        _indice_conceptos.cargar()
+        registrar_indice(_indice_conceptos)
+    if _indice_conceptos.necesita_sincronizar():
+        _indice_conceptos.sincronizar()
+    return _indice_conceptos
+
+def texto_keyword(kw):
+    return normalizar_texto(kw.get("nombre", ""))
+
+def get_keywords_con_nombre():
+    return [kw for kw in get_keywords() if kw.get("nombre")]
+
+def get_indice_keywords():
+    """
+    Devuelve el índice de keywords del proceso, indexado por _id de keyword.
+    Solo se codifican las keywords nuevas o cuyo nombre ha cambiado.
+    """
+    global _indice_keywords
+    if _indice_keywords is None:
+        _indice_keywords = IndiceVectorial(
+            nombre="keywords",
+            modelo=MODELO_EMBEDDINGS,
+            cargar_documentos=get_keywords_con_nombre,
+            texto_documento=texto_keyword,
+            codificar=codificar_queries,
+        )
+        _indice_keywords.cargar()
+        registrar_indice(_indice_keywords)
+    if _indice_keywords.necesita_sincronizar():
+        _indice_keywords.sincronizar()
+    return _indice_keywords
 
-    for c in conceptos:
-        nombre = c.get("nombre", "")
-        descripcion = c.get("descripcion", "")
-        keyword_objs = c.get("keywords", [])
-        nombres_keywords = [kw.get("nombre", "") for kw in keyword_objs if isinstance(kw, dict)]
-        texto = f"{nombre}. {descripcion}. {'; '.join(nombres_keywords)}"
-        textos.append(normalizar_texto(texto))
+def construir_indice_conceptos(conceptos):
+    textos = [texto_concepto(c) for c in conceptos]
 
     if not textos:
         return None, [], []
 
-    queries = ["query: " + t for t in textos]
-    embeddings = model.encode(queries, normalize_embeddings=True)
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatIP(dim)
-    index.add(embeddings.astype("float32"))
+    embeddings = codificar_queries(textos)
+    index = crear_indice_faiss(embeddings, tipo_indice("conceptos_interes"))
 
     return index, textos, embeddings
 
@@ -42,41 +95,68 @@ def construir_indice_keywords(keywords):
     if not textos:
         return None, [], []
 
-    queries = ["query: " + t for t in textos]
-    embeddings = model.encode(queries, normalize_embeddings=True)
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatIP(dim)
-    index.add(embeddings.astype("float32"))
+    embeddings = codificar_queries(textos)
+    index = crear_indice_faiss(embeddings, tipo_indice("keywords"))
 
     return index, textos, embeddings
 
-def buscar_y_enlazar_a_conceptos(publicacion: Publicacion, top_k=30, umbral_similitud=0.834):
+def calcular_embedding_publicacion(publicacion: Publicacion):
+    """
+    Codifica titulo + contenido de la publicación una sola vez y guarda el vector
+    en publicacion.embedding para compartirlo entre el enlazado de conceptos y keywords.
+    Debe llamarse antes de resumir el contenido.
+    """
+    return calcular_embeddings_publicaciones([publicacion])[0]
+
+def calcular_embeddings_publicaciones(publicaciones):
+    """
+    Codifica un lote de publicaciones en una única llamada al modelo (mucho más eficiente
+    que una llamada por artículo) y guarda cada vector en publicacion.embedding.
+    """
+    textos = [normalizar_texto(f"{p.titulo}. {p.contenido}") for p in publicaciones]
+    embeddings = codificar_queries(textos)
+    for publicacion, embedding in zip(publicaciones, embeddings):
+        publicacion.embedding = embedding
+    return embeddings
+
+def buscar_candidatos_lote(embeddings, top_k_conceptos=TOP_K_CONCEPTOS, top_k_keywords=TOP_K_KEYWORDS):
+    """
+    Busca los conceptos y keywords candidatos de un lote de embeddings con una búsqueda
+    matricial por índice. Devuelve (candidatos_conceptos, candidatos_keywords), una lista
+    de (documento, similitud) por embedding, para pasarlos a buscar_y_enlazar_a_conceptos
+    y obtener_keywords_relacionadas.
+    """
+    return (
+        get_indice_conceptos().buscar_lote(embeddings, top_k_conceptos),
+        get_indice_keywords().buscar_lote(embeddings, top_k_keywords),
+    )
+
+def _embedding_de(publicacion: Publicacion, embedding=None):
+    if embedding is not None:
+        return np.asarray(embedding, dtype="float32")
+    if publicacion.embedding is not None:
+        return desempaquetar_embedding(publicacion.embedding)
+    return calcular_embedding_publicacion(publicacion)
+
+def buscar_y_enlazar_a_conceptos(publicacion: Publicacion, top_k=TOP_K_CONCEPTOS, umbral_similitud=0.834,
+                                 embedding=None, candidatos=None):
+    """
+    :param candidatos: (concepto, similitud) ya buscados en lote con buscar_candidatos_lote.
+    """
     if not publicacion or not publicacion._id:
         logging.warning(f"⚠️ Publicación inválida o sin _id.")
         return []
 
-    texto = normalizar_texto(f"{publicacion.titulo}. {publicacion.contenido}")
-    emb_pub = model.encode(["query: " + texto], normalize_embeddings=True)[0].astype("float32")
-
-    conceptos = get_conceptos_dict()
-    if not conceptos:
-        logging.info(f"❌ No hay conceptos registrados.")
-        return []
-
-    index, textos_concepto, _ = construir_indice_conceptos(conceptos)
-    if index is None:
-        return []
-
-    D, I = index.search(np.array([emb_pub]), top_k)
+    if candidatos is None:
+        indice = get_indice_conceptos()
+        if not len(indice):
+            logging.info(f"❌ No hay conceptos registrados.")
+            return []
+        candidatos = indice.buscar(_embedding_de(publicacion, embedding), top_k)
 
     conceptos_enlazados_ids = []
 
-    for i, score in zip(I[0], D[0]):
-        if i == -1:
-            continue
-
-        similitud = score
-        concepto = conceptos[i]
+    for concepto, similitud in candidatos:
         logging.info(f"🔎 Evaluando '{concepto['nombre']}' (similitud: {similitud:.4f})")
 
         if similitud >= umbral_similitud* 1.02:
@@ -97,28 +177,18 @@ def buscar_y_enlazar_a_conceptos(publicacion: Publicacion, top_k=30, umbral_simi
 
 
 
-def obtener_keywords_relacionadas(publicacion, umbral_keyword=0.83, top_k=10):
-    texto = normalizar_texto(f"{publicacion.titulo}. {publicacion.contenido}")
-    emb_pub = model.encode(["query: " + texto], normalize_embeddings=True)[0].astype("float32")
-
-    keywords = get_keywords()
-    if not keywords:
-        logging.info("❌ No hay keywords registradas.")
-        return []
-
-    index, textos_keywords, _ = construir_indice_keywords(keywords)
-    if index is None:
-        logging.warning("⚠️ No se pudo construir el índice FAISS de keywords.")
-        return []
-
-    D, I = index.search(np.array([emb_pub]), top_k)
+def obtener_keywords_relacionadas(publicacion, umbral_keyword=0.83, top_k=TOP_K_KEYWORDS, embedding=None,
+                                  candidatos=None):
+    if candidatos is None:
+        indice = get_indice_keywords()
+        if not len(indice):
+            logging.info("❌ No hay keywords registradas.")
+            return []
+        candidatos = indice.buscar(_embedding_de(publicacion, embedding), top_k)
 
     keywords_relacionadas = []
-    for i, score in zip(I[0], D[0]):
-        if i == -1:
-            continue
+    for kw, score in candidatos:
         if score >= umbral_keyword:
-            kw = keywords[i]
             keywords_relacionadas.append({
                 "keyword_id": kw["_id"],
                 "nombre": kw["nombre"],
@@ -0,0 +1,58 @@
+# filtro_urls.py
+# Filtro en memoria de URLs ya guardadas, por fuente. Se carga de "publicaciones"
+# una vez al empezar el rastreo y se actualiza con cada inserción, de forma que el
+# spider descarta los enlaces conocidos sin consultar Mongo.
+#
+# Cada URL se guarda como un hash de 64 bits en un array ordenado (8 bytes por URL).
+# La probabilidad de colisión es despreciable (~n²/2^65), por lo que un positivo se
+# trata como URL conocida sin confirmarlo en Mongo. Los negativos siguen pasando por
+# la comprobación de existencia de create_publicacion antes de insertar.
+
+import hashlib
+import logging
+import re
+
+import numpy as np
+
+from app.mongo.mongo_publicaciones import normalizar_url
+from app.mongo.mongo_utils import get_collection
+
+
+def hash_url(url: str) -> int:
+    digest = hashlib.blake2b(normalizar_url(url).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class FiltroUrlsVistas:
+
+    def __init__(self, prefijo_url: str):
+        self.prefijo_url = normalizar_url(prefijo_url)
+        self._cargadas = np.zeros(0, dtype=np.uint64)  # hashes ordenados cargados de Mongo
+        self._nuevas = set()                           # hashes añadidos durante el rastreo
+
+    def cargar(self):
+        """
+        Carga los hashes de las URLs guardadas que empiezan por el prefijo de la fuente.
+        El regex anclado y sensible a mayúsculas usa el índice de url.
+        """
+        cursor = get_collection("publicaciones").find(
+            {"url": {"$regex": "^" + re.escape(self.prefijo_url)}},
+            {"url": 1, "_id": 0}
+        )
+        hashes = np.fromiter((hash_url(doc["url"]) for doc in cursor if doc.get("url")), dtype=np.uint64)
+        self._cargadas = np.unique(hashes)
+        logging.info(f"🧮 Filtro de URLs cargado para {self.prefijo_url}: {len(self._cargadas)} URLs conocidas")
+        return self
+
+    def contiene(self, url: str) -> bool:
+        h = hash_url(url)
+        if h in self._nuevas:
+            return True
+        pos = np.searchsorted(self._cargadas, np.uint64(h))
+        return pos < len(self._cargadas) and int(self._cargadas[pos]) == h
+
+    def agregar(self, url: str):
+        self._nuevas.add(hash_url(url))
+
+    def __len__(self):
+        return len(self._cargadas) + len(self._nuevas)
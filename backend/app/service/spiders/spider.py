@@ -1,22 +1,33 @@
 import logging
+import os
 import scrapy
 from datetime import datetime
 import re
-import time
-import random
 from urllib.parse import urlparse
 import json
+import time
 from bson import ObjectId
 
 from app.models.publicacion import Publicacion
 from app.models.fuente import Fuente
-from app.mongo.mongo_fuentes import get_fuente_by_id
-from app.mongo.mongo_publicaciones import create_publicacion, update_publicacion
-from app.mongo.mongo_utils import get_collection
-from app.service.similarity_search.similarity_search import buscar_y_enlazar_a_conceptos, obtener_keywords_relacionadas
-from app.service.llm.llm_utils import analizar_publicacion
+from app.mongo.mongo_jobs import actualizar_contadores_job
+from app.mongo.mongo_publicaciones import create_publicacion, get_urls_existentes, normalizar_url
+from app.service.jobs.enriquecimiento_job import enriquecer_publicacion, encolar_enriquecimiento, enriquecimiento_en_cola
+from app.service.spiders.filtro_urls import FiltroUrlsVistas
 from pymongo.errors import DuplicateKeyError, WriteError, ConnectionFailure
 
+# Segundos mínimos entre escrituras de los contadores en el job de scraping
+SEGUNDOS_ENTRE_CONTADORES = 5
+
+
+# La configuración se lee al usarla: este módulo se importa antes de cargar el .env
+def usar_filtro_urls():
+    """
+    Descartar enlaces conocidos con un filtro en memoria por fuente en vez de consultar Mongo
+    """
+    return os.getenv("SCRAPING_FILTRO_URLS", "true").lower() == "true"
+
+
 class NoticiasSpider(scrapy.Spider):
     name = "noticias"
 
@@ -24,30 +35,61 @@ class NoticiasSpider(scrapy.Spider):
         'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
     }
 
-    def __init__(self, fuente_json=None, *args, **kwargs):
+    def __init__(self, fuente_json=None, fuentes_json=None, job_id=None, *args, **kwargs):
+        """
+        :param fuente_json: una fuente serializada en JSON.
+        :param fuentes_json: lista de fuentes serializada en JSON, para rastrearlas todas
+            en el mismo spider compartiendo los límites de concurrencia del downloader.
+        :param job_id: trabajo de scraping (colección jobs) en el que publicar los contadores.
+        """
         super().__init__(*args, **kwargs)
 
-        if not fuente_json:
-            raise ValueError("Se requiere el parámetro 'fuente_json' con los datos de la fuente.")
+        if fuentes_json:
+            fuentes = [Fuente.from_dict(f) for f in json.loads(fuentes_json)]
+        elif fuente_json:
+            fuentes = [Fuente.from_dict(json.loads(fuente_json))]
+        else:
+            raise ValueError("Se requiere el parámetro 'fuente_json' o 'fuentes_json' con los datos de las fuentes.")
 
-        self.fuente = Fuente.from_dict(json.loads(fuente_json))
-        self.start_urls = [self.fuente.url]
+        self.fuentes = {str(f._id): f for f in fuentes}
+        self.start_urls = [f.url for f in fuentes]
 
         self.total_guardados = 0
         self.total_ignorados = 0
         self.total_relacionados = 0
+        self.total_errores = 0
+
+        self.job_id = job_id
+        self._ultima_publicacion_contadores = 0
+
+        # Filtros de URLs ya guardadas, por fuente (se cargan al empezar el rastreo)
+        self.filtros_urls = {}
 
     def start_requests(self):
-        for url in self.start_urls:
-            yield scrapy.Request(url=url, callback=self.extraer_titular_noticias)
+        filtrar_urls = usar_filtro_urls()
+        for fuente_id, fuente in self.fuentes.items():
+            if filtrar_urls:
+                try:
+                    self.filtros_urls[fuente_id] = FiltroUrlsVistas(fuente.url).cargar()
+                except Exception as e:
+                    logging.warning(f"⚠️ No se pudo cargar el filtro de URLs de {fuente.nombre}: {e}")
+            yield scrapy.Request(
+                url=fuente.url,
+                callback=self.extraer_titular_noticias,
+                meta={'fuente_id': fuente_id}
+            )
 
     def extraer_titular_noticias(self, response):
+        fuente = self.fuentes[response.meta['fuente_id']]
         titulos_baneados = {
             "Nacional", "Internacional", "Economía", "Opinión", "Tele",
             "Gente", "Deportes", "20bits", "Ed. Impresa", "España"
         }
 
-        for noticia in response.xpath(self.fuente.etiqueta_titulo):
+        # Candidatos de la página: url normalizada -> (titulo, url)
+        candidatos = {}
+
+        for noticia in response.xpath(fuente.etiqueta_titulo):
             texto = noticia.xpath(".//text()").getall()
             enlace = noticia.xpath("@href").get()
 
@@ -58,42 +100,53 @@ class NoticiasSpider(scrapy.Spider):
                     logging.info(f"⛔ Título ignorado: '{texto_limpio}'")
                     continue
 
-                if "h1" in self.fuente.etiqueta_titulo and len(texto_limpio.split()) <= 3:
+                if "h1" in fuente.etiqueta_titulo and len(texto_limpio.split()) <= 3:
                     continue
 
                 url_completa = response.urljoin(enlace)
 
-                if not url_completa.startswith(self.fuente.url):
+                if not url_completa.startswith(fuente.url):
                     logging.info(f"⛔ Ignorada URL fuera de dominio: {url_completa}")
                     continue
 
-                if get_collection("publicaciones").find_one({"url": url_completa}):
-                    logging.warning(f"⚠️ Ya existe en Mongo: {url_completa}")
-                    self.total_ignorados += 1
-                    continue
+                candidatos.setdefault(normalizar_url(url_completa), (texto_limpio, url_completa))
+
+        # Descartar las ya guardadas: con el filtro en memoria o con una sola consulta por página
+        filtro = self.filtros_urls.get(response.meta['fuente_id'])
+        if filtro is not None:
+            existentes = {u for u in candidatos if filtro.contiene(u)}
+        else:
+            existentes = get_urls_existentes(list(candidatos.keys()))
+
+        for url_normalizada, (texto_limpio, url_completa) in candidatos.items():
+            if url_normalizada in existentes:
+                logging.warning(f"⚠️ Ya existe en Mongo: {url_completa}")
+                self.total_ignorados += 1
+                continue
+
+            yield scrapy.Request(
+                url_completa,
+                callback=self.extraer_contenido_noticia_nueva,
+                meta={
+                    'titulo': texto_limpio,
+                    'url': url_completa,
+                    'fuente_id': fuente._id
+                }
+            )
 
-                yield scrapy.Request(
-                    url_completa,
-                    callback=self.extraer_contenido_noticia_nueva,
-                    meta={
-                        'titulo': texto_limpio,
-                        'url': url_completa,
-                        'fuente_id': self.fuente._id
-                    }
-                )
+        # Los descartados de la página también cuentan en el progreso del job
+        self.publicar_contadores()
 
     def extraer_contenido_noticia_nueva(self, response):
-        delay = random.uniform(0.5, 2)
-        time.sleep(delay)
-
         logging.info(f"📰 Procesando noticia...")
 
         titulo = response.meta['titulo']
         url = response.meta['url']
+        fuente = self.fuentes[response.meta['fuente_id']]
         fuente_id = ObjectId(response.meta['fuente_id'])
 
         contenido = []
-        for p in response.xpath(self.fuente.etiqueta_contenido):
+        for p in response.xpath(fuente.etiqueta_contenido):
             texto = " ".join(p.xpath(".//text()").getall()).strip()
             if len(texto.split()) > 20:
                 contenido.append(texto)
@@ -108,59 +161,69 @@ class NoticiasSpider(scrapy.Spider):
             fuente_id=fuente_id
         )
 
-        fuente = get_fuente_by_id(fuente_id)
-
         try:
             logging.info(f"💾 Intentando guardar: {titulo[:60]}...")
             insert_result = create_publicacion(publicacion)
-            publicacion._id = str(insert_result.inserted_id)
 
-            self.total_guardados += 1
-            logging.info(f"✅ Artículo guardado: {titulo} | Fuente: {fuente.nombre}")
+            filtro = self.filtros_urls.get(response.meta['fuente_id'])
+            if filtro is not None:
+                filtro.agregar(url)
 
-            conceptos_enlazados_ids = buscar_y_enlazar_a_conceptos(publicacion)
+            if insert_result is None:
+                self.total_ignorados += 1
+                self.publicar_contadores()
+                return
 
-            keywords_relacionadas = obtener_keywords_relacionadas(publicacion)
-            if keywords_relacionadas:
-                logging.info(f"🔗 Keywords relacionadas encontradas ({len(keywords_relacionadas)}):")
-                for kw in keywords_relacionadas:
-                    logging.info(f"🧠 {kw['nombre']} (similitud: {kw['similitud']})")
-            else:
-                logging.info("📭 No se encontraron keywords relacionadas con la publicación.")
+            publicacion._id = str(insert_result.inserted_id)
 
-            publicacion.keywords_relacionadas_ids = [ObjectId(k["keyword_id"]) for k in keywords_relacionadas]
+            self.total_guardados += 1
+            logging.info(f"✅ Artículo guardado: {titulo} | Fuente: {fuente.nombre}")
 
-            if conceptos_enlazados_ids:
-                publicacion.conceptos_relacionados_ids = conceptos_enlazados_ids
-                publicacion = analizar_publicacion(publicacion)
+            if enriquecimiento_en_cola():
+                # El enriquecimiento (embedding, conceptos, LLM) lo hacen los workers
+                encolar_enriquecimiento(publicacion._id)
+                logging.info("📨 Enriquecimiento encolado.")
+            elif enriquecer_publicacion(publicacion):
                 self.total_relacionados += 1
-            else:
-                publicacion.contenido = ""
-
-            update_publicacion(
-                pub_id=publicacion._id,
-                data={
-                    "contenido": publicacion.contenido,
-                    "tono": publicacion.tono,
-                    "ciudad_region": str(publicacion.ciudad_region) if publicacion.ciudad_region else None,
-                    "pais": str(publicacion.pais) if publicacion.pais else None,
-                    "keywords_relacionadas_ids": publicacion.keywords_relacionadas_ids,
-                    "conceptos_relacionados_ids": publicacion.conceptos_relacionados_ids
-                },
-            )
         except DuplicateKeyError:
             logging.warning(f"⚠️ Ya existe (aunque no se detectó antes): {url}")
         except ConnectionFailure:
+            self.total_errores += 1
             logging.error(f" ❌ No se pudo conectar a MongoDB.")
         except WriteError as e:
+            self.total_errores += 1
             logging.error(f" ❌ Error de escritura en MongoDB: {e}")
         except Exception as e:
+            self.total_errores += 1
             logging.error(f" ❌ Error inesperado: {e}")
 
+        self.publicar_contadores()
         print("---------------------------------------------------------------------------------")
 
+    def publicar_contadores(self, forzar=False):
+        """
+        Escribe los contadores en el job de scraping, como mucho cada SEGUNDOS_ENTRE_CONTADORES.
+        """
+        if not self.job_id:
+            return
+        ahora = time.time()
+        if not forzar and ahora - self._ultima_publicacion_contadores < SEGUNDOS_ENTRE_CONTADORES:
+            return
+        self._ultima_publicacion_contadores = ahora
+        try:
+            actualizar_contadores_job(self.job_id, {
+                "guardados": self.total_guardados,
+                "ignorados": self.total_ignorados,
+                "relacionados": self.total_relacionados,
+                "errores": self.total_errores,
+            })
+        except Exception as e:
+            logging.warning(f"⚠️ No se pudieron actualizar los contadores del job {self.job_id}: {e}")
+
     def closed(self, reason):
         logging.info(f" 📦 Total guardados: {self.total_guardados}")
         logging.info(f" 🧠 Total relacionados: {self.total_relacionados}")
         logging.info(f" 🚫 Total ignorados (ya existentes): {self.total_ignorados}")
+        logging.info(f" ❌ Total errores: {self.total_errores}")
+        self.publicar_contadores(forzar=True)
         print("---------------------------------------------------------------------------------")
\ No newline at end of file
@@ -11,41 +11,71 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.
 from app.config import logqing_config
 from app.service.spiders.spider import NoticiasSpider
 from app.service.spiders.spider_telegram import TelegramSpider
-from app.mongo.mongo_utils import init_mongo
+from app.service.spiders.politica_descarga import ajustes_politica_descarga
+from app.mongo.mongo_utils import init_mongo, get_collection
 from app.models.fuente import Fuente
 
+# Límites de concurrencia del downloader cuando se rastrean varias fuentes a la vez
+CONCURRENCIA_GLOBAL = int(os.getenv("SCRAPING_CONCURRENCIA_GLOBAL", 32))
+CONCURRENCIA_DOMINIO = int(os.getenv("SCRAPING_CONCURRENCIA_DOMINIO", 4))
+
 # Inicializar conexión a MongoDB y logging
 init_mongo()
 logqing_config()
 
 # Verificar argumentos
 if len(sys.argv) < 2:
-    print("❌ Debes pasar un objeto Fuente serializado en JSON como argumento.")
+    print("❌ Debes pasar un objeto Fuente serializado en JSON como argumento, o --todas.")
     sys.exit(1)
 
-# Obtener fuente_json del argumento
-fuente_json = sys.argv[1]
+# Job de scraping opcional (--job <id>) en el que el spider publica sus contadores
+job_id = sys.argv[sys.argv.index("--job") + 1] if "--job" in sys.argv[:-1] else None
 
-# Intentar cargar la fuente
-try:
-    fuente_dict = json.loads(fuente_json)
-    fuente = Fuente.from_dict(fuente_dict)
-except Exception as e:
-    print(f"❌ Error interpretando fuente: {e}")
-    sys.exit(1)
 
-# Configuración y ejecución de Scrapy
-process = CrawlerProcess(settings={
-    "LOG_ENABLED": False
-})
+def crear_proceso(fuentes):
+    """
+    Crea el CrawlerProcess con los límites globales y la política de descarga de cada fuente.
+    """
+    return CrawlerProcess(settings={
+        "LOG_ENABLED": False,
+        "CONCURRENT_REQUESTS": CONCURRENCIA_GLOBAL,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": CONCURRENCIA_DOMINIO,
+        **ajustes_politica_descarga(fuentes),
+    })
+
 
-# Elegir spider en función del tipo de URL
-if fuente.url.startswith(("https://tlgrm", "http://tlgrm", "https://t.me", "http://t.me")):
-    logging.info("📲 Fuente Telegram detectada. Usando TelegramSpider.")
-    process.crawl(TelegramSpider, fuente_json=fuente_json)
+if sys.argv[1] == "--todas":
+    # Todas las fuentes activas de noticias en un único spider y un único reactor.
+    # Las fuentes de Telegram necesitan otro reactor y se lanzan por separado.
+    fuentes = [Fuente.from_dict(f) for f in get_collection("fuentes").find({"activa": {"$ne": False}})]
+    fuentes = [f for f in fuentes if not f.es_telegram()]
+    if not fuentes:
+        logging.info("📭 No hay fuentes de noticias activas para rastrear.")
+        sys.exit(0)
+
+    logging.info(f"🌐 Rastreando {len(fuentes)} fuentes de noticias en un único proceso.")
+    process = crear_proceso(fuentes)
+    process.crawl(NoticiasSpider, fuentes_json=json.dumps([f.to_dict() for f in fuentes], default=str), job_id=job_id)
 else:
-    logging.info("🌐 Fuente de noticia detectada. Usando NoticiasSpider.")
-    process.crawl(NoticiasSpider, fuente_json=fuente_json)
+    # Obtener fuente_json del argumento
+    fuente_json = sys.argv[1]
+
+    # Intentar cargar la fuente
+    try:
+        fuente_dict = json.loads(fuente_json)
+        fuente = Fuente.from_dict(fuente_dict)
+    except Exception as e:
+        print(f"❌ Error interpretando fuente: {e}")
+        sys.exit(1)
+
+    # Elegir spider en función del tipo de URL
+    process = crear_proceso([fuente])
+    if fuente.es_telegram():
+        logging.info("📲 Fuente Telegram detectada. Usando TelegramSpider.")
+        process.crawl(TelegramSpider, fuente_json=fuente_json, job_id=job_id)
+    else:
+        logging.info("🌐 Fuente de noticia detectada. Usando NoticiasSpider.")
+        process.crawl(NoticiasSpider, fuente_json=fuente_json, job_id=job_id)
 
 # Iniciar proceso
 process.start()
@@ -4,6 +4,7 @@ import scrapy
 from scrapy_playwright.page import PageMethod
 from datetime import datetime
 from pymongo.errors import DuplicateKeyError, ConnectionFailure, WriteError
+from app.mongo.mongo_jobs import actualizar_contadores_job
 from app.mongo.mongo_publicaciones import create_publicacion
 from app.models.publicacion import Publicacion
 from app.service.similarity_search.similarity_search import buscar_y_enlazar_a_conceptos
@@ -26,11 +27,19 @@ class TelegramSpider(scrapy.Spider):
         "PLAYWRIGHT_DEFAULT_NAVIGATION_TIMEOUT": 60 * 1000,
     }
 
-    def __init__(self, url=None, *args, **kwargs):
+    def __init__(self, url=None, job_id=None, *args, **kwargs):
+        """
+        :param job_id: trabajo de scraping (colección jobs) en el que publicar los contadores.
+        """
         super().__init__(*args, **kwargs)
         self.start_urls = [url] if url else [""]
         self.fuente = self.start_urls[0]
 
+        self.job_id = job_id
+        self.total_guardados = 0
+        self.total_ignorados = 0
+        self.total_errores = 0
+
     def start_requests(self):
         for url in self.start_urls:
             yield scrapy.Request(
@@ -65,8 +74,6 @@ class TelegramSpider(scrapy.Spider):
         articulos = response.css("article.cpost-wt-text")
         logging.info(f"Artículos encontrados: {len(articulos)}")
 
-        total_guardados = 0
-
         for articulo in articulos:
             # Extrae todo el contenido de texto del artículo (sin etiquetas)
             texto_completo = articulo.xpath("string()").get(default="").strip()
@@ -100,24 +107,45 @@ class TelegramSpider(scrapy.Spider):
                 insert_result = create_publicacion(publicacion)
                 if insert_result:
                     publicacion._id = str(insert_result.inserted_id)
-                    total_guardados += 1
+                    self.total_guardados += 1
                     logging.info(f"✅ Artículo guardado: {titulo} | Fuente: {publicacion.fuente}")
 
                     # Enlaza con conceptos relacionados
                     buscar_y_enlazar_a_conceptos(publicacion)
                 else:
+                    self.total_ignorados += 1
                     logging.warning("⚠️ No se insertó (posiblemente duplicado).")
 
             except DuplicateKeyError:
+                self.total_ignorados += 1
                 logging.error("❌ Ya existe un artículo con esa clave.")
             except ConnectionFailure:
+                self.total_errores += 1
                 logging.error("❌ No se pudo conectar a MongoDB.")
             except WriteError as e:
+                self.total_errores += 1
                 logging.error(f"❌ Error al escribir en la base de datos: {e}")
             except Exception as e:
+                self.total_errores += 1
                 logging.error(f"❌ Error inesperado: {e}")
 
             print("---------------------------------------------------------------------------------")
 
-        logging.info(f"\n💾 Total guardados: {total_guardados}")
+        logging.info(f"\n💾 Total guardados: {self.total_guardados}")
+
+    def closed(self, reason):
+        """
+        Publica los contadores en el job de scraping (los mismos campos que NoticiasSpider).
+        """
+        if not self.job_id:
+            return
+        try:
+            actualizar_contadores_job(self.job_id, {
+                "guardados": self.total_guardados,
+                "ignorados": self.total_ignorados,
+                "relacionados": 0,
+                "errores": self.total_errores,
+            })
+        except Exception as e:
+            logging.warning(f"⚠️ No se pudieron actualizar los contadores del job {self.job_id}: {e}")
 
@@ -0,0 +1,31 @@
+# conftest.py
+# Fixtures comunes de los tests. Los tests que usan Mongo se conectan a MONGO_URI_TEST
+# (por defecto un Mongo local) y trabajan en una base de datos temporal que se borra al terminar;
+# si no hay un Mongo accesible, se omiten.
+
+import os
+import uuid
+
+import pytest
+
+
+@pytest.fixture
+def mongo_db(monkeypatch):
+    pymongo = pytest.importorskip("pymongo")
+    from app.mongo import mongo_utils
+    from app.mongo.mongo_indices import crear_indices
+
+    client = pymongo.MongoClient(os.getenv("MONGO_URI_TEST", "mongodb://localhost:27017"), serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except pymongo.errors.PyMongoError as e:
+        client.close()
+        pytest.skip(f"No hay un Mongo accesible en MONGO_URI_TEST: {e}")
+
+    nombre = f"scrauron_test_{uuid.uuid4().hex[:8]}"
+    db = client[nombre]
+    crear_indices(db)
+    monkeypatch.setattr(mongo_utils, "db", db, raising=False)
+    yield db
+    client.drop_database(nombre)
+    client.close()
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+# El paquete app carga Flask, Mongo, FAISS y el cliente del LLM: hace falta requirements.txt
+pytest.importorskip("app")
+
+from app.service.llm import llm_utils
+from app.service.llm.cache_llm import clave_cache, leer_respuesta, guardar_respuesta, COLECCION_CACHE
+
+MENSAJES = [{"role": "user", "content": "Resume la noticia"}]
+
+
+class ClienteFalso:
+    """
+    Cliente con la interfaz de chat.completions de OpenAI que cuenta las llamadas.
+    """
+
+    def __init__(self, respuesta="respuesta nueva"):
+        self.llamadas = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._crear))
+        self._respuesta = respuesta
+
+    def _crear(self, model, messages, temperature):
+        self.llamadas += 1
+        return SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5),
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f" {self._respuesta} "))],
+        )
+
+
+@pytest.fixture
+def llm_con_cache(monkeypatch):
+    """
+    Sustituye el cliente del LLM y la caché de Mongo por dobles que registran su uso.
+    """
+    cliente = ClienteFalso()
+    cache = {}
+    uso = {"leidas": 0, "guardadas": 0}
+
+    def leer(modelo, messages, temperature):
+        uso["leidas"] += 1
+        return cache.get(clave_cache(modelo, messages, temperature))
+
+    def guardar(modelo, messages, temperature, respuesta):
+        uso["guardadas"] += 1
+        cache[clave_cache(modelo, messages, temperature)] = respuesta
+
+    monkeypatch.setattr(llm_utils, "get_openai_client", lambda: (cliente, "modelo-prueba"))
+    monkeypatch.setattr(llm_utils, "cache_llm_activa", lambda: True)
+    monkeypatch.setattr(llm_utils, "leer_respuesta", leer)
+    monkeypatch.setattr(llm_utils, "guardar_respuesta", guardar)
+    return cliente, cache, uso
+
+
+def test_clave_cache_estable():
+    assert clave_cache("m", MENSAJES, 0.2) == clave_cache("m", [dict(reversed(MENSAJES[0].items()))], 0.2)
+
+
+@pytest.mark.parametrize("modelo, mensajes, temperatura", [
+    ("otro", MENSAJES, 0.2),
+    ("m", [{"role": "user", "content": "Resume la noticia."}], 0.2),
+    ("m", MENSAJES, 0.7),
+])
+def test_clave_cache_cambia_con_modelo_mensajes_y_temperatura(modelo, mensajes, temperatura):
+    assert clave_cache("m", MENSAJES, 0.2) != clave_cache(modelo, mensajes, temperatura)
+
+
+def test_respuesta_cacheada_no_llama_al_llm(llm_con_cache):
+    cliente, _, uso = llm_con_cache
+
+    primera = llm_utils.get_gpt_response(MENSAJES, 0.2)
+    segunda = llm_utils.get_gpt_response(MENSAJES, 0.2)
+
+    assert primera == segunda == "respuesta nueva"
+    assert cliente.llamadas == 1
+    assert uso == {"leidas": 2, "guardadas": 1}
+
+
+def test_sin_cache_siempre_llama_al_llm(llm_con_cache):
+    cliente, cache, uso = llm_con_cache
+    cache[clave_cache("modelo-prueba", MENSAJES, 0.7)] = "respuesta antigua"
+
+    respuesta = llm_utils.get_gpt_response(MENSAJES, 0.7, cache=False)
+    llm_utils.get_gpt_response(MENSAJES, 0.7, cache=False)
+
+    assert respuesta == "respuesta nueva"
+    assert cliente.llamadas == 2
+    assert uso == {"leidas": 0, "guardadas": 0}
+    assert cache[clave_cache("modelo-prueba", MENSAJES, 0.7)] == "respuesta antigua"
+
+
+def test_cache_desactivada(llm_con_cache, monkeypatch):
+    cliente, _, uso = llm_con_cache
+    monkeypatch.setattr(llm_utils, "cache_llm_activa", lambda: False)
+
+    llm_utils.get_gpt_response(MENSAJES, 0.2)
+
+    assert cliente.llamadas == 1
+    assert uso == {"leidas": 0, "guardadas": 0}
+
+
+def test_guardar_y_leer_en_mongo(mongo_db):
+    assert leer_respuesta("m", MENSAJES, 0.2) is None
+
+    guardar_respuesta("m", MENSAJES, 0.2, "resumen")
+
+    assert leer_respuesta("m", MENSAJES, 0.2) == "resumen"
+    assert leer_respuesta("m", MENSAJES, 0.7) is None
+    assert mongo_db[COLECCION_CACHE].find_one()["accesos"] == 1
+
+
+def test_entrada_caducada_no_se_devuelve(mongo_db):
+    guardar_respuesta("m", MENSAJES, 0.2, "resumen")
+    mongo_db[COLECCION_CACHE].update_many({}, {"$set": {"expira": datetime.now() - timedelta(seconds=1)}})
+
+    assert leer_respuesta("m", MENSAJES, 0.2) is None
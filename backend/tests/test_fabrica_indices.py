@@ -0,0 +1,81 @@
+import pytest
+
+# El paquete app carga Flask, Mongo, FAISS y el cliente del LLM: hace falta requirements.txt
+pytest.importorskip("app")
+np = pytest.importorskip("numpy")
+faiss = pytest.importorskip("faiss")
+
+from app.service.similarity_search.fabrica_indices import (
+    crear_indice_faiss, buscar_en_indice, es_aproximado, tipo_indice
+)
+
+
+def _vectores(n, dim=32, semilla=0):
+    vectores = np.random.default_rng(semilla).standard_normal((n, dim)).astype("float32")
+    return vectores / np.linalg.norm(vectores, axis=1, keepdims=True)
+
+
+def test_tipo_indice_configurado(monkeypatch):
+    monkeypatch.delenv("INDICE_PRUEBA_TIPO", raising=False)
+    assert tipo_indice("prueba") == "flat"
+    monkeypatch.setenv("INDICE_PRUEBA_TIPO", "HNSW")
+    assert tipo_indice("prueba") == "hnsw"
+    monkeypatch.setenv("INDICE_PRUEBA_TIPO", "otro")
+    assert tipo_indice("prueba") == "flat"
+
+
+@pytest.mark.parametrize("tipo", ["ivfpq", "hnsw"])
+def test_pocos_vectores_usan_indice_exacto(tipo):
+    indice = crear_indice_faiss(_vectores(100), tipo, min_vectores_aproximado=1000)
+
+    assert not es_aproximado(indice)
+    assert indice.ntotal == 100
+
+
+@pytest.mark.parametrize("tipo, clase", [("hnsw", faiss.IndexHNSWFlat), ("ivfpq", faiss.IndexIVFPQ)])
+def test_aproximado_a_partir_del_minimo(tipo, clase):
+    indice = crear_indice_faiss(_vectores(2000), tipo, min_vectores_aproximado=1000)
+
+    assert isinstance(indice, clase)
+    assert es_aproximado(indice)
+    assert indice.ntotal == 2000
+
+
+@pytest.mark.parametrize("tipo", ["hnsw", "ivfpq"])
+def test_refinado_devuelve_similitudes_exactas(tipo):
+    vectores = _vectores(2000)
+    consultas = vectores[:10]
+    indice = crear_indice_faiss(vectores, tipo, min_vectores_aproximado=0)
+
+    D, I = buscar_en_indice(indice, vectores, consultas, 5)
+
+    for q in range(len(consultas)):
+        filas = I[q][I[q] != -1]
+        # Las puntuaciones son el producto interno exacto, en orden descendente
+        np.testing.assert_allclose(D[q][:len(filas)], vectores[filas] @ consultas[q], rtol=1e-5)
+        assert np.all(np.diff(D[q][:len(filas)]) <= 0)
+    # Cada consulta es un vector del índice: HNSW la encuentra primero con similitud 1
+    # (IVF-PQ puede no llevarla a los candidatos si su lista no se explora)
+    if tipo == "hnsw":
+        assert list(I[:, 0]) == list(range(10))
+        np.testing.assert_allclose(D[:, 0], 1.0, rtol=1e-5)
+
+
+def test_recall_del_aproximado_frente_al_exacto():
+    vectores = _vectores(3000, semilla=1)
+    consultas = _vectores(20, semilla=2)
+    _, exactos = crear_indice_faiss(vectores, "flat").search(consultas, 10)
+
+    _, I = buscar_en_indice(crear_indice_faiss(vectores, "hnsw", min_vectores_aproximado=0), vectores, consultas, 10)
+
+    recall = np.mean([len(set(r) & set(e)) / 10 for r, e in zip(I, exactos)])
+    assert recall >= 0.9
+
+
+def test_top_k_mayor_que_el_indice():
+    vectores = _vectores(3)
+
+    D, I = buscar_en_indice(crear_indice_faiss(vectores, "flat"), vectores, vectores[:1], 10)
+
+    assert I.shape == (1, 3)
+    assert sorted(I[0]) == [0, 1, 2]
@@ -0,0 +1,53 @@
+import pytest
+
+# El paquete app carga Flask, Mongo, FAISS y el cliente del LLM: hace falta requirements.txt
+pytest.importorskip("app")
+
+from app.service.spiders.filtro_urls import FiltroUrlsVistas, hash_url
+
+
+def test_hash_url_normaliza_la_url():
+    assert hash_url(" https://Ejemplo.es/Noticia ") == hash_url("https://ejemplo.es/noticia")
+    assert hash_url("https://ejemplo.es/a") != hash_url("https://ejemplo.es/b")
+
+
+def test_filtro_vacio_no_contiene_nada():
+    filtro = FiltroUrlsVistas("https://ejemplo.es")
+    assert not filtro.contiene("https://ejemplo.es/noticia")
+    assert len(filtro) == 0
+
+
+def test_urls_agregadas_durante_el_rastreo():
+    filtro = FiltroUrlsVistas("https://ejemplo.es")
+    filtro.agregar("https://ejemplo.es/noticia-1")
+    assert filtro.contiene("https://ejemplo.es/noticia-1")
+    assert filtro.contiene("HTTPS://EJEMPLO.ES/noticia-1")
+    assert not filtro.contiene("https://ejemplo.es/noticia-2")
+    assert len(filtro) == 1
+
+
+def test_cargar_solo_las_urls_de_la_fuente(mongo_db):
+    mongo_db["publicaciones"].insert_many([
+        {"titulo": "a", "url": "https://ejemplo.es/noticia-1"},
+        {"titulo": "b", "url": "https://ejemplo.es/noticia-2"},
+        {"titulo": "c", "url": "https://otro.es/noticia-1"},
+        {"titulo": "d"},
+    ])
+
+    filtro = FiltroUrlsVistas("https://Ejemplo.es").cargar()
+
+    assert len(filtro) == 2
+    assert filtro.contiene("https://ejemplo.es/noticia-1")
+    assert filtro.contiene("https://ejemplo.es/noticia-2")
+    assert not filtro.contiene("https://otro.es/noticia-1")
+    assert not filtro.contiene("https://ejemplo.es/noticia-3")
+
+
+def test_cargadas_y_agregadas_se_combinan(mongo_db):
+    mongo_db["publicaciones"].insert_one({"titulo": "a", "url": "https://ejemplo.es/noticia-1"})
+    filtro = FiltroUrlsVistas("https://ejemplo.es").cargar()
+    filtro.agregar("https://ejemplo.es/noticia-2")
+
+    assert filtro.contiene("https://ejemplo.es/noticia-1")
+    assert filtro.contiene("https://ejemplo.es/noticia-2")
+    assert len(filtro) == 2
@@ -0,0 +1,76 @@
+import pytest
+
+# El paquete app carga Flask, Mongo, FAISS y el cliente del LLM: hace falta requirements.txt
+pytest.importorskip("app")
+
+from pymongo.errors import DuplicateKeyError
+
+from app.mongo.mongo_jobs import encolar_job, reclamar_job, completar_job, fallar_job
+from app.service.jobs.informe_job import filtros_canonicos, hash_filtros
+
+FILTROS = {
+    "fechaInicio": "2025-03-01",
+    "fechaFin": "2025-03-31",
+    "area_id": "65f000000000000000000001",
+    "tono": "Positivo",
+    "keywordsRelacionadas": ["65f000000000000000000003", "65f000000000000000000002"],
+}
+
+
+def test_filtros_canonicos_normaliza():
+    canonicos = filtros_canonicos({
+        **FILTROS,
+        "fechaInicio": " 2025-03-01 ",
+        "pais": "",
+        "fuente_id": None,
+        "keywordsRelacionadas": ["65f000000000000000000003", " 65f000000000000000000002", "65f000000000000000000003", ""],
+        "no_admitido": "x",
+    })
+
+    assert canonicos == {
+        "fechaInicio": "2025-03-01",
+        "fechaFin": "2025-03-31",
+        "area_id": "65f000000000000000000001",
+        "tono": "positivo",
+        "keywordsRelacionadas": ["65f000000000000000000002", "65f000000000000000000003"],
+    }
+
+
+def test_hash_igual_para_peticiones_equivalentes():
+    reordenados = dict(reversed(list(FILTROS.items())))
+    como_texto = {**FILTROS, "keywordsRelacionadas": "65f000000000000000000002,65f000000000000000000003"}
+    con_vacios = {**FILTROS, "pais": "", "busqueda_palabras": None, "otro": 1}
+
+    assert hash_filtros(FILTROS) == hash_filtros(reordenados) == hash_filtros(como_texto) == hash_filtros(con_vacios)
+
+
+@pytest.mark.parametrize("cambio", [
+    {"fechaFin": "2025-04-01"},
+    {"tono": "negativo"},
+    {"keywordsRelacionadas": ["65f000000000000000000002"]},
+    {"pais": "España"},
+])
+def test_hash_distinto_si_cambia_un_filtro(cambio):
+    assert hash_filtros(FILTROS) != hash_filtros({**FILTROS, **cambio})
+
+
+def test_clave_unica_impide_dos_informes_activos(mongo_db):
+    clave = hash_filtros(FILTROS)
+    encolar_job("informe", FILTROS, clave_unica=clave)
+
+    with pytest.raises(DuplicateKeyError):
+        encolar_job("informe", FILTROS, clave_unica=clave)
+
+
+@pytest.mark.parametrize("terminar", [
+    lambda job: completar_job(str(job["_id"])),
+    lambda job: fallar_job(job, "error"),
+])
+def test_clave_unica_se_libera_al_terminar(mongo_db, terminar):
+    clave = hash_filtros(FILTROS)
+    encolar_job("informe", FILTROS, max_intentos=1, clave_unica=clave)
+    terminar(reclamar_job("informe", "worker-1"))
+
+    encolar_job("informe", FILTROS, clave_unica=clave)
+
+    assert mongo_db["jobs"].count_documents({"clave_unica": clave}) == 1
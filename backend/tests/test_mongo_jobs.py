@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+# El paquete app carga Flask, Mongo, FAISS y el cliente del LLM: hace falta requirements.txt
+pytest.importorskip("app")
+
+from bson import ObjectId
+
+from app.mongo.mongo_jobs import (
+    encolar_job, reclamar_job, renovar_bloqueo_job, completar_job, fallar_job,
+    PENDIENTE, EN_CURSO, COMPLETADO, FALLIDO
+)
+
+TIPO = "prueba"
+
+
+def _job(mongo_db, job_id):
+    return mongo_db["jobs"].find_one({"_id": job_id})
+
+
+def _caducar_bloqueo(mongo_db, job):
+    mongo_db["jobs"].update_one({"_id": job["_id"]}, {"$set": {"bloqueado_hasta": datetime.now() - timedelta(seconds=1)}})
+
+
+def test_reclamar_bloquea_el_trabajo(mongo_db):
+    encolar_job(TIPO, {"n": 1})
+
+    job = reclamar_job(TIPO, "worker-1")
+
+    assert job["estado"] == EN_CURSO
+    assert job["worker"] == "worker-1"
+    assert job["intentos"] == 1
+    assert job["bloqueado_hasta"] > datetime.now()
+    assert reclamar_job(TIPO, "worker-2") is None
+
+
+def test_reclamar_respeta_tipo_y_disponibilidad(mongo_db):
+    encolar_job("otro", {})
+    job_id = encolar_job(TIPO, {})
+    mongo_db["jobs"].update_many({"tipo": TIPO}, {"$set": {"disponible_en": datetime.now() + timedelta(minutes=5)}})
+
+    assert reclamar_job(TIPO, "worker-1") is None
+    assert reclamar_job("otro", "worker-1")["tipo"] == "otro"
+    assert _job(mongo_db, ObjectId(job_id))["estado"] == PENDIENTE
+
+
+def test_reclamar_en_orden_de_disponibilidad(mongo_db):
+    primero = encolar_job(TIPO, {"n": 1})
+    encolar_job(TIPO, {"n": 2})
+
+    assert str(reclamar_job(TIPO, "worker-1")["_id"]) == primero
+
+
+def test_bloqueo_caducado_con_intentos_restantes_se_reclama(mongo_db):
+    encolar_job(TIPO, {}, max_intentos=3)
+    job = reclamar_job(TIPO, "worker-1")
+    _caducar_bloqueo(mongo_db, job)
+
+    recuperado = reclamar_job(TIPO, "worker-2")
+
+    assert recuperado["_id"] == job["_id"]
+    assert recuperado["worker"] == "worker-2"
+    assert recuperado["intentos"] == 2
+
+
+def test_bloqueo_caducado_sin_intentos_se_da_por_fallido(mongo_db):
+    encolar_job(TIPO, {}, max_intentos=1, clave_unica="clave")
+    job = reclamar_job(TIPO, "worker-1")
+    _caducar_bloqueo(mongo_db, job)
+
+    assert reclamar_job(TIPO, "worker-2") is None
+    guardado = _job(mongo_db, job["_id"])
+    assert guardado["estado"] == FALLIDO
+    assert guardado["finalizado"] is not None
+    assert "clave_unica" not in guardado
+
+
+def test_fallar_job_reintenta_con_espera_exponencial(mongo_db):
+    encolar_job(TIPO, {}, max_intentos=3)
+
+    job = reclamar_job(TIPO, "worker-1")
+    antes = datetime.now()
+    fallar_job(job, "error 1", backoff_base=30)
+    guardado = _job(mongo_db, job["_id"])
+    assert guardado["estado"] == PENDIENTE
+    assert guardado["error"] == "error 1"
+    assert guardado["bloqueado_hasta"] is None
+    assert timedelta(seconds=29) <= guardado["disponible_en"] - antes <= timedelta(seconds=31)
+
+    mongo_db["jobs"].update_one({"_id": job["_id"]}, {"$set": {"disponible_en": datetime.now()}})
+    job = reclamar_job(TIPO, "worker-1")
+    antes = datetime.now()
+    fallar_job(job, "error 2", backoff_base=30)
+    guardado = _job(mongo_db, job["_id"])
+    assert timedelta(seconds=59) <= guardado["disponible_en"] - antes <= timedelta(seconds=61)
+
+
+def test_fallar_job_sin_intentos_restantes(mongo_db):
+    encolar_job(TIPO, {}, max_intentos=1, clave_unica="clave")
+    job = reclamar_job(TIPO, "worker-1")
+
+    fallar_job(job, "error definitivo")
+
+    guardado = _job(mongo_db, job["_id"])
+    assert guardado["estado"] == FALLIDO
+    assert guardado["error"] == "error definitivo"
+    assert "clave_unica" not in guardado
+    assert reclamar_job(TIPO, "worker-1") is None
+
+
+def test_completar_job(mongo_db):
+    encolar_job(TIPO, {})
+    job = reclamar_job(TIPO, "worker-1")
+
+    completar_job(str(job["_id"]), {"guardadas": 3})
+
+    guardado = _job(mongo_db, job["_id"])
+    assert guardado["estado"] == COMPLETADO
+    assert guardado["resultado"] == {"guardadas": 3}
+    assert guardado["bloqueado_hasta"] is None
+
+
+def test_renovar_bloqueo_prolonga_el_trabajo_propio(mongo_db):
+    encolar_job(TIPO, {})
+    job = reclamar_job(TIPO, "worker-1", segundos_bloqueo=5)
+
+    assert renovar_bloqueo_job(job, segundos_bloqueo=600)
+    guardado = _job(mongo_db, job["_id"])
+    assert guardado["bloqueado_hasta"] > datetime.now() + timedelta(seconds=590)
+
+
+def test_renovar_bloqueo_de_un_trabajo_reclamado_por_otro_worker(mongo_db):
+    encolar_job(TIPO, {}, max_intentos=3)
+    job = reclamar_job(TIPO, "worker-1")
+    _caducar_bloqueo(mongo_db, job)
+    reclamar_job(TIPO, "worker-2")
+
+    assert not renovar_bloqueo_job(job)
+    assert _job(mongo_db, job["_id"])["worker"] == "worker-2"
+
+
+def test_renovar_bloqueo_de_un_trabajo_terminado(mongo_db):
+    encolar_job(TIPO, {})
+    job = reclamar_job(TIPO, "worker-1")
+    completar_job(str(job["_id"]))
+
+    assert not renovar_bloqueo_job(job)
+    assert _job(mongo_db, job["_id"])["bloqueado_hasta"] is None
@@ -0,0 +1,85 @@
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+
+# El paquete app carga Flask, Mongo, FAISS y el cliente del LLM: hace falta requirements.txt
+pytest.importorskip("app")
+
+from bson import ObjectId
+
+from app.mongo.mongo_publicaciones import codificar_cursor, decodificar_cursor, get_publicaciones_cursor
+
+
+def _insertar_publicaciones(mongo_db, fechas, fuente_id=None):
+    documentos = [
+        {"_id": ObjectId(), "titulo": f"noticia {i}", "url": f"https://ejemplo.es/{i}", "fecha": fecha,
+         "fuente_id": fuente_id or ObjectId()}
+        for i, fecha in enumerate(fechas)
+    ]
+    mongo_db["publicaciones"].insert_many(documentos)
+    return documentos
+
+
+def _recorrer(query=None, limit=2):
+    vistas, cursor, paginas = [], None, 0
+    while True:
+        publicaciones, cursor = get_publicaciones_cursor(query, cursor, limit)
+        vistas.extend(publicaciones)
+        paginas += 1
+        if cursor is None:
+            return vistas, paginas
+
+
+def test_cursor_ida_y_vuelta():
+    publicacion = {"fecha": datetime(2025, 3, 1, 12, 30, 15, 250000), "_id": ObjectId()}
+
+    fecha, _id = decodificar_cursor(codificar_cursor(publicacion))
+
+    assert fecha == publicacion["fecha"]
+    assert _id == publicacion["_id"]
+
+
+# Texto que no es base64, JSON sin campos y _id que no es un ObjectId
+@pytest.mark.parametrize("cursor", [
+    "no-es-base64!",
+    base64.urlsafe_b64encode(b"{}").decode("ascii"),
+    base64.urlsafe_b64encode(b'{"f": "2025-03-01T12:00:00", "i": "123"}').decode("ascii"),
+])
+def test_cursor_no_valido(cursor):
+    with pytest.raises(ValueError):
+        decodificar_cursor(cursor)
+
+
+def test_paginas_sin_huecos_ni_repetidos_con_fechas_empatadas(mongo_db):
+    base = datetime(2025, 3, 1, 12, 0, 0)
+    # Tres publicaciones comparten fecha y quedan repartidas entre páginas
+    fechas = [base, base, base, base - timedelta(hours=1), base + timedelta(hours=1),
+              base - timedelta(days=1), base - timedelta(hours=1)]
+    documentos = _insertar_publicaciones(mongo_db, fechas)
+
+    vistas, paginas = _recorrer(limit=2)
+
+    esperadas = sorted(documentos, key=lambda d: (d["fecha"], d["_id"]), reverse=True)
+    assert [p["_id"] for p in vistas] == [d["_id"] for d in esperadas]
+    assert paginas == 4
+
+
+def test_ultima_pagina_completa_no_devuelve_cursor(mongo_db):
+    _insertar_publicaciones(mongo_db, [datetime(2025, 3, 1) + timedelta(hours=i) for i in range(4)])
+
+    publicaciones, cursor = get_publicaciones_cursor(None, None, 4)
+
+    assert len(publicaciones) == 4
+    assert cursor is None
+
+
+def test_cursor_respeta_la_query(mongo_db):
+    fuente_id = ObjectId()
+    base = datetime(2025, 3, 1)
+    propias = _insertar_publicaciones(mongo_db, [base, base, base - timedelta(hours=1)], fuente_id=fuente_id)
+    _insertar_publicaciones(mongo_db, [base, base + timedelta(hours=1)])
+
+    vistas, _ = _recorrer({"fuente_id": fuente_id}, limit=1)
+
+    assert sorted(p["_id"] for p in vistas) == sorted(d["_id"] for d in propias)
@@ -0,0 +1,76 @@
+import logging
+import sys
+
+import pytest
+
+# El paquete app carga Flask, Mongo, FAISS y el cliente del LLM: hace falta requirements.txt
+pytest.importorskip("app")
+
+from app.service.llm import tokens_llm
+from app.service.llm.tokens_llm import contar_tokens, recortar_a_tokens, empaquetar_en_lotes
+
+MODELO = "proveedor/sin-tokenizador"
+
+
+@pytest.fixture(autouse=True)
+def sin_tokenizador(monkeypatch):
+    """
+    Fuerza la estimación por caracteres (3 caracteres por token) para el modelo de prueba.
+    """
+    monkeypatch.setattr(tokens_llm, "_codificadores", {"sin-tokenizador": None})
+    monkeypatch.setattr(tokens_llm, "CARACTERES_POR_TOKEN", 3.0)
+
+
+def _texto(tokens):
+    # La estimación cuenta int(len / 3) + 1 tokens
+    return "a" * (3 * (tokens - 1))
+
+
+def test_estimacion_por_caracteres():
+    assert contar_tokens("", MODELO) == 0
+    assert contar_tokens(_texto(10), MODELO) == 10
+    assert recortar_a_tokens("a" * 100, 10, MODELO) == "a" * 30
+    assert recortar_a_tokens("corto", 10, MODELO) == "corto"
+
+
+def test_lotes_sin_superar_el_presupuesto_y_en_orden():
+    entradas = [_texto(10) + str(i) for i in range(7)]
+
+    lotes = empaquetar_en_lotes(entradas, presupuesto=25, modelo=MODELO)
+
+    assert [len(lote) for lote in lotes] == [2, 2, 2, 1]
+    assert [e for lote in lotes for e in lote] == entradas
+    assert all(sum(contar_tokens(e, MODELO) for e in lote) <= 25 for lote in lotes)
+
+
+def test_entrada_larga_se_recorta():
+    lotes = empaquetar_en_lotes([_texto(5), _texto(100), _texto(5)], presupuesto=28, max_tokens_entrada=20, modelo=MODELO)
+
+    assert [len(lote) for lote in lotes] == [2, 1]
+    assert len(lotes[0][1]) == 20 * 3
+    assert lotes[1] == [_texto(5)]
+
+
+def test_entrada_mayor_que_el_presupuesto_ocupa_un_lote_recortada():
+    lotes = empaquetar_en_lotes([_texto(100)], presupuesto=30, modelo=MODELO)
+
+    assert lotes == [["a" * 90]]
+
+
+def test_sin_entradas():
+    assert empaquetar_en_lotes([], presupuesto=30, modelo=MODELO) == []
+
+
+def test_sin_tiktoken_se_avisa_una_sola_vez(monkeypatch, caplog, tmp_path):
+    monkeypatch.setenv("TIKTOKEN_CACHE_DIR", str(tmp_path))
+    monkeypatch.setitem(sys.modules, "tiktoken", None)
+    monkeypatch.setattr(tokens_llm, "_codificadores", {})
+    monkeypatch.setattr(tokens_llm, "_aviso_estimacion", False)
+
+    with caplog.at_level(logging.ERROR):
+        assert contar_tokens(_texto(10), "modelo-a") == 10
+        assert contar_tokens(_texto(10), "modelo-b") == 10
+
+    errores = [r for r in caplog.records if r.levelno == logging.ERROR]
+    assert len(errores) == 1
+    assert "--precargar" in errores[0].getMessage()